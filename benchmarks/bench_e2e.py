@@ -0,0 +1,263 @@
+"""
+End-to-end latency / throughput 벤치마크 (mock LLM)
+
+utils.client를 benchmarks.mock_llm.MockOpenAI로 바꾼 뒤 build_graph로 만든 graph 전체를
+simple / complex 질문으로 반복 실행합니다. 임베딩 / FAISS / BM25 / rerank는 실제로 수행하고
+LLM만 고정 지연의 결정적 응답으로 대체하므로 실행 간 비교가 가능합니다.
+
+- 순차 실행: 질문 유형별 p50 / p95 / p99 지연, 단계별 (graph node, llm, encode, faiss_search,
+  bm25, rerank 등) 평균 시간
+- 동시 실행: --concurrency 단계별 QPS와 지연 분포
+
+    python -m benchmarks.bench_e2e --repeat 5 --concurrency 1 4 8 --llm-latency-ms 300
+
+retrievers.engine 캐시 (LLM 쿼리 변환 / 쿼리 임베딩) 때문에 같은 질문의 반복 실행은
+캐시된 경로를 측정합니다. --cold를 주면 질문마다 캐시를 비웁니다.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# config는 OPENAI_API_KEY가 없으면 에러 -> stub 사용 시 더미 키로 충분
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-mock")
+
+from benchmarks.mock_llm import MockOpenAI
+from rag_pipeline import config, retrievers, tracing, utils
+from rag_pipeline.graph_builder import build_graph
+
+RESULTS_DIR = Path("./benchmarks/results")
+
+DEFAULT_QUERIES = [
+    {"type": "simple", "query": "What is the bandgap of silicon at 300K?"},
+    {"type": "simple", "query": "Define hole mobility in a semiconductor."},
+    {"type": "simple", "query": "What is the formula for electron drift velocity?"},
+    {"type": "simple", "query": "What is an intrinsic semiconductor?"},
+    {
+        "type": "complex",
+        "query": "Compare how temperature affects both carrier concentration and mobility in silicon devices.",
+    },
+    {
+        "type": "complex",
+        "query": "Analyze the trade-offs between different doping strategies for optimizing MOSFET threshold voltage.",
+    },
+    {
+        "type": "complex",
+        "query": "Calculate the depletion width of a pn junction and determine the effect of reverse bias on junction capacitance.",
+    },
+]
+
+
+def load_queries(path: Path | None) -> List[Dict[str, str]]:
+    """JSONL ({"query": ..., "type": "simple" | "complex"}) 또는 기본 질문"""
+    if path is None:
+        return DEFAULT_QUERIES
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    ms = np.asarray(latencies) * 1000
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+def _stage_breakdown(traces: List[tracing.Trace]) -> Dict[str, Dict[str, float]]:
+    """span 이름별 질문당 평균 시간 / 호출 수"""
+    totals: Dict[str, float] = {}
+    calls: Dict[str, int] = {}
+    for trace in traces:
+        for record in trace.spans:
+            totals[record["name"]] = (
+                totals.get(record["name"], 0.0) + record["duration_ms"]
+            )
+            calls[record["name"]] = calls.get(record["name"], 0) + 1
+    n = max(len(traces), 1)
+    return {
+        name: {
+            "mean_ms_per_query": round(totals[name] / n, 2),
+            "calls_per_query": round(calls[name] / n, 2),
+        }
+        for name in sorted(totals, key=totals.get, reverse=True)
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return None
+
+
+class Runner:
+    def __init__(self, cold: bool):
+        # simple / complex 분기는 graph 안에서 결정되므로 graph는 하나만 빌드
+        self.graph = build_graph(
+            None, None, config.RETRIEVAL_TYPE, config.HYBRID_WEIGHT
+        )
+        self.cold = cold
+
+    def run(self, item: Dict[str, str]) -> tracing.Trace:
+        if self.cold:
+            retrievers.engine.clear_caches()
+        query = item["query"]
+        with tracing.trace("query", type=item.get("type"), query=query) as trace:
+            final_state = self.graph.invoke(
+                {"question": [query], "messages": [("user", query)]}
+            )
+        trace.attrs["route"] = final_state.get("next", "simple")
+        return trace
+
+
+def run_sequential(runner: Runner, queries, repeat: int) -> Dict[str, Any]:
+    traces = [runner.run(item) for _ in range(repeat) for item in queries]
+    result = {"overall": _percentiles([t.duration_ms / 1000 for t in traces])}
+    for query_type in sorted({t.attrs.get("type") for t in traces}):
+        typed = [t for t in traces if t.attrs.get("type") == query_type]
+        result[query_type] = {
+            "latency": _percentiles([t.duration_ms / 1000 for t in typed]),
+            "routed": {
+                route: sum(t.attrs["route"] == route for t in typed)
+                for route in ("simple", "complex")
+            },
+            "stages": _stage_breakdown(typed),
+            "llm_tokens_per_query": {
+                key: round(
+                    sum(t.llm_tokens()[key] for t in typed) / max(len(typed), 1), 1
+                )
+                for key in ("calls", "prompt_tokens", "completion_tokens")
+            },
+        }
+    return result
+
+
+def run_concurrent(runner: Runner, queries, concurrency: int, total: int):
+    """concurrency개 스레드로 total개 질문 처리 -> QPS / 지연 분포"""
+    items = [queries[i % len(queries)] for i in range(total)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        traces = list(pool.map(runner.run, items))
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "queries": total,
+        "wall_s": round(wall, 3),
+        "qps": round(total / wall, 3),
+        "latency": _percentiles([t.duration_ms / 1000 for t in traces]),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--queries", type=Path, default=None, help="JSONL query set")
+    p.add_argument("--repeat", type=int, default=3, help="sequential passes")
+    p.add_argument("--warmup", type=int, default=1, help="untimed passes")
+    p.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 8])
+    p.add_argument(
+        "--concurrent-queries", type=int, default=0, help="default: 4 x concurrency"
+    )
+    p.add_argument("--llm-latency-ms", type=float, default=300.0)
+    p.add_argument("--llm-ms-per-token", type=float, default=5.0)
+    p.add_argument("--llm-jitter", type=float, default=0.0)
+    p.add_argument("--llm-output-tokens", type=int, default=200)
+    p.add_argument("--cold", action="store_true", help="clear engine caches per query")
+    p.add_argument("--tag", default="", help="label stored with the results")
+    args = p.parse_args()
+
+    queries = load_queries(args.queries)
+    llm = MockOpenAI(
+        base_latency_ms=args.llm_latency_ms,
+        ms_per_token=args.llm_ms_per_token,
+        jitter=args.llm_jitter,
+        output_tokens=args.llm_output_tokens,
+        complex_queries={q["query"] for q in queries if q.get("type") == "complex"},
+    )
+    # utils.client를 공유하는 모든 모듈 (utils, nodes, query_decomposition)이 stub을 사용
+    utils.client = llm
+    tracing.instrument_openai(llm)
+
+    runner = Runner(cold=args.cold)
+    print(f"🔥 Warmup: {args.warmup} pass(es) over {len(queries)} queries")
+    for _ in range(args.warmup):
+        for item in queries:
+            runner.run(item)
+
+    print(f"⏱️ Sequential: {args.repeat} pass(es)")
+    sequential = run_sequential(runner, queries, args.repeat)
+    for query_type, entry in sequential.items():
+        if query_type == "overall":
+            continue
+        lat = entry["latency"]
+        print(
+            f"  - {query_type}: p50 {lat['p50_ms']:.0f} ms, p95 {lat['p95_ms']:.0f} ms, "
+            f"p99 {lat['p99_ms']:.0f} ms (routed {entry['routed']})"
+        )
+        for name, stage in list(entry["stages"].items())[:8]:
+            print(
+                f"      {name:<40} {stage['mean_ms_per_query']:>9.1f} ms "
+                f"x{stage['calls_per_query']}"
+            )
+
+    concurrent = []
+    for level in args.concurrency:
+        total = args.concurrent_queries or 4 * level
+        entry = run_concurrent(runner, queries, level, total)
+        concurrent.append(entry)
+        print(
+            f"🚀 concurrency {level}: {entry['qps']:.2f} QPS, "
+            f"p50 {entry['latency']['p50_ms']:.0f} ms, p99 {entry['latency']['p99_ms']:.0f} ms"
+        )
+
+    results = {
+        "tag": args.tag,
+        "git_commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            "retrieval_type": config.RETRIEVAL_TYPE,
+            "hybrid_weight": config.HYBRID_WEIGHT,
+            "top_k": config.TOP_K,
+            "rerank": config.RERANK,
+            "inference_backend": config.INFERENCE_BACKEND,
+            "embed_dim": config.EMBED_DIM,
+            "two_stage_search": config.TWO_STAGE_SEARCH,
+            "cold": args.cold,
+            "queries": len(queries),
+            "llm": {
+                "latency_ms": args.llm_latency_ms,
+                "ms_per_token": args.llm_ms_per_token,
+                "jitter": args.llm_jitter,
+                "output_tokens": args.llm_output_tokens,
+            },
+        },
+        "sequential": sequential,
+        "concurrent": concurrent,
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = RESULTS_DIR / f"e2e_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"💾 Results saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Length-bucketed dynamic batching 벤치마크
+
+vectordb/token_info.json, vectordb/summary_token_info.json의 실제 청크 길이 분포로
+도착 순서 고정 크기 배치 vs 토큰 길이 bucket + 토큰 예산 배치를 비교합니다.
+
+    python -m benchmarks.bench_length_bucketing                # 패딩 효율만 (모델 로드 없음)
+    python -m benchmarks.bench_length_bucketing --throughput   # 실제 encode 처리량까지 측정
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from rag_pipeline.embedding_executor import EmbeddingExecutor
+
+TOKEN_INFO_PATHS = [
+    (Path("./vectordb/token_info.json"), "text"),
+    (Path("./vectordb/summary_token_info.json"), "summary_text"),
+]
+RESULTS_DIR = Path("./benchmarks/results")
+SPECIAL_TOKENS = 2  # <s>, </s>
+
+
+def load_chunks(repeat: int) -> Tuple[List[str], List[int]]:
+    """실제 청크 텍스트와 (special token 포함) 토큰 수, 도착 순서 유지"""
+    texts: List[str] = []
+    lengths: List[int] = []
+    for path, text_key in TOKEN_INFO_PATHS:
+        if not path.exists():
+            print(f"Warning: {path} not found, skipping")
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for record in json.load(f):
+                texts.append(record[text_key])
+                lengths.append(record["token_count"] + SPECIAL_TOKENS)
+    return texts * repeat, lengths * repeat
+
+
+def naive_padding(lengths: List[int], batch_size: int) -> int:
+    return sum(
+        max(lengths[i : i + batch_size]) * len(lengths[i : i + batch_size])
+        for i in range(0, len(lengths), batch_size)
+    )
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--batch-size", type=int, default=32, help="baseline batch size")
+    p.add_argument("--max-tokens", type=int, default=16384, help="token budget")
+    p.add_argument("--repeat", type=int, default=1, help="replicate the corpus")
+    p.add_argument("--throughput", action="store_true", help="run real encode")
+    p.add_argument("--model", default="jinaai/jina-embeddings-v3")
+    args = p.parse_args()
+
+    texts, lengths = load_chunks(args.repeat)
+    if not texts:
+        raise SystemExit("No chunks found; build the vector DBs first")
+
+    planner = EmbeddingExecutor(
+        model=None,
+        tokenizer=object(),
+        max_tokens_per_batch=args.max_tokens,
+        max_batch_size=max(args.batch_size * 8, 1),
+    )
+    real_tokens, bucketed_tokens = planner.padding_stats(lengths)
+    naive_tokens = naive_padding(lengths, args.batch_size)
+
+    results = {
+        "num_chunks": len(texts),
+        "token_count": {
+            "min": min(lengths),
+            "max": max(lengths),
+            "mean": round(real_tokens / len(lengths), 1),
+        },
+        "real_tokens": real_tokens,
+        "arrival_order": {
+            "batch_size": args.batch_size,
+            "padded_tokens": naive_tokens,
+            "efficiency": round(real_tokens / naive_tokens, 4),
+        },
+        "bucketed": {
+            "max_tokens_per_batch": args.max_tokens,
+            "num_batches": len(planner.plan_batches(lengths)),
+            "padded_tokens": bucketed_tokens,
+            "efficiency": round(real_tokens / bucketed_tokens, 4),
+        },
+    }
+
+    print(
+        f"📊 {len(texts)} chunks, tokens min/mean/max = "
+        f"{results['token_count']['min']}/{results['token_count']['mean']}/{results['token_count']['max']}"
+    )
+    print(
+        f"  - Arrival order (batch={args.batch_size}): "
+        f"{naive_tokens} padded tokens, efficiency {results['arrival_order']['efficiency']:.1%}"
+    )
+    print(
+        f"  - Bucketed (budget={args.max_tokens}): "
+        f"{bucketed_tokens} padded tokens, efficiency {results['bucketed']['efficiency']:.1%}"
+    )
+
+    if args.throughput:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        model = SentenceTransformer(args.model, trust_remote_code=True, device=device)
+        executor = EmbeddingExecutor(model, max_tokens_per_batch=args.max_tokens)
+        model.encode(texts[:2])  # warm-up
+
+        # baseline: 도착 순서 그대로 고정 크기 배치
+        start = time.perf_counter()
+        for i in range(0, len(texts), args.batch_size):
+            model.encode(texts[i : i + args.batch_size], batch_size=args.batch_size)
+        naive_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        executor.encode(texts)
+        bucketed_seconds = time.perf_counter() - start
+
+        results["throughput"] = {
+            "device": device,
+            "arrival_order_docs_per_sec": round(len(texts) / naive_seconds, 2),
+            "bucketed_docs_per_sec": round(len(texts) / bucketed_seconds, 2),
+            "speedup": round(naive_seconds / bucketed_seconds, 3),
+        }
+        print(
+            f"  - Throughput ({device}): "
+            f"{results['throughput']['arrival_order_docs_per_sec']} -> "
+            f"{results['throughput']['bucketed_docs_per_sec']} docs/sec "
+            f"(x{results['throughput']['speedup']})"
+        )
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = RESULTS_DIR / f"length_bucketing_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
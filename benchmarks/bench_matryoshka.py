@@ -0,0 +1,165 @@
+"""
+Matryoshka 차원 축소 벤치마크
+
+현재 content / summary 인덱스의 벡터로 차원별 (256 / 512 / 1024) 인덱스 메모리,
+쿼리당 검색 지연, 전체 차원 exact 검색 대비 recall@k를 비교하고
+2단계 검색 (축소 차원 후보 -> 전체 차원 재점수화)의 recall / 지연도 함께 측정합니다.
+
+    python -m benchmarks.bench_matryoshka --repeat 100 --dims 256 512 1024
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from rag_pipeline import indexing, vector_search
+
+DB_PATHS = [Path("./vectordb/faiss"), Path("./vectordb/summary_faiss")]
+RESULTS_DIR = Path("./benchmarks/results")
+
+
+def load_corpus_vectors() -> np.ndarray:
+    """인덱스의 전체 차원 벡터 (vectors.npy, 없으면 FAISS 인덱스에서 복원)"""
+    parts = []
+    for db_path in DB_PATHS:
+        index_dir = indexing.resolve_index_path(db_path)
+        full = vector_search.load_full_vectors(index_dir, mmap=False)
+        if full is None and (index_dir / "index.faiss").exists():
+            index = faiss.read_index(str(index_dir / "index.faiss"))
+            full = index.reconstruct_n(0, index.ntotal)
+        if full is not None:
+            parts.append(np.asarray(full, dtype=np.float32))
+    if not parts:
+        raise SystemExit("No index vectors found; build the vector DBs first")
+    return np.concatenate(parts)
+
+
+def replicate(vectors: np.ndarray, repeat: int, noise: float, seed: int) -> np.ndarray:
+    """코퍼스를 repeat배로 복제 (복제본은 작은 가우시안 노이즈 + 재정규화)"""
+    rng = np.random.default_rng(seed)
+    copies = [vectors]
+    for _ in range(repeat - 1):
+        noisy = vectors + rng.normal(scale=noise, size=vectors.shape).astype(np.float32)
+        copies.append(noisy)
+    out = np.concatenate(copies)
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+def _timed_search(index, queries: np.ndarray, k: int):
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        ids[i] = found[0]
+    return ids, latencies
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def _latency_stats(latencies: List[float]) -> Dict[str, float]:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024])
+    p.add_argument("--repeat", type=int, default=10, help="replicate the corpus")
+    p.add_argument("--noise", type=float, default=0.02)
+    p.add_argument("--num-queries", type=int, default=200)
+    p.add_argument("--top-k", type=int, default=3)
+    p.add_argument("--candidates", type=int, default=50, help="two-stage candidates")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    corpus = replicate(load_corpus_vectors(), args.repeat, args.noise, args.seed)
+    full_dim = corpus.shape[1]
+    rng = np.random.default_rng(args.seed + 1)
+    picked = rng.choice(
+        len(corpus), size=min(args.num_queries, len(corpus)), replace=False
+    )
+    queries = corpus[picked] + rng.normal(
+        scale=args.noise * 2, size=(len(picked), full_dim)
+    ).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    # 기준: 전체 차원 exact 검색
+    full_index = faiss.IndexFlatIP(full_dim)
+    full_index.add(corpus)
+    truth, full_latencies = _timed_search(full_index, queries, args.top_k)
+
+    results = {
+        "num_vectors": len(corpus),
+        "full_dim": full_dim,
+        "top_k": args.top_k,
+        "full": {
+            "index_bytes": full_index.ntotal * full_dim * 4,
+            **_latency_stats(full_latencies),
+        },
+        "dims": {},
+    }
+    print(f"📊 {len(corpus)} vectors, {len(queries)} queries, full dim {full_dim}")
+    print(
+        f"  - {full_dim}-d exact: {results['full']['index_bytes'] / 1e6:.2f} MB, {results['full']['mean_ms']:.3f} ms/query"
+    )
+
+    for dim in sorted(d for d in args.dims if d < full_dim):
+        index = faiss.IndexFlatIP(dim)
+        index.add(vector_search.truncate_embeddings(corpus, dim))
+        short_queries = vector_search.truncate_embeddings(queries, dim)
+
+        found, latencies = _timed_search(index, short_queries, args.top_k)
+
+        # 2단계: 축소 차원 후보 + 전체 차원 재점수화
+        two_stage_found = np.empty_like(found)
+        two_stage_latencies = []
+        for i, (short_query, query) in enumerate(zip(short_queries, queries)):
+            start = time.perf_counter()
+            _, candidates = index.search(short_query[None, :], args.candidates)
+            candidates = candidates[0][candidates[0] >= 0]
+            scores = corpus[candidates] @ query
+            two_stage_found[i] = candidates[np.argsort(-scores)[: args.top_k]]
+            two_stage_latencies.append(time.perf_counter() - start)
+
+        entry = {
+            "index_bytes": index.ntotal * dim * 4,
+            "memory_saving": round(1 - dim / full_dim, 4),
+            f"recall@{args.top_k}": round(_recall(found, truth), 4),
+            **_latency_stats(latencies),
+            "two_stage": {
+                "candidates": args.candidates,
+                f"recall@{args.top_k}": round(_recall(two_stage_found, truth), 4),
+                **_latency_stats(two_stage_latencies),
+            },
+        }
+        results["dims"][str(dim)] = entry
+        print(
+            f"  - {dim}-d: {entry['index_bytes'] / 1e6:.2f} MB (-{entry['memory_saving']:.0%}), "
+            f"{entry['mean_ms']:.3f} ms/query, recall@{args.top_k} {entry[f'recall@{args.top_k}']:.3f} | "
+            f"two-stage {entry['two_stage']['mean_ms']:.3f} ms/query, "
+            f"recall@{args.top_k} {entry['two_stage'][f'recall@{args.top_k}']:.3f}"
+        )
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = RESULTS_DIR / f"matryoshka_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
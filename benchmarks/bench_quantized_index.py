@@ -0,0 +1,134 @@
+"""
+양자화 인덱스 (int8 / binary) recall 벤치마크
+
+현재 인덱스 벡터 (기본: summary_faiss)를 복제해 flat / int8 / binary 인덱스를 만들고
+현재 flat 인덱스 대비 recall@k, 인덱스 크기, 쿼리당 지연을 비교합니다.
+양자화 인덱스는 후보 수별로 float 재점수화 결과도 함께 측정합니다.
+
+    python -m benchmarks.bench_quantized_index --repeat 100 --candidates 10 50 100
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from benchmarks.bench_matryoshka import (
+    RESULTS_DIR,
+    _latency_stats,
+    _recall,
+    _timed_search,
+    replicate,
+)
+from rag_pipeline import indexing, vector_search
+
+DB_PATHS = {
+    "summary": Path("./vectordb/summary_faiss"),
+    "content": Path("./vectordb/faiss"),
+}
+
+
+def load_store_vectors(db_path: Path) -> np.ndarray:
+    index_dir = indexing.resolve_index_path(db_path)
+    full = vector_search.load_full_vectors(index_dir, mmap=False)
+    if full is None:
+        index = faiss.read_index(str(index_dir / "index.faiss"))
+        full = index.reconstruct_n(0, index.ntotal)
+    return np.asarray(full, dtype=np.float32)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--store", choices=sorted(DB_PATHS), default="summary")
+    p.add_argument("--repeat", type=int, default=10, help="replicate the corpus")
+    p.add_argument("--noise", type=float, default=0.02)
+    p.add_argument("--num-queries", type=int, default=200)
+    p.add_argument("--top-k", type=int, default=3)
+    p.add_argument("--candidates", type=int, nargs="+", default=[10, 50, 100])
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    corpus = replicate(
+        load_store_vectors(DB_PATHS[args.store]), args.repeat, args.noise, args.seed
+    )
+    rng = np.random.default_rng(args.seed + 1)
+    picked = rng.choice(
+        len(corpus), size=min(args.num_queries, len(corpus)), replace=False
+    )
+    queries = corpus[picked] + rng.normal(
+        scale=args.noise * 2, size=(len(picked), corpus.shape[1])
+    ).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    # 기준: 현재와 같은 flat (IndexFlatL2) 인덱스
+    flat = vector_search.build_faiss_index(corpus, "flat")
+    truth, flat_latencies = _timed_search(flat, queries, args.top_k)
+    results = {
+        "store": args.store,
+        "num_vectors": len(corpus),
+        "dim": corpus.shape[1],
+        "top_k": args.top_k,
+        "index_types": {
+            "flat": {
+                "index_bytes": int(faiss.serialize_index(flat).nbytes),
+                **_latency_stats(flat_latencies),
+            }
+        },
+    }
+    print(
+        f"📊 {args.store}: {len(corpus)} vectors x {corpus.shape[1]}-d, {len(queries)} queries"
+    )
+    print(
+        f"  - flat: {results['index_types']['flat']['index_bytes'] / 1e6:.2f} MB, "
+        f"{results['index_types']['flat']['mean_ms']:.3f} ms/query"
+    )
+
+    for index_type in ("int8", "binary"):
+        index = vector_search.build_faiss_index(corpus, index_type)
+        found, latencies = _timed_search(index, queries, args.top_k)
+        entry = {
+            "index_bytes": int(faiss.serialize_index(index).nbytes),
+            f"recall@{args.top_k}": round(_recall(found, truth), 4),
+            **_latency_stats(latencies),
+            "rescored": {},
+        }
+        print(
+            f"  - {index_type}: {entry['index_bytes'] / 1e6:.2f} MB, "
+            f"{entry['mean_ms']:.3f} ms/query, recall@{args.top_k} {entry[f'recall@{args.top_k}']:.3f}"
+        )
+
+        # 후보 수별 float 재점수화
+        for n in args.candidates:
+            rescored = np.empty_like(found)
+            rescore_latencies = []
+            for i, query in enumerate(queries):
+                start = time.perf_counter()
+                _, candidates = index.search(query[None, :], n)
+                candidates = candidates[0][candidates[0] >= 0]
+                scores = corpus[candidates] @ query
+                rescored[i] = candidates[np.argsort(-scores)[: args.top_k]]
+                rescore_latencies.append(time.perf_counter() - start)
+            entry["rescored"][str(n)] = {
+                f"recall@{args.top_k}": round(_recall(rescored, truth), 4),
+                **_latency_stats(rescore_latencies),
+            }
+            print(
+                f"      + rescore top-{n}: recall@{args.top_k} "
+                f"{entry['rescored'][str(n)][f'recall@{args.top_k}']:.3f}, "
+                f"{entry['rescored'][str(n)]['mean_ms']:.3f} ms/query"
+            )
+        results["index_types"][index_type] = entry
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = RESULTS_DIR / f"quantized_index_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
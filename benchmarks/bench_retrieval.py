@@ -0,0 +1,271 @@
+"""
+검색 primitive 마이크로벤치마크
+
+vectordb/faiss, vectordb/summary_faiss의 실제 인덱스로 검색 단계를 하나씩 따로 측정하고
+코퍼스를 합성 복제 (1x / 10x / 100x)해 규모에 따른 변화를 봅니다.
+
+- index_load: FAISS 인덱스 + docstore 로드 (1x만, 디스크의 실제 인덱스)
+- query_encode: 쿼리 임베딩 (--encode, 임베딩 모델 로드 필요)
+- faiss_search: 저장된 인덱스와 같은 타입 / 차원의 인덱스 top-k 검색 (양자화면 재점수화 포함)
+- bm25_build / bm25_score: BM25Okapi 생성 / 쿼리당 전체 점수 계산
+- dense_scan: hybrid 검색의 전체 문서 cosine (저장된 전체 차원 벡터 @ 쿼리)
+- hybrid_fuse: min-max 정규화 + 가중합 + top-k 선택
+- parent_lookup: examples_original.jsonl parent map 로드 / summary 결과의 parent 조회
+- rerank: Cross-Encoder top-k 재정렬 (--rerank, reranker 로드 필요)
+
+    python -m benchmarks.bench_retrieval --scales 1 10 100 --num-queries 50
+    python -m benchmarks.bench_retrieval --encode --rerank --backend onnx
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from benchmarks.bench_matryoshka import RESULTS_DIR, replicate
+from rag_pipeline import indexing, vector_search
+from rag_pipeline.retrieval_engine import (
+    Candidate,
+    RetrievalEngine,
+    fuse_weighted_sum,
+)
+
+DB_PATHS = {
+    "content": Path("./vectordb/faiss"),
+    "summary": Path("./vectordb/summary_faiss"),
+}
+PARENT_JSONL_PATH = Path("./vectordb/jina_processed/examples_original.jsonl")
+
+
+def _stats(latencies: Sequence[float]) -> Dict[str, float]:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+    }
+
+
+def _time_each(fn: Callable, items: Sequence) -> Dict[str, float]:
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return _stats(latencies)
+
+
+def _time_once(fn: Callable, repeat: int = 1) -> Dict[str, float]:
+    return _time_each(lambda _: fn(), range(repeat))
+
+
+def load_store(db_path: Path, repeat: int):
+    """(로드 시간, 문서 텍스트, 전체 차원 벡터, BM25 토큰, 인덱스 타입, 인덱스 차원)"""
+    load = _time_once(lambda: indexing.load_vectorstore(db_path, None), repeat)
+    vectordb = indexing.load_vectorstore(db_path, None)
+    rows = sorted(vectordb.index_to_docstore_id.items())
+    texts = [vectordb.docstore.search(doc_id).page_content for _, doc_id in rows]
+    bm25_corpus = indexing.load_bm25_corpus(db_path, vectordb)
+    tokens = [bm25_corpus[doc_id] for _, doc_id in rows]
+    full = vector_search.load_full_vectors(indexing.resolve_index_path(db_path))
+    if full is None:
+        full = vectordb.index.reconstruct_n(0, vectordb.index.ntotal)
+    return (
+        load,
+        texts,
+        np.asarray(full, dtype=np.float32),
+        tokens,
+        vector_search.index_type_of(vectordb),
+        vectordb.index.d,
+    )
+
+
+def make_queries(vectors: np.ndarray, texts: List[str], n: int, seed: int):
+    """코퍼스 청크에서 뽑은 쿼리 (텍스트 앞부분 + 노이즈를 섞은 벡터)"""
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(texts), size=min(n, len(texts)), replace=False)
+    query_texts = [" ".join(texts[i].split()[:16]) for i in picked]
+    query_vectors = vectors[picked] + rng.normal(
+        scale=0.04, size=(len(picked), vectors.shape[1])
+    ).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return query_texts, query_vectors
+
+
+def bench_scale(
+    vectors, tokens, index_type, index_dim, queries, query_vectors, args
+) -> Dict[str, Dict[str, float]]:
+    result: Dict[str, Dict[str, float]] = {}
+
+    index = vector_search.build_faiss_index(
+        vector_search.truncate_embeddings(vectors, index_dim), index_type
+    )
+    full_vectors = (
+        vectors if index_type != "flat" or index_dim < vectors.shape[1] else None
+    )
+    result["faiss_search"] = _time_each(
+        lambda q: vector_search.search_rows(
+            index, q, args.top_k, full_vectors=full_vectors, candidates=args.candidates
+        ),
+        query_vectors,
+    )
+
+    bm25_holder = {}
+    result["bm25_build"] = _time_once(
+        lambda: bm25_holder.update(bm25=BM25Okapi(tokens))
+    )
+    bm25 = bm25_holder["bm25"]
+    result["bm25_score"] = _time_each(lambda q: bm25.get_scores(q.split()), queries)
+
+    result["dense_scan"] = _time_each(lambda q: vectors @ q, query_vectors)
+
+    dense = [vectors @ q for q in query_vectors[:5]]
+    lexical = [bm25.get_scores(q.split()) for q in queries[:5]]
+
+    def _fuse(i):
+        candidates = [
+            Candidate(None, row, float(d), float(l))
+            for row, (d, l) in enumerate(zip(dense[i], lexical[i]))
+        ]
+        fuse_weighted_sum(candidates, args.weights)
+        return sorted(candidates, key=lambda c: c.score, reverse=True)[: args.top_k]
+
+    result["hybrid_fuse"] = _time_each(_fuse, [i % len(dense) for i in range(20)])
+    return result
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    p.add_argument("--num-queries", type=int, default=50)
+    p.add_argument("--top-k", type=int, default=3)
+    p.add_argument("--candidates", type=int, default=50, help="rescore candidates")
+    p.add_argument("--weights", type=float, nargs=2, default=[0.5, 0.5])
+    p.add_argument("--load-repeat", type=int, default=3)
+    p.add_argument("--noise", type=float, default=0.02, help="replica noise")
+    p.add_argument("--encode", action="store_true", help="time query encoding")
+    p.add_argument("--rerank", action="store_true", help="time reranking")
+    p.add_argument("--model", default="jinaai/jina-embeddings-v3")
+    p.add_argument("--reranker", default="BAAI/bge-reranker-v2-m3")
+    p.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    p.add_argument("--onnx-dir", type=Path, default=Path("./models/onnx"))
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    results: Dict[str, Any] = {
+        "settings": {
+            k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()
+        },
+        "stores": {},
+    }
+    loaded = {}
+    for name, db_path in DB_PATHS.items():
+        if not indexing.index_exists(db_path):
+            print(f"Warning: {db_path} not found, skipping")
+            continue
+        loaded[name] = load_store(db_path, args.load_repeat)
+    if not loaded:
+        raise SystemExit("No vector stores found; build the vector DBs first")
+
+    for name, (load, texts, vectors, tokens, index_type, index_dim) in loaded.items():
+        queries, query_vectors = make_queries(
+            vectors, texts, args.num_queries, args.seed
+        )
+        store = {
+            "num_chunks": len(texts),
+            "index_type": index_type,
+            "index_dim": index_dim,
+            "full_dim": int(vectors.shape[1]),
+            "index_load": load,
+            "scales": {},
+        }
+        print(
+            f"📂 {name}: {len(texts)} chunks, {index_type} {index_dim}-d, "
+            f"load {load['mean_ms']:.1f} ms"
+        )
+        for scale in args.scales:
+            scaled = replicate(vectors, scale, args.noise, args.seed)
+            entry = bench_scale(
+                scaled,
+                tokens * scale,
+                index_type,
+                index_dim,
+                queries,
+                query_vectors,
+                args,
+            )
+            store["scales"][str(scale)] = {"num_chunks": len(scaled), **entry}
+            print(
+                f"  - {scale:>3}x ({len(scaled)} chunks): "
+                + ", ".join(f"{k} {v['mean_ms']:.3f} ms" for k, v in entry.items())
+            )
+        results["stores"][name] = store
+
+    # parent 조회 (summary 검색 결과 -> 원본 예제)
+    if PARENT_JSONL_PATH.exists():
+        # 엔진마다 parent map을 캐시하므로 로드 시간은 매번 새 엔진으로 측정 (모델 불필요)
+        parent_load = _time_once(
+            lambda: RetrievalEngine(None, None, None).parent_map(PARENT_JSONL_PATH),
+            args.load_repeat,
+        )
+        parent_map = RetrievalEngine(None, None, None).parent_map(PARENT_JSONL_PATH)
+        parent_ids = list(parent_map)[: args.top_k]
+        results["parent_lookup"] = {
+            "parents": len(parent_map),
+            "load": parent_load,
+            "lookup": _time_each(
+                lambda _: [parent_map.get(pid) for pid in parent_ids], range(1000)
+            ),
+        }
+        print(
+            f"👪 parent map: {len(parent_map)} parents, load {parent_load['mean_ms']:.1f} ms, "
+            f"lookup {results['parent_lookup']['lookup']['mean_ms'] * 1000:.2f} µs"
+        )
+
+    if args.encode or args.rerank:
+        from rag_pipeline import inference_backend
+
+        _, texts, vectors, *_ = next(iter(loaded.values()))
+        queries, _ = make_queries(vectors, texts, args.num_queries, args.seed)
+        if args.encode:
+            from rag_pipeline.embedding_executor import EmbeddingExecutor
+
+            encoder = EmbeddingExecutor(
+                inference_backend.load_embedder(
+                    args.model, backend=args.backend, onnx_dir=args.onnx_dir
+                ),
+                encode_kwargs=indexing.task_encode_kwargs(
+                    indexing.DEFAULT_EMBED_TASKS["query"]
+                ),
+            )
+            encoder.encode(queries[0], normalize_embeddings=True)  # warmup
+            results["query_encode"] = _time_each(
+                lambda q: encoder.encode(q, normalize_embeddings=True), queries
+            )
+            print(f"🔢 query encode: {results['query_encode']['mean_ms']:.1f} ms")
+        if args.rerank:
+            reranker = inference_backend.load_reranker(
+                args.reranker, backend=args.backend, onnx_dir=args.onnx_dir
+            )
+            pairs = [
+                [[q, texts[(i + j) % len(texts)]] for j in range(args.top_k)]
+                for i, q in enumerate(queries)
+            ]
+            reranker.score(pairs[0])  # warmup
+            results["rerank"] = _time_each(reranker.score, pairs)
+            print(f"🔄 rerank top-{args.top_k}: {results['rerank']['mean_ms']:.1f} ms")
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = RESULTS_DIR / f"retrieval_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
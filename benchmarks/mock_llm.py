@@ -0,0 +1,125 @@
+"""
+결정적 (deterministic) OpenAI client stub
+
+utils.client 대신 넣어 OpenAI 호출 없이 graph 전체를 반복 측정하기 위한 용도입니다.
+응답 내용은 프롬프트 해시로 정해지고, 지연은 base + 출력 토큰당 시간으로 time.sleep합니다.
+(sleep은 GIL을 놓으므로 동시 실행 측정에서도 실제 네트워크 대기와 비슷하게 동작)
+
+    from benchmarks.mock_llm import MockOpenAI
+    utils.client = MockOpenAI(base_latency_ms=300, ms_per_token=5)
+"""
+
+from __future__ import annotations
+import hashlib
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Optional, Set
+
+# 응답 텍스트에 섞어 쓰는 반도체 용어 (BM25 / 임베딩 검색이 실제 문서에 걸리도록)
+VOCABULARY = [
+    "silicon", "bandgap", "electron", "hole", "mobility", "doping", "donor",
+    "acceptor", "intrinsic", "carrier", "concentration", "Fermi", "level",
+    "junction", "MOSFET", "threshold", "voltage", "oxide", "drift", "diffusion",
+    "recombination", "generation", "temperature", "lattice", "scattering",
+    "effective", "mass", "density", "states", "current", "depletion", "region",
+]  # fmt: skip
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class MockOpenAI:
+    """
+    OpenAI client의 chat.completions.create만 흉내내는 stub
+
+    Args:
+        base_latency_ms: 호출당 고정 지연 (첫 토큰까지의 시간)
+        ms_per_token: 출력 토큰당 추가 지연
+        jitter: 지연에 곱하는 무작위 편차 비율 (0.1이면 ±10%, 프롬프트 해시로 시드)
+        output_tokens: 요약 / HyDE / 답변 응답 길이 (토큰)
+        complex_queries: "complex"로 분류할 질문 (없으면 키워드 규칙)
+        num_subquestions: 질문 분해 응답의 하위 질문 수
+    """
+
+    base_latency_ms: float = 300.0
+    ms_per_token: float = 5.0
+    jitter: float = 0.0
+    output_tokens: int = 200
+    complex_queries: Set[str] = field(default_factory=set)
+    num_subquestions: int = 3
+
+    def __post_init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self._calls = itertools.count()
+        self.calls = 0
+
+    # ----- 응답 생성 -----
+    def _text(self, seed: int, tokens: int, prefix: str = "") -> str:
+        rng = random.Random(seed)
+        words = [rng.choice(VOCABULARY) for _ in range(max(tokens * 3 // 4, 1))]
+        return (prefix + " ".join(words)).strip()
+
+    def _is_complex(self, question: str) -> bool:
+        if self.complex_queries:
+            return any(q in question for q in self.complex_queries)
+        return any(w in question.lower() for w in ("compare", "analyze", "both"))
+
+    def _respond(self, system: str, user: str, seed: int, max_tokens: int) -> str:
+        if "question complexity" in system:
+            return "complex" if self._is_complex(user) else "simple"
+        if "extracting variables" in system:
+            return '{"material": "silicon", "property": "mobility"}'
+        if "breaking down complex questions" in system:
+            return "\n".join(
+                f"{i}. What is the role of {self._text(seed + i, 6)} in this problem?"
+                for i in range(1, self.num_subquestions + 1)
+            )
+        tokens = min(self.output_tokens, max_tokens or self.output_tokens)
+        return self._text(seed, tokens, prefix=f"{user[:80]} ")
+
+    def create(
+        self,
+        model: str = "",
+        messages: Optional[Iterable[Dict[str, Any]]] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        messages = list(messages or [])
+        system = " ".join(
+            str(m.get("content", "")) for m in messages if m.get("role") == "system"
+        )
+        user = " ".join(
+            str(m.get("content", "")) for m in messages if m.get("role") == "user"
+        )
+        digest = hashlib.sha256((system + "\x00" + user).encode("utf-8")).digest()
+        seed = int.from_bytes(digest[:8], "little")
+
+        content = self._respond(system, user, seed, max_tokens)
+        completion_tokens = _approx_tokens(content)
+        latency = self.base_latency_ms + self.ms_per_token * completion_tokens
+        if self.jitter:
+            latency *= 1 + random.Random(seed).uniform(-self.jitter, self.jitter)
+        time.sleep(latency / 1000)
+
+        self.calls = next(self._calls) + 1
+        prompt_tokens = _approx_tokens(system + user)
+        return SimpleNamespace(
+            model=model,
+            choices=[
+                SimpleNamespace(
+                    index=0,
+                    finish_reason="stop",
+                    message=SimpleNamespace(role="assistant", content=content),
+                )
+            ],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
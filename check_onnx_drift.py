@@ -0,0 +1,184 @@
+"""
+ONNX Runtime backend 정확도 drift 확인
+
+코퍼스 청크 (vectordb/token_info.json, summary_token_info.json)로 PyTorch 모델과
+ONNX (fp32 / int8) 모델의 출력을 비교합니다.
+
+- 임베딩: task adapter별 (passage: 청크, query: summary) cosine similarity, summary -> content 검색 top-k 일치율
+- reranker: 점수 절대 오차, 후보 순위 일치 (top-1 / Spearman)
+
+    python check_onnx_drift.py                 # int8
+    python check_onnx_drift.py --no-quantize   # fp32 export만 비교
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from rag_pipeline import indexing, inference_backend
+
+EMBED_MODEL_NAME = "jinaai/jina-embeddings-v3"
+RERANKER_NAME = "BAAI/bge-reranker-v2-m3"
+CONTENT_INFO_PATH = Path("./vectordb/token_info.json")
+SUMMARY_INFO_PATH = Path("./vectordb/summary_token_info.json")
+
+
+def _load_texts(path: Path, key: str, limit: int) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [record[key] for record in json.load(f)][:limit]
+
+
+def _timed_encode(model, texts: List[str], task: str) -> tuple:
+    kwargs = indexing.task_encode_kwargs(task)
+    start = time.perf_counter()
+    vectors = np.stack(
+        [model.encode(text, normalize_embeddings=True, **kwargs) for text in texts]
+    )
+    return vectors, (time.perf_counter() - start) / len(texts) * 1000
+
+
+def _topk_overlap(a: np.ndarray, b: np.ndarray, k: int) -> float:
+    top_a = np.argsort(-a, axis=1)[:, :k]
+    top_b = np.argsort(-b, axis=1)[:, :k]
+    return float(np.mean([len(set(x) & set(y)) / k for x, y in zip(top_a, top_b)]))
+
+
+def _spearman(a: np.ndarray, b: np.ndarray) -> float:
+    rank_a = np.argsort(np.argsort(a))
+    rank_b = np.argsort(np.argsort(b))
+    if len(a) < 2:
+        return 1.0
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare ONNX Runtime outputs to PyTorch")
+    p.add_argument("--onnx-dir", default="./models/onnx")
+    p.add_argument("--no-quantize", action="store_true", help="compare fp32 ONNX")
+    p.add_argument("--threads", type=int, default=0)
+    p.add_argument("--num-chunks", type=int, default=64)
+    p.add_argument("--num-queries", type=int, default=16)
+    p.add_argument("--top-k", type=int, default=3)
+    p.add_argument("--min-cosine", type=float, default=0.98)
+    p.add_argument("--min-topk-overlap", type=float, default=0.9)
+    p.add_argument("--skip-reranker", action="store_true")
+    args = p.parse_args()
+
+    quantize = not args.no_quantize
+    content = _load_texts(CONTENT_INFO_PATH, "text", args.num_chunks)
+    queries = _load_texts(SUMMARY_INFO_PATH, "summary_text", args.num_queries)
+    print(f"📄 {len(content)} content chunks, {len(queries)} summary queries")
+
+    onnx_kwargs = dict(
+        backend="onnx",
+        onnx_dir=Path(args.onnx_dir),
+        quantize=quantize,
+        num_threads=args.threads,
+    )
+    report = {"quantized": quantize, "threads": args.threads}
+
+    # 1. 임베딩 모델
+    torch_model = inference_backend.load_embedder(EMBED_MODEL_NAME, backend="torch")
+    onnx_model = inference_backend.load_embedder(EMBED_MODEL_NAME, **onnx_kwargs)
+
+    # 인덱스 / 검색과 동일하게 패시지는 passage adapter, 쿼리는 query adapter로 임베딩
+    tasks = indexing.DEFAULT_EMBED_TASKS
+    torch_chunks, _ = _timed_encode(torch_model, content, tasks["passage"])
+    onnx_chunks, _ = _timed_encode(onnx_model, content, tasks["passage"])
+    torch_queries, torch_ms = _timed_encode(torch_model, queries, tasks["query"])
+    onnx_queries, onnx_ms = _timed_encode(onnx_model, queries, tasks["query"])
+
+    # task adapter마다 ONNX 그래프가 따로 있으므로 task별로 확인
+    cosines = {
+        tasks["passage"]: np.sum(torch_chunks * onnx_chunks, axis=1),
+        tasks["query"]: np.sum(torch_queries * onnx_queries, axis=1),
+    }
+    overlap = _topk_overlap(
+        torch_queries @ torch_chunks.T, onnx_queries @ onnx_chunks.T, args.top_k
+    )
+    report["embedder"] = {
+        "cosine": {
+            task: {"min": float(cosine.min()), "mean": float(cosine.mean())}
+            for task, cosine in cosines.items()
+        },
+        f"top{args.top_k}_overlap": overlap,
+        "torch_ms_per_query": round(torch_ms, 2),
+        "onnx_ms_per_query": round(onnx_ms, 2),
+    }
+    print("\n📊 Embedder drift:")
+    for task, cosine in cosines.items():
+        print(
+            f"  - Cosine {task} (torch vs onnx): "
+            f"min {cosine.min():.4f}, mean {cosine.mean():.4f}"
+        )
+    print(f"  - Top-{args.top_k} retrieval overlap: {overlap:.3f}")
+    print(f"  - Query latency: torch {torch_ms:.1f} ms -> onnx {onnx_ms:.1f} ms")
+
+    passed = (
+        all(cosine.min() >= args.min_cosine for cosine in cosines.values())
+        and overlap >= args.min_topk_overlap
+    )
+
+    # 2. Reranker (각 summary 쿼리 vs torch 기준 top 후보)
+    if not args.skip_reranker:
+        del torch_model, onnx_model
+        torch_reranker = inference_backend.load_reranker(RERANKER_NAME, backend="torch")
+        onnx_reranker = inference_backend.load_reranker(RERANKER_NAME, **onnx_kwargs)
+
+        candidates = np.argsort(-(torch_queries @ torch_chunks.T), axis=1)[:, :8]
+        abs_errors, spearman, top1 = [], [], []
+        torch_seconds = onnx_seconds = 0.0
+        for query, cand in zip(queries, candidates):
+            pairs = [[query, content[i]] for i in cand]
+            start = time.perf_counter()
+            torch_scores = np.asarray(torch_reranker.score(pairs), dtype=np.float32)
+            torch_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            onnx_scores = np.asarray(onnx_reranker.score(pairs), dtype=np.float32)
+            onnx_seconds += time.perf_counter() - start
+
+            abs_errors.append(np.abs(torch_scores - onnx_scores).max())
+            spearman.append(_spearman(torch_scores, onnx_scores))
+            top1.append(int(np.argmax(torch_scores) == np.argmax(onnx_scores)))
+
+        report["reranker"] = {
+            "max_abs_error": float(np.max(abs_errors)),
+            "spearman_mean": float(np.mean(spearman)),
+            "top1_agreement": float(np.mean(top1)),
+            "torch_ms_per_query": round(torch_seconds / len(queries) * 1000, 2),
+            "onnx_ms_per_query": round(onnx_seconds / len(queries) * 1000, 2),
+        }
+        print("\n📊 Reranker drift:")
+        print(f"  - Max |score diff|: {report['reranker']['max_abs_error']:.4f}")
+        print(f"  - Spearman (mean): {report['reranker']['spearman_mean']:.3f}")
+        print(f"  - Top-1 agreement: {report['reranker']['top1_agreement']:.3f}")
+        print(
+            f"  - Rerank latency: torch {report['reranker']['torch_ms_per_query']} ms "
+            f"-> onnx {report['reranker']['onnx_ms_per_query']} ms"
+        )
+        passed = (
+            passed and report["reranker"]["top1_agreement"] >= args.min_topk_overlap
+        )
+
+    report["passed"] = bool(passed)
+    out_path = (
+        Path(args.onnx_dir) / f"drift_report_{'int8' if quantize else 'fp32'}.json"
+    )
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report saved to {out_path}")
+
+    if passed:
+        print("✅ ONNX backend within drift thresholds")
+    else:
+        print("❌ ONNX backend exceeds drift thresholds")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
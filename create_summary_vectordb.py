@@ -1,11 +1,17 @@
 import json
 import os
-from langchain.schema import Document
-from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from transformers import AutoTokenizer
 import torch
 from pathlib import Path
+from rag_pipeline import embedding_pipeline, indexing, vector_search
+
+CHECKPOINT_DIR = Path("./vectordb/.embed_checkpoints/summary")
+# 패시지는 retrieval.passage, 쿼리는 retrieval.query adapter (manifest에 기록, 검색 시 확인)
+EMBED_TASKS = indexing.DEFAULT_EMBED_TASKS
+# FAISS 인덱스에 저장할 Matryoshka 차원 (config.EMBED_DIM과 같아야 함, 전체 차원은 vectors.npy)
+EMBED_DIM = int(os.getenv("EMBED_DIM", 1024))
+# FAISS 인덱스 타입: flat (float32) / int8 / binary (양자화 인덱스는 vectors.npy로 재점수화)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
 
 def main():
     # 1. 데이터 파일 경로 설정
@@ -20,39 +26,14 @@ def main():
         data = json.load(f)
     
     print(f"Loaded {len(data)} examples from JSON file")
-      # 3. summary 텍스트만 추출하여 Document 객체 생성
-    documents = []
-    for idx, item in enumerate(data):
-        if "summary" not in item:
-            print(f"Warning: Item {idx} missing 'summary' field, skipping...")
-            continue
-        
-        summary_text = item["summary"]
-        
-        # metadata 구성 - parent_id는 examples_original.jsonl에서 찾을 수 있는 식별자여야 함
-        metadata = {
-            "source": "examples_text_summary_pair.json",
-            "index": idx,
-            "parent_id": str(idx),  # examples_original.jsonl의 id와 매칭되도록 설정
-        }
-        
-        # id 값이 있으면 metadata에 추가 (Example 1.1, Example 1.2 등)
-        if "id" in item:
-            example_id = item["id"]
-            metadata["example_id"] = example_id
-            # parent_id를 example_id 기반으로 설정 (retrievers.py에서 이 값으로 검색)
-            metadata["parent_id"] = example_id
-        
-        # original 텍스트도 있으면 길이 정보 추가 (검색 결과 분석에 유용)
-        if "original" in item:
-            metadata["original_length"] = len(item["original"])
-        
-        doc = Document(
-            page_content=summary_text,
-            metadata=metadata
-        )
-        documents.append(doc)
-    
+    # 3. summary 텍스트만 추출하여 Document 객체 생성 (update_vectordb.py와 동일한 규칙)
+    documents = indexing.load_summary_documents(Path(data_file))
+
+    # content hash를 docstore id로 사용 (증분 업데이트용), 중복 summary 제거
+    documents, doc_ids, duplicates = indexing.dedupe_documents(documents)
+    if duplicates:
+        print(f"Skipped {duplicates} duplicate summaries")
+
     print(f"Created {len(documents)} Document objects from summaries")
     
     # 문서 확인 (처음 3개 출력)
@@ -70,34 +51,63 @@ def main():
             "trust_remote_code": True,
             "device": "cuda" if torch.cuda.is_available() else "cpu",
         },
-        encode_kwargs={"normalize_embeddings": True},
+        encode_kwargs={
+            "normalize_embeddings": True,
+            **indexing.task_encode_kwargs(EMBED_TASKS["query"]),
+        },
     )
     print(f"Embedding model loaded on {'CUDA' if torch.cuda.is_available() else 'CPU'}")
     
-    # 5. FAISS vector DB 생성
+    # 5. 토큰 길이순 정렬 + 멀티프로세스 배치 임베딩 (중단 시 checkpoint에서 재개)
+    #    GPU / 작은 입력은 현재 프로세스에서 위 모델로 임베딩 (모델을 다시 로드하지 않음)
+    print("Embedding summaries...")
+    documents, vectors, token_counts = embedding_pipeline.embed_corpus(
+        documents,
+        "jinaai/jina-embeddings-v3",
+        checkpoint_dir=CHECKPOINT_DIR,
+        device="cuda" if torch.cuda.is_available() else "cpu",
+        encode_kwargs=indexing.task_encode_kwargs(EMBED_TASKS["passage"]),
+        model=embedding_model.client,
+    )
+
+    # FAISS vector DB 생성 (미리 계산한 임베딩을 EMBED_DIM으로 축소해 사용)
     print("Creating FAISS vector database...")
-    vectordb = FAISS.from_documents(documents, embedding_model)
+    index_vectors = vector_search.truncate_embeddings(vectors, EMBED_DIM)
+    vectordb = vector_search.create_vectorstore(
+        [doc.page_content for doc in documents],
+        index_vectors,
+        embedding_model,
+        metadatas=[doc.metadata for doc in documents],
+        ids=doc_ids,
+        index_type=INDEX_TYPE,
+    )
     
-    # 6. 저장 디렉토리 생성 및 저장
+    # 6. 새 인덱스 버전으로 저장 (BM25 코퍼스 + manifest 포함)
     save_path = "./vectordb/summary_faiss"
-    os.makedirs(save_path, exist_ok=True)
-    
-    vectordb.save_local(save_path)
-    print(f"Successfully created and saved the summary FAISS vector database at {save_path}")
+    version_path = indexing.write_version(
+        Path(save_path),
+        vectordb,
+        manifest={
+            "store": "summary",
+            "embed_model": "jinaai/jina-embeddings-v3",
+            "embed_tasks": EMBED_TASKS,
+            "embed_dim": int(index_vectors.shape[1]),
+            "index_type": INDEX_TYPE,
+            "full_dim": int(vectors.shape[1]),
+            "sources": [data_file],
+        },
+        full_vectors=vectors,
+    )
+    embedding_pipeline.clear_checkpoints(CHECKPOINT_DIR)
+    print(f"Successfully created and saved the summary FAISS vector database at {version_path}")
     
     # 7. 토큰 수 계산 및 분석 (선택적)
     print("Analyzing token statistics...")
     try:
-        tokenizer = AutoTokenizer.from_pretrained("jinaai/jina-embeddings-v3", trust_remote_code=True)
-        
+        # 임베딩 파이프라인에서 배치 토큰화한 결과 재사용
         token_info = []
-        token_counts = []
         
-        for idx, doc in enumerate(documents):
-            tokens = tokenizer.encode(doc.page_content, add_special_tokens=False)
-            token_count = len(tokens)
-            token_counts.append(token_count)
-            
+        for idx, (doc, token_count) in enumerate(zip(documents, token_counts)):
             chunk_data = {
                 "index": idx,
                 "example_id": doc.metadata.get("example_id", f"Unknown_{idx}"),
@@ -132,10 +142,11 @@ def main():
     # 10. 검증: 로드 테스트
     print("\n🔍 Verification: Testing database load...")
     try:
-        test_vectordb = FAISS.load_local(
-            save_path,
-            embeddings=embedding_model,
-            allow_dangerous_deserialization=True,
+        test_vectordb = indexing.load_vectorstore(
+            Path(save_path),
+            embedding_model,
+            embed_tasks=EMBED_TASKS,
+            embed_dim=int(index_vectors.shape[1]),
         )
         
         # 간단한 검색 테스트
@@ -1,80 +1,133 @@
 import json
-# from langchain.document_loaders import TextLoader
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import MarkdownHeaderTextSplitter
+import os
+from pathlib import Path
 # from langchain.vectorstores import FAISS
-from langchain_community.vectorstores import FAISS
 #from langchain.embeddings import HuggingFaceEmbeddings
 
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from transformers import AutoTokenizer
 import torch
-
-# 1. Markdown 파일 로드
-file_path = "./data/test.md"
-loader = TextLoader(file_path, encoding="utf-8")  # 인코딩 문제 없도록 명시
-documents = loader.load()
-
-# docs에서 raw text 추출
-raw_text = documents[0].page_content
-
-# 2. Markdown 헤더 기준 Split
-headers_to_split_on = [("#", "Header1"), ("##", "Header2"), ("###", "Header3"),]
-splitter = MarkdownHeaderTextSplitter(
-    headers_to_split_on=headers_to_split_on,
-    strip_headers=False,
-)
-split_docs = splitter.split_text(raw_text)
-
-
-for doc in split_docs:
-    print(f"{doc.page_content}")
-    print(f"{doc.metadata}", end="\n=====================\n")
-
-# 3. HuggingFace 임베딩 모델 정의
-embedding_model = HuggingFaceEmbeddings(
-    model_name="jinaai/jina-embeddings-v3",
-    model_kwargs={
-        "trust_remote_code": True,
-        "device": "cuda" if torch.cuda.is_available() else "cpu",
-    },
-)
-# 4. FAISS vector DB 생성
-vectordb = FAISS.from_documents(split_docs, embedding_model)
-
-# 5. 저장 (선택)
-vectordb.save_local("./vectordb/faiss")
-
-print("Successfully created and saved the FAISS vector database.")
-
-
-# 5. Tokenizer 불러오기 (token count용)
-tokenizer = AutoTokenizer.from_pretrained("jinaai/jina-embeddings-v3", trust_remote_code=True)
-
-# 6. 토큰 수 계산 및 json 저장용 리스트 생성
-token_info = []
-token_counts = []
-
-for idx, doc in enumerate(split_docs):
-    tokens = tokenizer.encode(doc.page_content, add_special_tokens=False)
-    token_count = len(tokens)
-    token_counts.append(token_count)
-
-    chunk_data = {
-        "chunk_index": idx + 1,
-        "token_count": token_count,
-        "text": doc.page_content,
-        "metadata": doc.metadata,
-    }
-    token_info.append(chunk_data)
-
-# 7. 평균 토큰 수 출력
-avg_tokens = sum(token_counts) / len(token_counts) if token_counts else 0
-print(f"\n📊 Average tokens per chunk: {avg_tokens:.2f}")
-
-# 8. JSON 파일로 저장
-json_save_path = "./vectordb/token_info.json"
-with open(json_save_path, "w", encoding="utf-8") as f:
-    json.dump(token_info, f, indent=2, ensure_ascii=False)
-
-print(f"📝 Token info saved to {json_save_path}")
\ No newline at end of file
+from rag_pipeline import chunking, embedding_pipeline, indexing, vector_search
+
+EMBED_MODEL_NAME = "jinaai/jina-embeddings-v3"
+CHECKPOINT_DIR = Path("./vectordb/.embed_checkpoints/content")
+# 패시지는 retrieval.passage, 쿼리는 retrieval.query adapter (manifest에 기록, 검색 시 확인)
+EMBED_TASKS = indexing.DEFAULT_EMBED_TASKS
+# FAISS 인덱스에 저장할 Matryoshka 차원 (config.EMBED_DIM과 같아야 함, 전체 차원은 vectors.npy)
+EMBED_DIM = int(os.getenv("EMBED_DIM", 1024))
+# FAISS 인덱스 타입: flat (float32) / int8 / binary (양자화 인덱스는 vectors.npy로 재점수화)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+# 청크당 최대 토큰 수 (jina tokenizer 기준, 넘는 섹션은 문단 / 문장 단위로 재분할, 0이면 헤더 분할만)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 1024))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 128))
+# 헤더 분할기: langchain (기본) / streaming (파일을 한 줄씩 읽어 분할, 큰 markdown용, manifest에 기록)
+CONTENT_SPLITTER = os.getenv("CONTENT_SPLITTER", "langchain")
+
+
+def main():
+    # 1. Markdown 파일 로드 + 헤더 기준 Split + 토큰 예산 재분할 (update_vectordb.py와 동일한 규칙)
+    file_path = "./data/test.md"
+    chunker = (
+        chunking.TokenBudgetChunker.from_pretrained(
+            EMBED_MODEL_NAME,
+            max_tokens=CHUNK_MAX_TOKENS,
+            overlap_tokens=CHUNK_OVERLAP_TOKENS,
+        )
+        if CHUNK_MAX_TOKENS > 0
+        else None
+    )
+    split_docs = indexing.load_content_documents(
+        [Path(file_path)], chunker=chunker, splitter=CONTENT_SPLITTER
+    )
+
+    # content hash를 docstore id로 사용 (증분 업데이트용), 중복 청크 제거
+    split_docs, doc_ids, duplicates = indexing.dedupe_documents(split_docs)
+    if duplicates:
+        print(f"Skipped {duplicates} duplicate chunks")
+
+    for doc in split_docs:
+        print(f"{doc.page_content}")
+        print(f"{doc.metadata}", end="\n=====================\n")
+
+    # 2. HuggingFace 임베딩 모델 정의 (쿼리 임베딩 함수 + 현재 프로세스 임베딩에 재사용)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    embedding_model = HuggingFaceEmbeddings(
+        model_name=EMBED_MODEL_NAME,
+        model_kwargs={
+            "trust_remote_code": True,
+            "device": device,
+        },
+        encode_kwargs={
+            "normalize_embeddings": True,
+            **indexing.task_encode_kwargs(EMBED_TASKS["query"]),
+        },
+    )
+
+    # 3. 토큰 길이순 정렬 + 멀티프로세스 배치 임베딩 (중단 시 checkpoint에서 재개)
+    #    GPU / 작은 입력은 현재 프로세스에서 위 모델로 임베딩 (모델을 다시 로드하지 않음)
+    split_docs, vectors, token_counts = embedding_pipeline.embed_corpus(
+        split_docs,
+        EMBED_MODEL_NAME,
+        checkpoint_dir=CHECKPOINT_DIR,
+        device=device,
+        encode_kwargs=indexing.task_encode_kwargs(EMBED_TASKS["passage"]),
+        model=embedding_model.client,
+    )
+
+    # 4. FAISS vector DB 생성 (미리 계산한 임베딩을 EMBED_DIM으로 축소해 사용)
+    index_vectors = vector_search.truncate_embeddings(vectors, EMBED_DIM)
+    vectordb = vector_search.create_vectorstore(
+        [doc.page_content for doc in split_docs],
+        index_vectors,
+        embedding_model,
+        metadatas=[doc.metadata for doc in split_docs],
+        ids=doc_ids,
+        index_type=INDEX_TYPE,
+    )
+
+    # 5. 새 인덱스 버전으로 저장 (BM25 코퍼스 + manifest 포함, CURRENT 포인터 원자적 교체)
+    version_path = indexing.write_version(
+        Path("./vectordb/faiss"),
+        vectordb,
+        manifest={
+            "store": "content",
+            "embed_model": EMBED_MODEL_NAME,
+            "embed_tasks": EMBED_TASKS,
+            "embed_dim": int(index_vectors.shape[1]),
+            "index_type": INDEX_TYPE,
+            "full_dim": int(vectors.shape[1]),
+            "chunking": chunker.to_dict() if chunker else None,
+            "splitter": CONTENT_SPLITTER,
+            "sources": [file_path],
+        },
+        full_vectors=vectors,
+    )
+    embedding_pipeline.clear_checkpoints(CHECKPOINT_DIR)
+    print(f"Index version written to {version_path}")
+
+    print("Successfully created and saved the FAISS vector database.")
+
+    # 6. 토큰 수 json 저장용 리스트 생성 (임베딩 파이프라인에서 배치 토큰화한 결과 재사용)
+    token_info = []
+    for idx, (doc, token_count) in enumerate(zip(split_docs, token_counts)):
+        chunk_data = {
+            "chunk_index": idx + 1,
+            "token_count": token_count,
+            "text": doc.page_content,
+            "metadata": doc.metadata,
+        }
+        token_info.append(chunk_data)
+
+    # 7. 평균 토큰 수 출력
+    avg_tokens = sum(token_counts) / len(token_counts) if token_counts else 0
+    print(f"\n📊 Average tokens per chunk: {avg_tokens:.2f}")
+
+    # 8. JSON 파일로 저장
+    json_save_path = "./vectordb/token_info.json"
+    with open(json_save_path, "w", encoding="utf-8") as f:
+        json.dump(token_info, f, indent=2, ensure_ascii=False)
+
+    print(f"📝 Token info saved to {json_save_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,42 @@
-import os
+"""
+챕터 markdown -> subsection 단위 청크 (JSONL)
+
+챕터 파일들을 여러 프로세스에서 동시에 처리하고, 끝난 챕터부터 (파일 순서 유지) 한 줄씩 기록합니다.
+각 청크의 id는 indexing.subsection_id (파일명, # / ## 헤더 경로, 같은 경로 안에서의 순번)로 만들어
+본문이 바뀌어도 유지되고, 인덱스 빌더 (indexing.load_content_documents)가 청크마다 붙이는
+metadata["subsection_id"]와 같은 값이라 subsection 단위로 인덱스 청크를 찾을 수 있습니다.
+content_hash로 이전 실행 결과와 비교해 내용 변경 여부를 확인할 수 있습니다.
+
+    python -m data.md_content.split_by_subsection --workers 4
+"""
+
+import argparse
+import hashlib
 import json
+import os
 import re
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
 import tiktoken
 
+from rag_pipeline import indexing
+
 # 디렉토리 및 저장 파일 경로
 MD_DIR = "./data/md_content"
-OUTPUT_JSON = "./data/md_content/subsection_text.json"
+OUTPUT_JSONL = "./data/md_content/subsection_text.jsonl"
 
-# 토크나이저 (GPT-3.5 기준)
+# 토크나이저 (GPT-3.5 기준, import 시 로드 -> 부모 프로세스와 각 worker 프로세스에서 한 번씩)
 tokenizer = tiktoken.encoding_for_model("gpt-3.5-turbo")
 
+HEADER_RE = re.compile(r"^(#{1,2})\s+(.+)")
+
 
 def read_markdown_files(directory: str) -> List[str]:
-    return [
+    return sorted(
         os.path.join(directory, fname)
         for fname in os.listdir(directory)
         if fname.endswith(".md")
-    ]
+    )
 
 
 def split_by_headers(content: str) -> List[str]:
@@ -31,45 +50,88 @@ def split_by_headers(content: str) -> List[str]:
     return [chunk.strip() for chunk in chunks if chunk.strip()]
 
 
-def count_tokens(text: str) -> int:
-    return len(tokenizer.encode(text))
-
-
-def process_markdown_files():
-    all_chunks: List[Dict] = []
+def content_hash(text: str) -> str:
+    """청크 텍스트 (헤더 줄 포함)의 sha256 앞 32자리"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _update_headers(headers: Dict[str, str], chunk: str) -> Dict[str, str]:
+    """청크 첫 줄이 헤더면 헤더 경로 갱신 (## 는 상위 # 유지)"""
+    match = HEADER_RE.match(chunk.split("\n", 1)[0])
+    if match is None:
+        return headers
+    title = match.group(2).strip()
+    if len(match.group(1)) == 1:
+        return {"Header1": title}
+    return {**{k: v for k, v in headers.items() if k == "Header1"}, "Header2": title}
+
+
+def process_file(path: str) -> List[Dict]:
+    """챕터 파일 하나 -> subsection 레코드 리스트 (worker 프로세스에서 실행)"""
+    file_name = os.path.basename(path)
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    chunks = split_by_headers(content)
+    token_counts = [len(ids) for ids in tokenizer.encode_batch(chunks)]
+
+    records = []
+    headers: Dict[str, str] = {}
+    occurrences: Dict[str, int] = {}
+    for chunk, token_count in zip(chunks, token_counts):
+        headers = _update_headers(headers, chunk)
+        path_key = json.dumps(headers, sort_keys=True, ensure_ascii=False)
+        occurrence = occurrences.get(path_key, 0)
+        occurrences[path_key] = occurrence + 1
+        records.append(
+            {
+                "id": indexing.subsection_id(file_name, headers, occurrence),
+                "file": file_name,
+                "headers": headers,
+                "text": chunk,
+                "token_count": token_count,
+                "content_hash": content_hash(chunk),
+            }
+        )
+    return records
+
+
+def process_markdown_files(
+    md_dir: str = MD_DIR, output_path: str = OUTPUT_JSONL, workers: int = 0
+):
     total_tokens = 0
     total_chunks = 0
 
-    md_files = read_markdown_files(MD_DIR)
-    for path in md_files:
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-        chunks = split_by_headers(content)
-
-        for chunk in chunks:
-            token_count = count_tokens(chunk)
-            all_chunks.append(
-                {
-                    "file": os.path.basename(path),
-                    "text": chunk,
-                    "token_count": token_count,
-                }
-            )
-            total_tokens += token_count
-            total_chunks += 1
-
-    # JSON 파일로 저장
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as out_f:
-        json.dump(all_chunks, out_f, ensure_ascii=False, indent=2)
+    md_files = read_markdown_files(md_dir)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out_f:
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            # 파일 순서대로, 끝난 챕터부터 바로 기록 (전체를 메모리에 모으지 않음)
+            for path, records in zip(md_files, pool.map(process_file, md_files)):
+                for record in records:
+                    out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    total_tokens += record["token_count"]
+                    total_chunks += 1
+                out_f.flush()
+                print(f"  - {os.path.basename(path)}: {len(records)} subsections")
+    os.replace(tmp_path, output_path)  # 중간에 실패하면 이전 출력 유지
 
     # 평균 토큰 수 출력
     if total_chunks > 0:
         average_tokens = total_tokens / total_chunks
         print(f"✅ 총 청크 수: {total_chunks}")
         print(f"✅ 평균 토큰 수: {average_tokens:.2f}")
+        print(f"✅ 저장 위치: {output_path}")
     else:
         print("⚠️ 처리된 청크가 없습니다.")
 
 
 if __name__ == "__main__":
-    process_markdown_files()
+    parser = argparse.ArgumentParser(description="Split chapter markdown by subsection")
+    parser.add_argument("--input-dir", default=MD_DIR)
+    parser.add_argument("--output", default=OUTPUT_JSONL)
+    parser.add_argument(
+        "--workers", type=int, default=0, help="worker processes (0: CPU count)"
+    )
+    args = parser.parse_args()
+
+    process_markdown_files(args.input_dir, args.output, args.workers)
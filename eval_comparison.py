@@ -1,21 +1,24 @@
 import os
 import sys
 import json
-import copy
 import time
-import importlib
+import itertools
 from tqdm import tqdm
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any
 import torch
 from evaluation.eval_utils import math_grader, science_grader
-from rag_pipeline import config
+from rag_pipeline import config, retrievers, utils
+from rag_pipeline.llm_cache import LLMCache, cache_openai
+from rag_pipeline.settings import RunSettings
 from evaluation.eval_vectordb import load_dataset, extract_box_content
+from main import run
 
 INPUT_PATH = Path("./evaluation/eval_utils/eval_neamen.jsonl")
 OUTPUT_DIR = Path("./eval_output")
 RESULTS_PATH = OUTPUT_DIR / "comparison_results.json"
 LOG_PATH = OUTPUT_DIR / "comparison_log.txt"
+LLM_CACHE_PATH = OUTPUT_DIR / "llm_cache.jsonl"
 
 # Define all setting combinations to test
 QUERY_TYPES = [None, "hyde", "summary"]
@@ -35,99 +38,73 @@ def log_message(message: str):
         f.write(message + "\n")
 
 
-def update_config(top_k: int, sim_threshold: float, rerank: bool):
-    """Update config.py file with new values"""
-    os.environ["TOP_K"] = str(top_k)
-    os.environ["SIM_THRESHOLD"] = str(sim_threshold)
-    os.environ["RERANK"] = str(rerank)
-
-    # Force reload any modules that might have imported config
-    importlib.reload(config)
-
-    log_message(
-        f"Updated config: TOP_K={top_k}, SIM_THRESHOLD={sim_threshold}, RERANK={rerank}"
-    )
-
-
-def run_evaluation(
-    query_type: Optional[str],
-    hybrid_weights: Optional[List[float]],
-    top_k: int,
-    sim_threshold: float,
-    rerank: bool,
-) -> Tuple[int, int, List[Dict[str, Any]]]:
-    """
-    Run evaluation for a specific configuration
-    Returns (score, total_count, detailed_results)
-    """
-    # Update configuration
-    update_config(top_k, sim_threshold, rerank)
-
-    # Import run function after config update to ensure it uses updated settings
-    from main import run
-
-    # Load dataset
-    data = load_dataset(INPUT_PATH)
-    total_records = len(data)
-    score = 0
-    detailed_results = []
-
-    log_message(
-        f"Starting evaluation with settings: query_type={query_type}, "
-        f"hybrid_weights={hybrid_weights}, TOP_K={top_k}, "
-        f"SIM_THRESHOLD={sim_threshold}, RERANK={rerank}"
+def build_settings_grid() -> List[RunSettings]:
+    """모든 설정 조합 (immutable RunSettings, 검색 node에 그대로 전달)"""
+    return [
+        RunSettings(
+            retrieval_type=query_type or "original_query",
+            hybrid_weight=hybrid_weights[0],
+            top_k=top_k,
+            sim_threshold=sim_threshold,
+            rerank=rerank,
+        )
+        for query_type, hybrid_weights, top_k, sim_threshold, rerank in itertools.product(
+            QUERY_TYPES, HYBRID_WEIGHTS, TOP_K_VALUES, SIM_THRESHOLDS, RERANK_OPTIONS
+        )
+    ]
+
+
+def describe(settings: RunSettings) -> Dict[str, Any]:
+    return {
+        "query_type": (
+            None
+            if settings.retrieval_type == "original_query"
+            else settings.retrieval_type
+        ),
+        "hybrid_weights": settings.hybrid_weights,
+        "top_k": settings.top_k,
+        "sim_threshold": settings.sim_threshold,
+        "rerank": settings.rerank,
+    }
+
+
+def evaluate_record(record: Dict[str, Any], settings: RunSettings) -> Dict[str, Any]:
+    """record 하나를 주어진 설정으로 실행 + 채점"""
+    graph_state = run(record["problem"], pdf_path=None, settings=settings)
+
+    llm_output = graph_state["answer"]
+    predicted_answer = extract_box_content(llm_output)
+    gt_answer = record["answer"]
+
+    # Grade the answer
+    answer_correct = science_grader.numerical_approx_match(
+        predicted_answer,
+        gt_answer,
+        tolerance=1e-2,
     )
 
-    # Loop through each problem in dataset
-    for record in tqdm(data, total=total_records, desc="Evaluating"):
-        try:
-            # Run the RAG pipeline with current settings
-            graph_state = run(
-                record["problem"],
-                pdf_path=None,
-                query_type=query_type,
-                hybrid_weights=hybrid_weights,
-            )
-
-            llm_output = graph_state["answer"]
-            predicted_answer = extract_box_content(llm_output)
-            gt_answer = record["answer"]
-
-            # Grade the answer
-            answer_correct = science_grader.numerical_approx_match(
-                predicted_answer,
-                gt_answer,
-                tolerance=1e-2,
-            )
-
-            if answer_correct == 1.0:
-                answer_correct_str = "Yes"
-                score += 1
-            else:
-                answer_correct_str = "No"
-
-            # Store detailed result
-            detailed_results.append(
-                {
-                    "id": record["id"],
-                    "problem": record["problem"],
-                    "explanation": graph_state["explanation"],
-                    "context": graph_state["context"],
-                    "score": graph_state["score"],
-                    "predicted_answer": predicted_answer,
-                    "gt_answer": gt_answer,
-                    "answer_correct": answer_correct_str,
-                }
-            )
-
-        except Exception as e:
-            tqdm.write(f"[Error id={record['id']}] {str(e)}")
-            detailed_results.append(
-                {"id": record["id"], "problem": record["problem"], "error": str(e)}
-            )
-
-    log_message(f"Evaluation completed with score: {score}/{total_records}")
-    return score, total_records, detailed_results
+    return {
+        "id": record["id"],
+        "problem": record["problem"],
+        "explanation": graph_state["explanation"],
+        "context": graph_state["context"],
+        "score": graph_state["score"],
+        "predicted_answer": predicted_answer,
+        "gt_answer": gt_answer,
+        "answer_correct": "Yes" if answer_correct == 1.0 else "No",
+    }
+
+
+def save_results(all_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    best = max(all_results, key=lambda r: r["score"], default=None)
+    summary = {
+        "best_configuration": best["configuration"] if best else {},
+        "best_score": best["score"] if best else 0,
+        "results": all_results,
+    }
+    with open(RESULTS_PATH, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
 
 
 def main():
@@ -143,87 +120,60 @@ def main():
     with open(LOG_PATH, "w") as f:
         f.write(f"Evaluation started at {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
 
-    # Results will contain all evaluation outcomes
-    all_results = []
-
-    # Get total number of combinations to test
-    total_combinations = (
-        len(QUERY_TYPES)
-        * len(HYBRID_WEIGHTS)
-        * len(TOP_K_VALUES)
-        * len(SIM_THRESHOLDS)
-        * len(RERANK_OPTIONS)
-    )
-    log_message(f"Total combinations to evaluate: {total_combinations}")
+    # 모델 / 인덱스는 retrievers.engine 하나를 모든 설정이 공유 (module reload 없음)
+    # - 1단계 검색은 가장 큰 TOP_K로 한 번만 수행하고 설정별로 잘라 사용
+    # - LLM 응답은 요청 단위로 캐시 (디스크에도 저장 -> 스윕 재실행 시 재사용)
+    retrievers.engine.first_stage_k = max(TOP_K_VALUES)
+    llm_cache = LLMCache(LLM_CACHE_PATH)
+    cache_openai(utils.client, llm_cache)
 
-    # Track best configuration
-    best_score = 0
-    best_config = {}
-
-    # Progress counter
-    current_combination = 0
+    data = load_dataset(INPUT_PATH)
+    grid = build_settings_grid()
+    log_message(f"Total combinations to evaluate: {len(grid)} x {len(data)} problems")
+
+    all_results = [
+        {
+            "configuration": describe(settings),
+            "score": 0,
+            "total": 0,
+            "accuracy": 0,
+            "elapsed_seconds": 0.0,
+            "detailed_results": [],
+        }
+        for settings in grid
+    ]
 
     try:
-        # Iterate through all combinations
-        for query_type in QUERY_TYPES:
-            for hybrid_weights in HYBRID_WEIGHTS:
-                for top_k in TOP_K_VALUES:
-                    for sim_threshold in SIM_THRESHOLDS:
-                        for rerank in RERANK_OPTIONS:
-                            current_combination += 1
-                            log_message(
-                                f"\n--- Combination {current_combination}/{total_combinations} ---"
-                            )
-                            # Run evaluation for current configuration
-                            config_name = f"type={query_type}_weights={hybrid_weights}_k={top_k}_sim={sim_threshold}_rerank={rerank}"
-                            log_message(f"Testing configuration: {config_name}")
-
-                            start_time = time.time()
-                            score, total, details = run_evaluation(
-                                query_type, hybrid_weights, top_k, sim_threshold, rerank
-                            )
-                            elapsed_time = time.time() - start_time
-
-                            # Create result entry
-                            result = {
-                                "configuration": {
-                                    "query_type": query_type,
-                                    "hybrid_weights": hybrid_weights,
-                                    "top_k": top_k,
-                                    "sim_threshold": sim_threshold,
-                                    "rerank": rerank,
-                                },
-                                "score": score,
-                                "total": total,
-                                "accuracy": (
-                                    round(score / total * 100, 2) if total > 0 else 0
-                                ),
-                                "elapsed_seconds": round(elapsed_time, 2),
-                                "detailed_results": details,
-                            }
-
-                            # Add to results list
-                            all_results.append(result)
-
-                            # Update best configuration if needed
-                            if score > best_score:
-                                best_score = score
-                                best_config = result["configuration"]
-
-                            # Save intermediate results
-                            with open(RESULTS_PATH, "w", encoding="utf-8") as f:
-                                json.dump(
-                                    {
-                                        "best_configuration": best_config,
-                                        "best_score": best_score,
-                                        "results": all_results,
-                                    },
-                                    f,
-                                    ensure_ascii=False,
-                                    indent=2,
-                                )
-
-                            log_message(f"Saved intermediate results to {RESULTS_PATH}")
+        # 문제 단위로 모든 설정을 실행 -> 같은 질문의 캐시 (쿼리 변환 / 1단계 검색 / LLM 응답)가
+        # 작은 LRU 안에 있을 때 재사용됨
+        for record in tqdm(data, total=len(data), desc="Evaluating"):
+            for settings, result in zip(grid, all_results):
+                start_time = time.time()
+                try:
+                    with llm_cache.scope():
+                        detail = evaluate_record(record, settings)
+                    if detail["answer_correct"] == "Yes":
+                        result["score"] += 1
+                except Exception as e:
+                    tqdm.write(f"[Error id={record['id']}] {str(e)}")
+                    detail = {
+                        "id": record["id"],
+                        "problem": record["problem"],
+                        "error": str(e),
+                    }
+                result["total"] += 1
+                result["accuracy"] = round(result["score"] / result["total"] * 100, 2)
+                result["elapsed_seconds"] = round(
+                    result["elapsed_seconds"] + time.time() - start_time, 2
+                )
+                result["detailed_results"].append(detail)
+
+            # Save intermediate results
+            save_results(all_results)
+            log_message(
+                f"Problem {record['id']} done "
+                f"(LLM cache: {llm_cache.hits} hits / {llm_cache.misses} misses)"
+            )
 
     except KeyboardInterrupt:
         log_message("\nEvaluation interrupted by user. Saving partial results...")
@@ -231,20 +181,12 @@ def main():
         log_message(f"\nError during evaluation: {str(e)}")
 
     # Save final results
-    with open(RESULTS_PATH, "w", encoding="utf-8") as f:
-        json.dump(
-            {
-                "best_configuration": best_config,
-                "best_score": best_score,
-                "results": all_results,
-            },
-            f,
-            ensure_ascii=False,
-            indent=2,
-        )
+    summary = save_results(all_results)
 
     log_message(f"\nEvaluation completed!")
-    log_message(f"Best configuration: {best_config} with score {best_score}")
+    log_message(
+        f"Best configuration: {summary['best_configuration']} with score {summary['best_score']}"
+    )
     log_message(f"All results saved to {RESULTS_PATH}")
 
 
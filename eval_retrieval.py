@@ -0,0 +1,364 @@
+"""
+LLM 없이 검색 품질만 평가 (recall@k / MRR / nDCG@k)
+
+eval_vectordb.py는 질문마다 LLM 파이프라인 전체를 돌려 최종 답만 채점합니다.
+이 스크립트는 라벨 (질문, 정답 청크 / 예제 id)만으로 임베딩 모델 + 인덱스 + BM25를 사용해
+retrieval type x dense / hybrid weight 조합별 지표를 계산하므로 TOP_K / HYBRID_WEIGHT 튜닝을
+토큰 비용 없이 빠르게 반복할 수 있습니다.
+
+라벨 (JSONL, 한 줄에 질문 하나):
+    {"id": "q1", "question": "...", "relevant_chunks": ["neamen_ch4.md > 4.1 ...", ...],
+     "relevant_examples": ["Example 4.3", ...]}
+- question 대신 eval 데이터셋의 problem 필드도 사용 가능
+- relevant_chunks: 본문 DB (CONTENT_DB_PATH) 정답. indexing.chunk_key (source > 헤더 경로),
+  chunk hash, section_id 또는 subsection_id (split_by_subsection.py 레코드 id)
+  토큰 예산으로 나뉜 섹션은 chunk_key 끝에 " #n"이 붙지만, 순번 없는 "source > 헤더 경로"나
+  section_id로 적으면 그 섹션의 조각 중 처음 검색된 것이 적중
+- relevant_examples: summary / examples DB (SUMMARY_DB_PATH) 정답. parent_id (examples_original.jsonl id)
+  query expansion 검색 (질문 + 본문 top-k로 확장한 쿼리)으로 평가
+
+LLM 쿼리 변환 (summary / summary_mean / hyde)은 --plans 파일에 저장된 변환 결과로 평가하고
+없으면 건너뜁니다. --generate-plans를 주면 누락된 변환만 한 번 LLM으로 생성해 파일에 추가합니다.
+
+    python eval_retrieval.py --labels ./eval_retrieval.jsonl --ks 1 3 5 10 --weights 0.3 0.5 0.7
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+# config는 OPENAI_API_KEY가 없으면 에러 -> LLM을 호출하지 않는 평가는 더미 키로 충분
+os.environ.setdefault("OPENAI_API_KEY", "offline-eval")
+
+from rag_pipeline import config, indexing, retrievers
+from rag_pipeline.retrieval_engine import Candidate, QueryPlan
+
+LABELS_PATH = Path("./eval_retrieval.jsonl")
+PLANS_PATH = Path("./eval_output/retrieval_plans.jsonl")
+OUTPUT_PATH = Path("./eval_output/retrieval_metrics.json")
+
+RETRIEVAL_TYPES = ["original_query", "summary", "summary_mean", "hyde"]
+LLM_TRANSFORMS = {"summary", "summary_mean", "hyde"}
+
+
+def load_labels(path: Path) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    labels = []
+    for idx, record in enumerate(records):
+        question = record.get("question") or record.get("problem")
+        if not question:
+            print(f"Warning: Label {idx} has no question, skipping...")
+            continue
+        labels.append(
+            {
+                "id": record.get("id", idx),
+                "question": question,
+                "relevant_chunks": [str(r) for r in record.get("relevant_chunks", [])],
+                "relevant_examples": [
+                    str(r) for r in record.get("relevant_examples", [])
+                ],
+            }
+        )
+    return labels
+
+
+# ----- LLM 쿼리 변환 캐시 -----
+def load_plans(path: Path) -> Dict[Tuple[str, str], QueryPlan]:
+    plans: Dict[Tuple[str, str], QueryPlan] = {}
+    if not path.exists():
+        return plans
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            plans[(item["transform"], item["query"])] = QueryPlan(
+                item["query"],
+                item["texts"],
+                item.get("role", "query"),
+                item.get("lexical_query", item["texts"][0]),
+            )
+    return plans
+
+
+def append_plan(path: Path, transform: str, plan: QueryPlan) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        item = {
+            "transform": transform,
+            "query": plan.query,
+            "texts": plan.texts,
+            "role": plan.role,
+            "lexical_query": plan.lexical_query,
+        }
+        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+def get_plan(
+    transform: str,
+    question: str,
+    plans: Dict[Tuple[str, str], QueryPlan],
+    plans_path: Path,
+    generate: bool,
+) -> Optional[QueryPlan]:
+    """original_query는 바로, LLM 변환은 캐시 (없고 generate면 생성 후 저장)"""
+    if transform not in LLM_TRANSFORMS:
+        return retrievers.engine.transform(transform, question)
+    if (transform, question) in plans:
+        return plans[(transform, question)]
+    if not generate:
+        return None
+    plan = retrievers.engine.transform(transform, question)
+    plans[(transform, question)] = plan
+    append_plan(plans_path, transform, plan)
+    return plan
+
+
+# ----- 지표 -----
+def doc_ids(doc) -> set:
+    """라벨과 비교할 문서 식별자 (chunk key / chunk hash / section id / parent id / example id)"""
+    key = indexing.chunk_key(doc)
+    ids = {key, indexing.chunk_hash(doc.page_content)}
+    if "section_chunk" in doc.metadata:
+        # 토큰 예산 분할 조각: 순번 (" #n") 없는 섹션 키로도 매칭
+        ids.add(key.rsplit(" #", 1)[0])
+    for field in ("section_id", "subsection_id", "parent_id", "example_id"):
+        if doc.metadata.get(field) is not None:
+            ids.add(str(doc.metadata[field]))
+    return ids
+
+
+def hit_list(docs, relevant: Sequence[str]) -> List[bool]:
+    """순위별 적중 여부 (같은 정답 id는 처음 나온 문서만 적중으로 계산)"""
+    remaining = set(relevant)
+    hits = []
+    for doc in docs:
+        matched = doc_ids(doc) & remaining
+        remaining -= matched
+        hits.append(bool(matched))
+    return hits
+
+
+def recall_at_k(hits: List[bool], num_relevant: int, k: int) -> float:
+    return sum(hits[:k]) / num_relevant
+
+
+def reciprocal_rank(hits: List[bool]) -> float:
+    for rank, hit in enumerate(hits, start=1):
+        if hit:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(hits: List[bool], num_relevant: int, k: int) -> float:
+    dcg = sum(1.0 / np.log2(i + 2) for i, hit in enumerate(hits[:k]) if hit)
+    idcg = sum(1.0 / np.log2(i + 2) for i in range(min(num_relevant, k)))
+    return dcg / idcg
+
+
+def query_metrics(hits: List[bool], num_relevant: int, ks: Sequence[int]):
+    metrics = {"mrr": reciprocal_rank(hits)}
+    for k in ks:
+        metrics[f"recall@{k}"] = recall_at_k(hits, num_relevant, k)
+        metrics[f"ndcg@{k}"] = ndcg_at_k(hits, num_relevant, k)
+    return metrics
+
+
+def summarize(per_query: List[Dict[str, float]]) -> Dict[str, float]:
+    if not per_query:
+        return {"questions": 0}
+    summary = {"questions": len(per_query)}
+    for key in per_query[0]:
+        summary[key] = round(float(np.mean([m[key] for m in per_query])), 4)
+    return summary
+
+
+# ----- 검색 -----
+def setting_name(weight: Optional[float]) -> str:
+    return "dense" if weight is None else f"hybrid@{weight:g}"
+
+
+def rank_settings(
+    corpus,
+    plan: QueryPlan,
+    weights: Sequence[Optional[float]],
+    k: int,
+    rerank: bool,
+) -> Dict[str, List[Candidate]]:
+    """
+    설정별 top-k (None: dense FAISS 검색 (운영과 동일), float: 해당 dense weight의 hybrid)
+
+    hybrid 후보 (전체 문서 dense + BM25 점수)는 한 번만 계산하고 weight마다 fuse만 다시 수행
+    """
+    engine = retrievers.engine
+    query_vec = engine.embed(plan)
+    ranked: Dict[str, List[Candidate]] = {}
+    hybrid_candidates = None
+    for weight in weights:
+        if weight is None:
+            candidates = engine.search(corpus, plan, query_vec, k, hybrid=False)
+            top = engine.fuse(candidates, "dense", (1.0, 0.0), k)
+        else:
+            if hybrid_candidates is None:
+                hybrid_candidates = engine.search(
+                    corpus, plan, query_vec, k, hybrid=True
+                )
+            top = engine.fuse(
+                hybrid_candidates, "weighted_sum", (weight, 1.0 - weight), k
+            )
+        ranked[setting_name(weight)] = (
+            engine.rerank(plan.query, top)[0] if rerank else top
+        )
+    return ranked
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--labels", type=Path, default=LABELS_PATH)
+    p.add_argument("--types", nargs="+", default=RETRIEVAL_TYPES)
+    p.add_argument("--ks", type=int, nargs="+", default=[1, 3, 5, 10])
+    p.add_argument(
+        "--weights",
+        type=float,
+        nargs="*",
+        default=[0.3, 0.4, 0.5, 0.6, 0.7],
+        help="dense weights for hybrid search (BM25 weight: 1 - w)",
+    )
+    p.add_argument(
+        "--expansion-k",
+        type=int,
+        default=config.TOP_K,
+        help="content docs used to expand the query for the examples DB",
+    )
+    p.add_argument("--rerank", action="store_true", help="rerank top-k")
+    p.add_argument("--plans", type=Path, default=PLANS_PATH)
+    p.add_argument(
+        "--generate-plans",
+        action="store_true",
+        help="call the LLM once for missing query transforms",
+    )
+    p.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    args = p.parse_args()
+
+    if not args.labels.is_file():
+        print(f"labels file not found: {args.labels}", file=sys.stderr)
+        sys.exit(1)
+    unknown = set(args.types) - set(RETRIEVAL_TYPES)
+    if unknown:
+        raise ValueError(
+            f"Unknown retrieval types {sorted(unknown)}. Valid options: {RETRIEVAL_TYPES}"
+        )
+
+    labels = load_labels(args.labels)
+    plans = load_plans(args.plans)
+    engine = retrievers.engine
+    content_corpus = engine.corpus(config.CONTENT_DB_PATH)
+    summary_corpus = None
+    if any(label["relevant_examples"] for label in labels):
+        summary_corpus = engine.corpus(config.SUMMARY_DB_PATH)
+
+    k = max(args.ks)
+    settings: List[Optional[float]] = [None] + args.weights
+    # {index: {type: {setting: [query metrics]}}}
+    per_query: Dict[str, Dict[str, Dict[str, List[Dict[str, float]]]]] = {
+        "content": {},
+        "examples": {},
+    }
+    missing_plans = {t: 0 for t in args.types}
+
+    for label in tqdm(labels, desc="Evaluating retrieval"):
+        question = label["question"]
+        for retrieval_type in args.types:
+            plan = get_plan(
+                retrieval_type, question, plans, args.plans, args.generate_plans
+            )
+            if plan is None:
+                missing_plans[retrieval_type] += 1
+                continue
+
+            ranked = rank_settings(content_corpus, plan, settings, k, args.rerank)
+            if label["relevant_chunks"]:
+                for setting, top in ranked.items():
+                    hits = hit_list([c.doc for c in top], label["relevant_chunks"])
+                    per_query["content"].setdefault(retrieval_type, {}).setdefault(
+                        setting, []
+                    ).append(
+                        query_metrics(hits, len(label["relevant_chunks"]), args.ks)
+                    )
+
+            if label["relevant_examples"] and summary_corpus is not None:
+                # query expansion: 같은 설정의 본문 top-k로 확장한 쿼리로 examples DB 검색
+                for weight in settings:
+                    setting = setting_name(weight)
+                    expanded = retrievers._expanded_query_plan(
+                        question, [c.doc for c in ranked[setting][: args.expansion_k]]
+                    )
+                    examples_top = rank_settings(
+                        summary_corpus, expanded, [weight], k, rerank=False
+                    )[setting]
+                    hits = hit_list(
+                        [c.doc for c in examples_top], label["relevant_examples"]
+                    )
+                    per_query["examples"].setdefault(retrieval_type, {}).setdefault(
+                        setting, []
+                    ).append(
+                        query_metrics(hits, len(label["relevant_examples"]), args.ks)
+                    )
+
+    results = {
+        "settings": {
+            "labels": str(args.labels),
+            "ks": args.ks,
+            "weights": args.weights,
+            "expansion_k": args.expansion_k,
+            "rerank": args.rerank,
+            "embed_model": config.EMBED_MODEL_NAME,
+            "embed_dim": config.EMBED_DIM,
+            "two_stage_search": config.TWO_STAGE_SEARCH,
+        },
+        "missing_plans": missing_plans,
+        "metrics": {
+            index: {
+                retrieval_type: {
+                    setting: summarize(rows) for setting, rows in settings.items()
+                }
+                for retrieval_type, settings in types.items()
+            }
+            for index, types in per_query.items()
+        },
+    }
+
+    report_k = config.TOP_K if config.TOP_K in args.ks else k
+    for index, types in results["metrics"].items():
+        for retrieval_type, settings in types.items():
+            print(f"\n📊 [{index}] {retrieval_type}")
+            for setting, m in settings.items():
+                print(
+                    f"  {setting:<12} n={m['questions']:<4} "
+                    + " ".join(f"R@{k}={m[f'recall@{k}']:.3f}" for k in args.ks)
+                    + f" MRR={m['mrr']:.3f} nDCG@{report_k}={m[f'ndcg@{report_k}']:.3f}"
+                )
+            best = max(settings, key=lambda s: settings[s][f"ndcg@{report_k}"])
+            print(f"  ⭐ best nDCG@{report_k}: {best}")
+    for retrieval_type, count in missing_plans.items():
+        if count:
+            print(
+                f"Warning: {retrieval_type} skipped for {count} questions "
+                f"(no cached query transform in {args.plans}; use --generate-plans)"
+            )
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Finished! Results written at {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,13 @@ import sys
 import json
 import argparse
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict
 from tqdm import tqdm
 from pathlib import Path
 from main import run
+from rag_pipeline import utils
+from rag_pipeline.rate_limit import RateLimiter, limit_openai
 import re
 import torch
 from evaluation import math_grader, science_grader
@@ -49,55 +53,119 @@ def extract_box_content(text: str) -> str | None:
     return None
 
 
+def evaluate_record(record: dict) -> dict:
+    """record 하나 실행 + 채점 (worker 스레드에서 호출)"""
+    graph_state = run(record["problem"])
+
+    llm_output = graph_state["answer"]
+    predicted_answer = extract_box_content(llm_output)
+    gt_answer = record["answer"]
+
+    answer_correct = science_grader.numerical_approx_match(
+        predicted_answer,
+        gt_answer,
+        tolerance=1e-2,
+    )
+
+    return {
+        "id": record["id"],
+        "problem": record["problem"],
+        "context": graph_state["context"],
+        "llm_output": llm_output,
+        "predicted_answer": predicted_answer,
+        "gt_answer": gt_answer,
+        "answer_correct": "Yes" if answer_correct == 1.0 else "No",
+    }
+
+
+def load_checkpoint(path: Path) -> Dict[str, dict]:
+    """
+    이미 기록된 결과 (id -> 결과)
+
+    중단된 실행의 마지막 줄이 잘렸으면 (개행 없음) 파일을 마지막 완전한 줄까지 잘라냄
+    (이어서 append하는 결과가 잘린 줄 뒤에 붙어 함께 손상되지 않도록)
+    """
+    done: Dict[str, dict] = {}
+    if not path.is_file():
+        return done
+    complete_end = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete_end += len(line)
+            try:
+                out_obj = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            done[str(out_obj["id"])] = out_obj
+    if complete_end < path.stat().st_size:
+        with open(path, "r+b") as f:
+            f.truncate(complete_end)
+    return done
+
+
 def main():
-    if not INPUT_PATH.is_file():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=Path, default=INPUT_PATH)
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="records evaluated concurrently"
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=float(os.getenv("OPENAI_RPM", 0)),
+        help="OpenAI requests per minute across all workers (0: unlimited)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip records already written to the output file",
+    )
+    args = parser.parse_args()
+
+    if not args.input.is_file():
         print(f"input file not found", file=sys.stderr)
     if not RAG_SCRIPT.is_file():
         print(f"RAG script not found", file=sys.stderr)
         sys.exit(1)
 
-    data = load_dataset(INPUT_PATH)
-    total_records = len(data)
-    use_cuda = torch.cuda.is_available()
-    score = 0
-
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as fout:
-        for record in tqdm(data, total=total_records, desc="Evaluating"):
-            try:
-                graph_state = run(record["problem"])
-            except Exception as e:
-                tqdm.write(f"[Error id={record['id']}] {e}")
-                continue
-
-            llm_output = graph_state["answer"]
-            predicted_answer = extract_box_content(llm_output)
-            gt_answer = record["answer"]
-
-            answer_correct = science_grader.numerical_approx_match(
-                predicted_answer,
-                gt_answer,
-                tolerance=1e-2,
-            )
-
-            if answer_correct == 1.0:
-                answer_correct = "Yes"
-                score += 1
-            else:
-                answer_correct = "No"
-
-            out_obj = {
-                "id": record["id"],
-                "problem": record["problem"],
-                "context": graph_state["context"],
-                "llm_output": llm_output,
-                "predicted_answer": predicted_answer,
-                "gt_answer": gt_answer,
-                "answer_correct": answer_correct,
+    data = load_dataset(args.input)
+    done = load_checkpoint(args.output) if args.resume else {}
+    pending = [record for record in data if str(record["id"]) not in done]
+    score = sum(out_obj["answer_correct"] == "Yes" for out_obj in done.values())
+    if done:
+        print(f"Resuming: {len(done)} records already evaluated, {len(pending)} left")
+
+    # 모든 worker가 utils.client를 공유 -> LLM 호출 단위로 RPM 제한
+    if args.rpm > 0:
+        limit_openai(utils.client, RateLimiter(args.rpm))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    # 완료 순서대로 한 줄씩 기록 + flush (중단돼도 --resume으로 이어서 실행)
+    with open(args.output, "a" if args.resume else "w", encoding="utf-8") as fout:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {
+                pool.submit(evaluate_record, record): record for record in pending
             }
-            fout.write(json.dumps(out_obj, ensure_ascii=False, default=str) + "\n")
+            for future in tqdm(
+                as_completed(futures), total=len(futures), desc="Evaluating"
+            ):
+                record = futures[future]
+                try:
+                    out_obj = future.result()
+                except Exception as e:
+                    tqdm.write(f"[Error id={record['id']}] {e}")
+                    continue
+
+                if out_obj["answer_correct"] == "Yes":
+                    score += 1
+                fout.write(json.dumps(out_obj, ensure_ascii=False, default=str) + "\n")
+                fout.flush()
 
     print(f"Score: {score}")
-    print(f"Finished! Results written at {OUTPUT_PATH}")
+    print(f"Finished! Results written at {args.output}")
 
 
 if __name__ == "__main__":
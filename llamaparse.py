@@ -1,17 +1,30 @@
-import os
+"""
+LlamaParse로 교재 PDF -> 페이지별 markdown 추출
+
+여러 PDF를 LlamaParse async API (aload_data)로 동시에 파싱하고,
+내용 (sha256)과 파싱 설정이 같은 파일은 건너뜁니다. (출력 폴더의 .llamaparse_manifest.json, 원본 절대 경로 기준)
+
+    python llamaparse.py text --output-dir data/text_extracted_md --workers 4
+    python llamaparse.py text/chapter15-2.pdf --force
+"""
+
+import argparse
+import asyncio
 import glob
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
 from llama_parse import LlamaParse
 from dotenv import load_dotenv
 
 # 환경 변수 로드
 load_dotenv()
 
-# 입력 및 출력 디렉토리 설정
-input_dir = "/home/jhwang/rag-for-semicon-physics/text"
-output_dir = "/home/jhwang/rag-for-semicon-physics/data/text_extracted_md"
-
-# 출력 디렉토리 생성 (존재하지 않을 경우)
-os.makedirs(output_dir, exist_ok=True)
+MANIFEST_NAME = ".llamaparse_manifest.json"
 
 # parsing instruction 을 지정합니다.
 parsing_instruction = """You are parsing a semiconductor physics textbook. Please accurately extract all content including: 
@@ -19,49 +32,235 @@ parsing_instruction = """You are parsing a semiconductor physics textbook. Pleas
     Preserve the structure and formatting, especially for tables in markdown format.
     All the equations should be in LaTeX format, and tables should be formatted as markdown tables."""
 
-# LlamaParse 설정 (멀티모달 모델 사용)
-parser = LlamaParse(
-    use_vendor_multimodal_model=True,
-    vendor_multimodal_model_name="openai-gpt4o",
-    vendor_multimodal_api_key=os.environ["OPENAI_API_KEY"],
-    result_type="markdown",  # markdown 형식으로 결과 저장
-    language="en",  # 반도체 물리학 교재는 영어로 가정
-    system_prompt_append=parsing_instruction,
-    verbose=True,
-)
 
-# PDF 파일 목록 가져오기
-pdf_files = glob.glob(os.path.join(input_dir, "*.pdf"))
-pdf_files.sort()  # 파일명 순으로 정렬
+def build_parser(model: str, language: str, verbose: bool) -> LlamaParse:
+    # LlamaParse 설정 (멀티모달 모델 사용, 실패한 job은 빈 결과 대신 예외)
+    return LlamaParse(
+        ignore_errors=False,
+        use_vendor_multimodal_model=True,
+        vendor_multimodal_model_name=model,
+        vendor_multimodal_api_key=os.environ["OPENAI_API_KEY"],
+        result_type="markdown",  # markdown 형식으로 결과 저장
+        language=language,  # 반도체 물리학 교재는 영어로 가정
+        system_prompt_append=parsing_instruction,
+        verbose=verbose,
+    )
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def settings_hash(model: str, language: str) -> str:
+    """파싱 결과에 영향을 주는 설정 (바뀌면 모든 파일 다시 파싱)"""
+    body = json.dumps(
+        {"model": model, "language": language, "instruction": parsing_instruction},
+        sort_keys=True,
+    )
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+
+def load_manifest(output_dir: Path) -> Dict[str, dict]:
+    path = output_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir: Path, manifest: Dict[str, dict]) -> None:
+    path = output_dir / MANIFEST_NAME
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def manifest_key(pdf_file: Path) -> str:
+    """파일명이 같은 다른 폴더의 PDF와 구분되도록 절대 경로 기준"""
+    return str(pdf_file.resolve())
+
+
+def claim_output_names(pdf_files: List[Path], manifest: Dict[str, dict]) -> bool:
+    """
+    출력 파일명은 PDF 파일명 (stem) 기준 -> 다른 폴더의 같은 이름 PDF가 서로의 페이지를
+    덮어쓰거나 지우지 않도록 중복이면 중단 (원본이 사라진 manifest 항목은 옮겨진 파일로 보고 이어받음)
+
+    Returns:
+        manifest 항목을 옮겼는지 여부
+    """
+    moved = False
+    by_stem: Dict[str, Path] = {}
+    for pdf_file in pdf_files:
+        other = by_stem.setdefault(pdf_file.stem, pdf_file)
+        if other != pdf_file:
+            raise SystemExit(
+                f"{other} and {pdf_file} would write the same output pages "
+                f"({pdf_file.stem}_page_*.md); rename one or parse them into separate --output-dir"
+            )
+    for key in list(manifest):
+        pdf_file = by_stem.get(Path(key).stem)
+        if pdf_file is None or key == manifest_key(pdf_file):
+            continue
+        if Path(key).exists():
+            raise SystemExit(
+                f"{pdf_file} would overwrite the output pages of {key} in this output directory; "
+                "rename one or use a separate --output-dir"
+            )
+        manifest.setdefault(manifest_key(pdf_file), manifest.pop(key))
+        moved = True
+    return moved
+
+
+def is_up_to_date(
+    entry: Optional[dict], sha256: str, settings: str, output_dir: Path
+) -> bool:
+    return (
+        entry is not None
+        and entry.get("sha256") == sha256
+        and entry.get("settings") == settings
+        and bool(entry.get("outputs"))
+        and all((output_dir / name).exists() for name in entry.get("outputs", []))
+    )
+
+
+def write_pages(
+    base_name: str, texts: List[str], output_dir: Path, previous: List[str]
+) -> List[str]:
+    """각 페이지별로 별도 파일로 저장 -> 저장한 파일명 목록 (이전 실행보다 페이지가 줄었으면 남은 파일 삭제)"""
+    outputs = []
+    for i, text in enumerate(texts):
+        # 페이지 번호를 포함한 파일명 생성 (0부터 시작하므로 +1)
+        name = f"{base_name}_page_{i+1:03d}.md"
+        with open(output_dir / name, "w", encoding="utf-8") as f:
+            f.write(text)
+        outputs.append(name)
+    for name in set(previous) - set(outputs):
+        (output_dir / name).unlink(missing_ok=True)
+    return outputs
+
+
+async def parse_file(
+    parser: LlamaParse,
+    pdf_file: Path,
+    sha256: str,
+    settings: str,
+    output_dir: Path,
+    manifest: Dict[str, dict],
+    semaphore: asyncio.Semaphore,
+) -> Optional[int]:
+    """PDF 하나 파싱 + 저장 -> 페이지 수 (실패 시 None)"""
+    async with semaphore:
+        print(f"처리 중: {pdf_file.name}")
+        start = time.perf_counter()
+        try:
+            # PDF 파싱
+            documents = await parser.aload_data(str(pdf_file))
+        except Exception as e:
+            print(f"오류 발생 - {pdf_file.name}: {str(e)}")
+            return None
+        elapsed = time.perf_counter() - start
+    if not documents:
+        # 빈 결과는 실패로 처리 (이전 출력 / manifest 항목 유지, 다음 실행에서 다시 파싱)
+        print(f"오류 발생 - {pdf_file.name}: 파싱 결과가 비어 있습니다")
+        return None
+
+    key = manifest_key(pdf_file)
+    previous = manifest.get(key, {}).get("outputs", [])
+    outputs = write_pages(
+        pdf_file.stem, [doc.text for doc in documents], output_dir, previous
+    )
+    manifest[key] = {
+        "sha256": sha256,
+        "settings": settings,
+        "pages": len(outputs),
+        "outputs": outputs,
+    }
+    save_manifest(output_dir, manifest)  # 중단돼도 완료된 파일은 다음 실행에서 건너뜀
+    print(f"저장 완료: {pdf_file.name} -> {len(outputs)} pages ({elapsed:.1f}s)")
+    return len(outputs)
+
+
+async def run(args: argparse.Namespace) -> None:
+    pdf_files: List[Path] = []
+    for source in args.sources:
+        if Path(source).is_dir():
+            # PDF 파일 목록 가져오기
+            pdf_files.extend(Path(p) for p in glob.glob(os.path.join(source, "*.pdf")))
+        else:
+            pdf_files.append(Path(source))
+    # 같은 파일을 폴더와 경로로 중복 지정한 경우 한 번만 처리, 파일명 순으로 정렬
+    pdf_files = sorted({manifest_key(p): p for p in pdf_files}.values())
+    print(f"찾은 PDF 파일 수: {len(pdf_files)}")
 
-print(f"찾은 PDF 파일 수: {len(pdf_files)}")
+    # 출력 디렉토리 생성 (존재하지 않을 경우)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    if claim_output_names(pdf_files, manifest):
+        save_manifest(output_dir, manifest)
+    settings = settings_hash(args.model, args.language)
 
-# 각 PDF 파일 처리
-for pdf_file in pdf_files:
-    try:
-        print(f"\n처리 중: {os.path.basename(pdf_file)}")
+    pending = []
+    for pdf_file in pdf_files:
+        sha256 = file_sha256(pdf_file)
+        entry = manifest.get(manifest_key(pdf_file))
+        if not args.force and is_up_to_date(entry, sha256, settings, output_dir):
+            print(f"건너뜀 (변경 없음): {pdf_file.name}")
+            continue
+        pending.append((pdf_file, sha256))
 
-        # PDF 파싱
-        documents = parser.load_data(file_path=pdf_file)
+    if not pending:
+        print("\n모든 파일이 최신 상태입니다!")
+        return
 
-        # 파일명에서 확장자 제거
-        base_name = os.path.splitext(os.path.basename(pdf_file))[0]
+    parser = build_parser(args.model, args.language, args.verbose)
+    semaphore = asyncio.Semaphore(max(1, args.workers))
+    start = time.perf_counter()
+    pages = await asyncio.gather(
+        *(
+            parse_file(
+                parser, pdf_file, sha256, settings, output_dir, manifest, semaphore
+            )
+            for pdf_file, sha256 in pending
+        )
+    )
+    minutes = (time.perf_counter() - start) / 60
 
-        # 각 페이지별로 별도 파일로 저장
-        for i, doc in enumerate(documents):
-            # 페이지 번호를 포함한 파일명 생성 (0부터 시작하므로 +1)
-            output_file = os.path.join(output_dir, f"{base_name}_page_{i+1:03d}.md")
+    total_pages = sum(n for n in pages if n is not None)
+    failed = sum(1 for n in pages if n is None)
+    print(
+        f"\n모든 파일 처리 완료! {len(pending) - failed}/{len(pending)} files, "
+        f"{total_pages} pages in {minutes:.1f} min "
+        f"({total_pages / minutes if minutes > 0 else 0:.1f} pages/min)"
+    )
 
-            # 마크다운 파일로 저장
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(doc.text)
 
-            print(f"저장 완료: {output_file}")
+def main():
+    p = argparse.ArgumentParser(description="Parse PDFs into per-page markdown")
+    p.add_argument(
+        "sources", nargs="*", default=["./text"], help="PDF files or directories"
+    )
+    p.add_argument("--output-dir", default="./data/text_extracted_md")
+    p.add_argument("--workers", type=int, default=4, help="PDFs parsed concurrently")
+    p.add_argument(
+        "--model",
+        default="openai-gpt4o",
+        help="LlamaParse vendor multimodal model name",
+    )
+    p.add_argument("--language", default="en")
+    p.add_argument(
+        "--force", action="store_true", help="re-parse files that are up to date"
+    )
+    p.add_argument("--verbose", action="store_true", help="LlamaParse verbose logs")
+    args = p.parse_args()
 
-        print(f"총 페이지 수: {len(documents)}")
+    asyncio.run(run(args))
 
-    except Exception as e:
-        print(f"오류 발생 - {os.path.basename(pdf_file)}: {str(e)}")
-        continue
 
-print("\n모든 파일 처리 완료!")
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,21 @@
 from __future__ import annotations
-import argparse, json, sys, ast
+import argparse, json, logging, sys, ast
 from pathlib import Path
 from rag_pipeline.graph_builder import build_graph
-from rag_pipeline import config
+from rag_pipeline import config, tracing
 from rag_pipeline.graph_state import GraphState
+from rag_pipeline.settings import RunSettings
 from langchain.schema import Document
 from typing import Any, List, Dict
 from langchain_core.messages import HumanMessage, AIMessage
 import uuid
 
+# rag_pipeline 로거 설정 (config.setup_logging)을 그대로 사용
+logger = logging.getLogger("rag_pipeline.main")
+
+# OpenTelemetry collector가 설정되어 있으면 JSONL trace와 함께 전송
+tracing.configure_otel(config.OTEL_ENDPOINT)
+
 
 # final_state에서 HumanMessage / AIMessage 객체를 문자열로 변환
 def convert_to_string(value):
@@ -27,23 +34,37 @@ def run(
     query: str,
     pdf_path: str | None = None,
     img_path: str | None = None,
+    settings: RunSettings | None = None,
 ):
+    settings = settings or RunSettings.from_config()
     graph = build_graph(
         Path(pdf_path) if pdf_path else None,
         Path(img_path) if img_path else None,
-        config.RETRIEVAL_TYPE,
-        config.HYBRID_WEIGHT,
+        settings=settings,
     )
     init_state: GraphState = {"question": [query], "messages": [("user", query)]}
-    final_state = graph.invoke(init_state)
+    with tracing.trace(
+        "query",
+        path=config.TRACE_PATH if config.TRACE else None,
+        query=query,
+        **settings.to_dict(),
+    ) as query_trace:
+        final_state = graph.invoke(init_state)
+    logger.info(
+        "⏱️ Query finished in %.2fs (trace %s)",
+        query_trace.duration_ms / 1000,
+        query_trace.trace_id,
+    )
 
     final_state_converted = convert_to_string(final_state)
 
-    # for debugging
-    print("\n===== 최종 답변 =====\n")
-    print(final_state["answer"])
-    print("\n===== 내부 상태 (디버그) =====\n")
-    print(json.dumps(final_state_converted, indent=2, ensure_ascii=False))
+    # for debugging - 전체 state 직렬화는 DEBUG 레벨에서만
+    logger.info("\n===== 최종 답변 =====\n%s", final_state["answer"])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "\n===== 내부 상태 (디버그) =====\n%s",
+            json.dumps(final_state_converted, indent=2, ensure_ascii=False),
+        )
 
     output_dir = Path("./output")
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -59,7 +80,7 @@ def run(
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(output_data, f, ensure_ascii=False, indent=2)
 
-    print(f"Successfully saved {output_path}! \n")
+    logger.info("Successfully saved %s!", output_path)
 
     # for eval - 평가용 직렬화된 상태 반환
     serializable = {
@@ -84,6 +105,11 @@ if __name__ == "__main__":
     p.add_argument("--query", required=True, help="question")
     p.add_argument("--pdf", help="pdf file path", default=None)
     p.add_argument("--img", help="image file path", default=None)
+    p.add_argument(
+        "--debug",
+        action="store_true",
+        help="verbose debug logs (document previews, scores, full graph state)",
+    )
     # p.add_argument("--type", help="query type (hyde, summary)", default=None)
     # p.add_argument(
     #     "--hybrid", help="hybrid retriever weights [float1,float2]", default=None
@@ -104,8 +130,13 @@ if __name__ == "__main__":
     #             "Warning: Could not parse hybrid weights. Format should be [float1,float2]"
     #         )
 
-    print(f"Query received: {args.query} (Type: {type(args.query)})")
+    if args.debug:
+        config.setup_logging("DEBUG")
+
+    logger.debug("Query received: %s (Type: %s)", args.query, type(args.query))
     # if hybrid_weights:
     #     print(f"Using hybrid retrieval with weights: {hybrid_weights}")
 
-    run(args.query, args.pdf, args.img)
+    result = run(args.query, args.pdf, args.img)
+    print("\n===== 최종 답변 =====\n")
+    print(result["answer"])
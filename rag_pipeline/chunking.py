@@ -0,0 +1,175 @@
+"""
+토큰 예산 기반 계층형 chunker
+
+markdown header로 나눈 섹션 중 토큰 예산 (임베딩 모델 tokenizer 기준)을 넘는 섹션만
+문단 -> 줄 -> 문장 -> 단어 -> 토큰 offset 순으로 재귀 분할한 뒤, 예산 안에서 다시 이어 붙입니다.
+($$ ... $$, \\[ ... \\], \\begin{...} ... \\end{...} LaTeX 블록은 문단 단계에서 쪼개지 않음)
+
+- 이웃 chunk와 overlap_tokens만큼 겹침
+- 분할된 chunk는 원래 섹션 id (section_id) / 순번 (section_chunk, section_chunks)을 metadata에 기록
+- 예산 안의 섹션은 그대로 유지 (기존 인덱스의 chunk hash가 바뀌지 않음)
+- 토큰 수는 fast tokenizer 배치 호출로 측정
+
+    chunker = TokenBudgetChunker.from_pretrained("jinaai/jina-embeddings-v3", max_tokens=1024)
+    docs = chunker.split_documents(indexing.load_content_documents(md_paths))
+"""
+
+from __future__ import annotations
+import re
+from typing import List, Sequence, Tuple
+
+from langchain.schema import Document
+
+from rag_pipeline import indexing
+
+# 문단 단계에서 하나의 단위로 취급하는 LaTeX display 블록
+LATEX_BLOCK_RE = re.compile(
+    r"\$\$.+?\$\$|\\\[.+?\\\]|\\begin\{([^}]+)\}.+?\\end\{\1\}", re.DOTALL
+)
+PARAGRAPH_RE = re.compile(r"(?<=\n\n)")
+# 문단보다 작은 분할 단계 (구분자는 앞 조각 끝 / 뒤 조각 앞에 남겨 "".join으로 원문 복원)
+SEPARATORS = [
+    re.compile(r"(?<=\n)"),  # 줄
+    re.compile(r"(?<=[.!?])(?=\s)"),  # 문장
+    re.compile(r"(?<=\s)(?=\S)"),  # 단어
+]
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """문단 단위 분할 (LaTeX 블록 내부의 빈 줄에서는 자르지 않음)"""
+    pieces: List[str] = []
+    last = 0
+    for match in LATEX_BLOCK_RE.finditer(text):
+        pieces.extend(PARAGRAPH_RE.split(text[last : match.start()]))
+        pieces.append(match.group(0))
+        last = match.end()
+    pieces.extend(PARAGRAPH_RE.split(text[last:]))
+    return [piece for piece in pieces if piece]
+
+
+class TokenBudgetChunker:
+    """섹션 Document 리스트 -> 토큰 예산 이하의 chunk 리스트"""
+
+    def __init__(self, tokenizer, max_tokens: int = 1024, overlap_tokens: int = 128):
+        """
+        Args:
+            tokenizer: HuggingFace fast tokenizer (임베딩 모델과 같은 tokenizer)
+            max_tokens: special token을 포함한 chunk당 최대 토큰 수
+            overlap_tokens: 분할된 chunk 사이 겹침 토큰 수 (문장 / 줄 단위로 맞춤)
+        """
+        num_special = (
+            tokenizer.num_special_tokens_to_add()
+            if hasattr(tokenizer, "num_special_tokens_to_add")
+            else 0
+        )
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.budget = max_tokens - num_special
+        if self.budget < 1:
+            raise ValueError(f"max_tokens must exceed {num_special}, got {max_tokens}")
+        self.overlap_tokens = min(overlap_tokens, self.budget // 2)
+
+    @classmethod
+    def from_pretrained(cls, model_name: str, **kwargs) -> "TokenBudgetChunker":
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+        return cls(tokenizer, **kwargs)
+
+    def to_dict(self) -> dict:
+        """manifest 기록용 설정"""
+        return {"max_tokens": self.max_tokens, "overlap_tokens": self.overlap_tokens}
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        """special token 제외 토큰 수 (한 번의 배치 호출)"""
+        if not texts:
+            return []
+        encoded = self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def split_documents(self, docs: Sequence[Document]) -> List[Document]:
+        chunks: List[Document] = []
+        for doc, count in zip(docs, self.count_tokens([d.page_content for d in docs])):
+            if count <= self.budget:
+                chunks.append(doc)
+                continue
+
+            texts = self.split_text(doc.page_content)
+            section_id = indexing.chunk_hash(doc.page_content)
+            for idx, text in enumerate(texts):
+                metadata = {
+                    **doc.metadata,
+                    "section_id": section_id,
+                    "section_chunk": idx,
+                    "section_chunks": len(texts),
+                }
+                chunks.append(Document(page_content=text, metadata=metadata))
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """예산을 넘는 텍스트 -> 예산 이하의 chunk 텍스트 리스트"""
+        units = self._units(split_paragraphs(text), level=0)
+        chunks = [chunk.strip() for chunk in self._merge(units)]
+        chunks = [chunk for chunk in chunks if chunk]
+
+        # 조각 토큰 수의 합과 이어 붙인 텍스트의 토큰 수가 경계에서 약간 다를 수 있으므로 최종 확인
+        checked: List[str] = []
+        for chunk, count in zip(chunks, self.count_tokens(chunks)):
+            if count <= self.budget:
+                checked.append(chunk)
+            else:
+                checked.extend(piece for piece, _ in self._split_by_offsets(chunk))
+        return checked
+
+    def _units(self, pieces: List[str], level: int) -> List[Tuple[str, int]]:
+        """예산 이하가 될 때까지 다음 단계 구분자로 재귀 분할 -> [(조각, 토큰 수)]"""
+        units: List[Tuple[str, int]] = []
+        for piece, count in zip(pieces, self.count_tokens(pieces)):
+            if count <= self.budget:
+                units.append((piece, count))
+            elif level < len(SEPARATORS):
+                sub_pieces = [p for p in SEPARATORS[level].split(piece) if p]
+                units.extend(self._units(sub_pieces, level + 1))
+            else:
+                units.extend(self._split_by_offsets(piece))
+        return units
+
+    def _split_by_offsets(self, text: str) -> List[Tuple[str, int]]:
+        """구분자가 없는 긴 조각: 토큰 offset 기준으로 budget 토큰씩 자름 (decode 없이 원문 slice)"""
+        offsets = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True
+        )["offset_mapping"]
+        starts = [offsets[i][0] for i in range(0, len(offsets), self.budget)]
+        bounds = [0] + starts[1:] + [len(text)]
+        return [
+            (
+                text[bounds[i] : bounds[i + 1]],
+                min(self.budget, len(offsets) - i * self.budget),
+            )
+            for i in range(len(bounds) - 1)
+        ]
+
+    def _merge(self, units: List[Tuple[str, int]]) -> List[str]:
+        """예산 안에서 조각을 이어 붙이고, 새 chunk는 이전 chunk의 마지막 조각들 (overlap_tokens 이하)로 시작"""
+        chunks: List[str] = []
+        window: List[Tuple[str, int]] = []
+        total = 0
+        for piece, count in units:
+            if window and total + count > self.budget:
+                chunks.append("".join(p for p, _ in window))
+                overlap: List[Tuple[str, int]] = []
+                kept = 0
+                for prev_piece, prev_count in reversed(window):
+                    if (
+                        kept + prev_count > self.overlap_tokens
+                        or kept + prev_count + count > self.budget
+                    ):
+                        break
+                    overlap.insert(0, (prev_piece, prev_count))
+                    kept += prev_count
+                window, total = overlap, kept
+            window.append((piece, count))
+            total += count
+        if window:
+            chunks.append("".join(p for p, _ in window))
+        return chunks
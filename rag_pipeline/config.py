@@ -1,10 +1,15 @@
 from pathlib import Path
+import logging
 import os
+import sys
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 def _get_bool(key: str, default: bool = False) -> bool:
     val = os.getenv(key)
@@ -13,12 +18,35 @@ def _get_bool(key: str, default: bool = False) -> bool:
     return val.lower() in ("true", "1", "yes", "on")
 
 
+# ----- 로깅 설정 -----
+DEBUG: bool = _get_bool(
+    "DEBUG", False
+)  # True면 기존 print 수준의 상세 로그 (문서 미리보기, 점수, 전체 graph state 등)
+LOG_LEVEL: str = (
+    "DEBUG" if DEBUG else os.getenv("LOG_LEVEL", "WARNING").upper()
+)  # DEBUG, INFO, WARNING, ERROR 중에 선택 (기본: 경고 / 에러만 출력)
+
+
+def setup_logging(level: Optional[str] = None) -> None:
+    """rag_pipeline 로거 설정 (메시지만 stdout으로 출력, 기존 print 출력과 같은 형태)"""
+    package_logger = logging.getLogger("rag_pipeline")
+    if not package_logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        package_logger.addHandler(handler)
+        package_logger.propagate = False
+    package_logger.setLevel(level or LOG_LEVEL)
+
+
+setup_logging()
+
+
 def _validate_path(path: Path, description: str) -> Path:
     if not path.exists():
-        print(f"Warning: {description} not found at {path}")
+        logger.warning("Warning: %s not found at %s", description, path)
         if not path.suffix:  # 확장자가 없으면 디렉토리로 간주
             path.mkdir(parents=True, exist_ok=True)
-            print(f"Created directory: {path}")
+            logger.info("Created directory: %s", path)
     return path
 
 
@@ -27,6 +55,33 @@ EMBED_MODEL_NAME: str = "jinaai/jina-embeddings-v3"
 RERANKER_NAME: str = "BAAI/bge-reranker-v2-m3"
 CONTENT_DB_PATH: Path = Path("./vectordb/faiss")
 SUMMARY_DB_PATH: Path = Path("./vectordb/summary_faiss")
+EMBED_MAX_TOKENS_PER_BATCH: int = int(
+    os.getenv("EMBED_MAX_TOKENS_PER_BATCH", 16384)
+)  # 임베딩 배치당 패딩 포함 최대 토큰 수 (length-bucketed batching)
+EMBED_DIM: int = int(
+    os.getenv("EMBED_DIM", 1024)
+)  # 인덱스 / 검색에 사용할 Matryoshka 임베딩 차원 (256, 512, 1024 등, 인덱스와 일치해야 함)
+TWO_STAGE_SEARCH: bool = _get_bool(
+    "TWO_STAGE_SEARCH", False
+)  # 축소 차원 후보 검색 후 전체 차원 벡터(vectors.npy)로 재점수화
+RESCORE_CANDIDATES: int = int(
+    os.getenv("RESCORE_CANDIDATES", 50)
+)  # 2단계 검색에서 재점수화할 후보 수
+EMBED_TASK_ADAPTERS: Optional[bool] = (
+    _get_bool("EMBED_TASK_ADAPTERS") if os.getenv("EMBED_TASK_ADAPTERS") else None
+)  # jina-embeddings-v3 쿼리 / 패시지 task adapter 사용 여부 (미설정: 인덱스 manifest를 따름, 레거시 인덱스는 adapter 없음)
+
+# ----- 추론 backend 설정 (임베딩 모델 / reranker) -----
+INFERENCE_BACKEND: str = os.getenv(
+    "INFERENCE_BACKEND", "torch"
+)  # torch, onnx 중에 선택
+ONNX_DIR: Path = Path(os.getenv("ONNX_DIR", "./models/onnx"))  # ONNX export 캐시 위치
+ONNX_QUANTIZE: bool = _get_bool(
+    "ONNX_QUANTIZE", True
+)  # int8 dynamic quantization 사용 여부
+ONNX_NUM_THREADS: int = int(
+    os.getenv("ONNX_NUM_THREADS", 0)
+)  # ONNX Runtime intra-op 스레드 수 (0이면 물리 코어 수)
 
 # ----- OpenAI API 설정 -----
 OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
@@ -39,6 +94,36 @@ if not OPENAI_API_KEY:
 
 OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
+# ----- 업로드 파일 OCR 설정 (pdf_to_docs / img_to_docs) -----
+OCR_MAX_CONCURRENCY: int = int(
+    os.getenv("OCR_MAX_CONCURRENCY", 8)
+)  # 동시에 보내는 페이지 OCR 요청 수
+OCR_MAX_RETRIES: int = int(
+    os.getenv("OCR_MAX_RETRIES", 5)
+)  # rate limit / 일시적 오류 시 페이지당 재시도 횟수
+OCR_BACKOFF_BASE: float = float(
+    os.getenv("OCR_BACKOFF_BASE", 1.0)
+)  # 첫 재시도 대기 (초, 이후 2배씩 증가)
+OCR_BACKOFF_MAX: float = float(
+    os.getenv("OCR_BACKOFF_MAX", 30.0)
+)  # 재시도 대기 상한 (초)
+PDF_DPI: int = int(
+    os.getenv("PDF_DPI", 150)
+)  # PDF 페이지 변환 해상도 (OCR 전에 837x1012로 축소)
+PDF_PAGE_CHUNK: int = int(
+    os.getenv("PDF_PAGE_CHUNK", 8)
+)  # 한 번에 변환하는 페이지 수 (first_page / last_page 단위)
+OCR_CACHE: bool = _get_bool(
+    "OCR_CACHE", True
+)  # 페이지 OCR 결과 / split chunk / chunk 임베딩을 content hash로 디스크에 캐시
+OCR_CACHE_DIR: Path = Path(os.getenv("OCR_CACHE_DIR", "./data/ocr_cache"))
+FILE_INDEX_TTL: float = float(
+    os.getenv("FILE_INDEX_TTL", 1800)
+)  # 업로드 파일 임베딩 / BM25를 메모리에 유지하는 시간 (마지막 사용 후 초)
+FILE_INDEX_MAX: int = int(
+    os.getenv("FILE_INDEX_MAX", 8)
+)  # 메모리에 유지하는 업로드 파일 수 (초과 시 가장 오래 안 쓴 파일부터 제거)
+
 # ----- 검색 파라미터 -----
 TOP_K: int = int(os.getenv("TOP_K", 3))
 SIM_THRESHOLD: float = float(os.getenv("SIM_THRESHOLD", 0.70))
@@ -57,31 +142,60 @@ OUTPUT_PATH = _validate_path(Path(OUTPUT_DIR), "Output directory")
 SCORE_PATH: str = str(OUTPUT_PATH / "similarity_score.json")
 SAVE_PATH: str = str(OUTPUT_PATH / "similarity_score.json")
 
+# ----- latency trace 설정 -----
+TRACE: bool = _get_bool("TRACE", True)  # 질문별 단계 latency trace 기록 여부
+TRACE_PATH: Path = Path(
+    os.getenv("TRACE_PATH", str(OUTPUT_PATH / "traces.jsonl"))
+)  # 질문당 한 줄씩 JSON lines로 저장
+OTEL_ENDPOINT: str = os.getenv(
+    "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"
+)  # 설정하면 OpenTelemetry collector로도 전송 (예: http://localhost:4318/v1/traces)
+
 
 # 설정 검증
-print(f"Configuration loaded:")
-print(f"  - Model: {OPENAI_MODEL}")
-print(f"  - TOP_K: {TOP_K}")
-print(f"  - SIM_THRESHOLD: {SIM_THRESHOLD}")
-print(f"  - RERANK: {RERANK}")
-print(f"  - RETRIEVAL_TYPE: {RETRIEVAL_TYPE}")
-print(f"  - HYBRID_WEIGHT: {HYBRID_WEIGHT}")
-print(f"  - Content DB: {CONTENT_DB_PATH}")
-print(f"  - Summary DB: {SUMMARY_DB_PATH}")
-print(f"  - Output directory: {OUTPUT_PATH}")
+logger.info("Configuration loaded:")
+logger.info("  - Model: %s", OPENAI_MODEL)
+logger.info("  - TOP_K: %s", TOP_K)
+logger.info("  - SIM_THRESHOLD: %s", SIM_THRESHOLD)
+logger.info("  - RERANK: %s", RERANK)
+logger.info("  - RETRIEVAL_TYPE: %s", RETRIEVAL_TYPE)
+logger.info("  - HYBRID_WEIGHT: %s", HYBRID_WEIGHT)
+logger.info("  - Inference backend: %s", INFERENCE_BACKEND)
+logger.info(
+    "  - Embedding task adapters: %s",
+    "index manifest" if EMBED_TASK_ADAPTERS is None else EMBED_TASK_ADAPTERS,
+)
+logger.info("  - Embedding dim: %s (two-stage search: %s)", EMBED_DIM, TWO_STAGE_SEARCH)
+logger.info("  - Content DB: %s", CONTENT_DB_PATH)
+logger.info("  - Summary DB: %s", SUMMARY_DB_PATH)
+logger.info("  - Output directory: %s", OUTPUT_PATH)
+logger.info("  - Trace: %s", TRACE_PATH if TRACE else "disabled")
 
 # Validate retrieval type
 VALID_RETRIEVAL_TYPES = ["original_query", "hyde", "summary", "summary_mean"]
 if RETRIEVAL_TYPE not in VALID_RETRIEVAL_TYPES:
-    print(
-        f"Warning: Invalid RETRIEVAL_TYPE '{RETRIEVAL_TYPE}'. Valid options: {VALID_RETRIEVAL_TYPES}"
+    logger.warning(
+        "Warning: Invalid RETRIEVAL_TYPE '%s'. Valid options: %s",
+        RETRIEVAL_TYPE,
+        VALID_RETRIEVAL_TYPES,
     )
-    print("Defaulting to 'original_query'")
+    logger.warning("Defaulting to 'original_query'")
     RETRIEVAL_TYPE = "original_query"
 
+# Validate inference backend
+VALID_INFERENCE_BACKENDS = ["torch", "onnx"]
+if INFERENCE_BACKEND not in VALID_INFERENCE_BACKENDS:
+    logger.warning(
+        "Warning: Invalid INFERENCE_BACKEND '%s'. Valid options: %s",
+        INFERENCE_BACKEND,
+        VALID_INFERENCE_BACKENDS,
+    )
+    logger.warning("Defaulting to 'torch'")
+    INFERENCE_BACKEND = "torch"
+
 # Validate database paths
 if not CONTENT_DB_PATH.exists():
-    print(f"Warning: Content database not found at {CONTENT_DB_PATH}")
+    logger.warning("Warning: Content database not found at %s", CONTENT_DB_PATH)
 
 if not SUMMARY_DB_PATH.exists():
-    print(f"Warning: Summary database not found at {SUMMARY_DB_PATH}")
+    logger.warning("Warning: Summary database not found at %s", SUMMARY_DB_PATH)
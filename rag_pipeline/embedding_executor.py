@@ -0,0 +1,167 @@
+"""
+토큰 길이 bucket 기반 동적 배치 임베딩 실행기
+
+입력을 토큰 길이로 정렬해 비슷한 길이끼리 배치를 만들고, 배치 크기를 개수가 아닌
+(배치 내 최대 길이 x 문장 수) = 패딩 포함 토큰 수로 제한한 뒤 원래 순서로 복원합니다.
+인덱스 빌더 (embedding_pipeline)와 쿼리 쪽 retrievers 모두 이 실행기를 통해 encode합니다.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from rag_pipeline import tracing
+
+DEFAULT_MAX_TOKENS_PER_BATCH = 16384
+DEFAULT_MAX_BATCH_SIZE = 128
+DEFAULT_BUCKET_WIDTH = 32
+
+
+class EmbeddingExecutor:
+    """SentenceTransformer.encode 호환 인터페이스의 length-bucketed 배치 실행기"""
+
+    def __init__(
+        self,
+        model,
+        tokenizer=None,
+        max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        bucket_width: int = DEFAULT_BUCKET_WIDTH,
+        encode_kwargs: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Args:
+            model: SentenceTransformer (또는 encode 인터페이스가 같은 모델)
+            tokenizer: 길이 측정용 fast tokenizer (None이면 model.tokenizer)
+            max_tokens_per_batch: 배치당 패딩 포함 최대 토큰 수
+            max_batch_size: 배치당 최대 문장 수
+            bucket_width: 길이 bucket 폭 (같은 bucket은 하나의 길이로 취급)
+            encode_kwargs: 모든 encode 호출에 기본으로 넘길 인자 (예: task adapter)
+        """
+        self.model = model
+        self.tokenizer = (
+            tokenizer if tokenizer is not None else getattr(model, "tokenizer", None)
+        )
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_batch_size = max_batch_size
+        self.bucket_width = max(bucket_width, 1)
+        self.max_seq_length = getattr(model, "max_seq_length", None)
+        self.encode_kwargs = dict(encode_kwargs or {})
+
+    def token_lengths(self, texts: Sequence[str]) -> List[int]:
+        """fast tokenizer 배치 호출로 토큰 수 계산 (max_seq_length에서 잘림)"""
+        encoded = self.tokenizer(
+            list(texts),
+            add_special_tokens=True,
+            truncation=self.max_seq_length is not None,
+            max_length=self.max_seq_length,
+        )["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def plan_batches(self, lengths: Sequence[int]) -> List[List[int]]:
+        """
+        길이 bucket 순으로 정렬한 뒤 패딩 포함 토큰 예산 안에서 배치 구성
+
+        Returns:
+            원본 index 리스트들의 리스트 (배치 단위)
+        """
+        width = self.bucket_width
+        # bucket 상한으로 패딩 길이를 추정 (bucket 내부는 같은 길이로 취급)
+        padded = [((length + width - 1) // width) * width for length in lengths]
+        order = sorted(range(len(lengths)), key=lambda i: (padded[i], lengths[i]))
+
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_max = 0
+        for idx in order:
+            new_max = max(current_max, lengths[idx])
+            if current and (
+                new_max * (len(current) + 1) > self.max_tokens_per_batch
+                or len(current) >= self.max_batch_size
+            ):
+                batches.append(current)
+                current, new_max = [], lengths[idx]
+            current.append(idx)
+            current_max = new_max
+        if current:
+            batches.append(current)
+        return batches
+
+    def padding_stats(self, lengths: Sequence[int]) -> Tuple[int, int]:
+        """(실제 토큰 수, 패딩 포함 토큰 수) - 벤치마크용"""
+        real = sum(lengths)
+        padded = sum(
+            max(lengths[i] for i in batch) * len(batch)
+            for batch in self.plan_batches(lengths)
+        )
+        return real, padded
+
+    def encode(
+        self,
+        sentences: Union[str, Sequence[str]],
+        convert_to_tensor: bool = False,
+        **encode_kwargs: Any,
+    ):
+        """
+        SentenceTransformer.encode와 같은 방식으로 호출
+        (str 입력이면 1차원, 리스트 입력이면 (N, dim) 반환)
+        """
+        encode_kwargs = {**self.encode_kwargs, **encode_kwargs}
+        encode_kwargs.pop("batch_size", None)
+        encode_kwargs.pop("convert_to_numpy", None)
+        encode_kwargs.setdefault("show_progress_bar", False)
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        with tracing.span(
+            "encode", texts=len(texts), task=encode_kwargs.get("task")
+        ) as record:
+            vectors = self._encode(texts, record, encode_kwargs)
+
+        if single:
+            vectors = vectors[0]
+        if convert_to_tensor:
+            import torch
+
+            return torch.from_numpy(vectors)
+        return vectors
+
+    def _encode(
+        self,
+        texts: List[str],
+        record: Optional[Dict[str, Any]],
+        encode_kwargs: Dict[str, Any],
+    ) -> np.ndarray:
+        if len(texts) <= 1:
+            # 쿼리 1개는 bucket 계획 없이 바로 encode
+            vectors = np.asarray(
+                self.model.encode(
+                    texts, batch_size=1, convert_to_numpy=True, **encode_kwargs
+                ),
+                dtype=np.float32,
+            )
+        else:
+            vectors = None
+            batches = self.plan_batches(self.token_lengths(texts))
+            if record is not None:
+                record["attrs"].update(
+                    batches=len(batches), max_batch_size=max(map(len, batches))
+                )
+            for batch in batches:
+                batch_vectors = np.asarray(
+                    self.model.encode(
+                        [texts[i] for i in batch],
+                        batch_size=len(batch),
+                        convert_to_numpy=True,
+                        **encode_kwargs,
+                    ),
+                    dtype=np.float32,
+                )
+                if vectors is None:
+                    vectors = np.empty(
+                        (len(texts), batch_vectors.shape[-1]), dtype=np.float32
+                    )
+                # 원래 입력 순서로 복원
+                vectors[batch] = batch_vectors
+        return vectors
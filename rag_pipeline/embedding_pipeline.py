@@ -0,0 +1,289 @@
+"""
+인덱스 빌드용 병렬 / 배치 임베딩 파이프라인
+
+- splitter에서 나오는 청크를 스트리밍으로 받아 sort_buffer 단위로 토큰 길이순 정렬 (패딩 감소)
+- shard 단위로 여러 CPU worker 프로세스에 분배해 큰 배치로 임베딩
+- 완료된 shard는 checkpoint_dir에 .npy로 저장 -> 중단된 빌드는 재실행 시 이어서 진행
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from rag_pipeline.embedding_executor import (
+    DEFAULT_MAX_TOKENS_PER_BATCH,
+    EmbeddingExecutor,
+)
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_SHARD_SIZE = 512
+DEFAULT_SORT_BUFFER = 8192
+DEFAULT_THREADS_PER_WORKER = 4
+
+# worker 프로세스별 임베딩 실행기 (initializer에서 한 번만 로드)
+_worker_executor: Optional[EmbeddingExecutor] = None
+
+
+def _load_executor(
+    model_name: str, device: str, max_tokens_per_batch: int
+) -> EmbeddingExecutor:
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, trust_remote_code=True, device=device)
+    return EmbeddingExecutor(model, max_tokens_per_batch=max_tokens_per_batch)
+
+
+def _init_worker(
+    model_name: str, device: str, threads: int, max_tokens_per_batch: int
+) -> None:
+    # worker 프로세스 전용 (torch 스레드 수는 프로세스 전역 설정)
+    global _worker_executor
+    import torch
+
+    torch.set_num_threads(threads)
+    _worker_executor = _load_executor(model_name, device, max_tokens_per_batch)
+
+
+def _embed_shard(
+    texts: List[str], batch_size: int, encode_kwargs: Dict[str, Any]
+) -> np.ndarray:
+    # shard 내부는 실행기가 토큰 길이 bucket + 토큰 예산으로 다시 배치를 구성
+    _worker_executor.max_batch_size = batch_size
+    return _worker_executor.encode(texts, **encode_kwargs)
+
+
+def _shard_key(texts: List[str], model_name: str, encode_kwargs: Dict[str, Any]) -> str:
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(json.dumps(encode_kwargs, sort_keys=True).encode("utf-8"))
+    for text in texts:
+        digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+    return digest.hexdigest()[:32]
+
+
+def _save_checkpoint(path: Path, vectors: np.ndarray) -> None:
+    tmp_path = path.with_name(f".{path.stem}.tmp.npy")
+    np.save(tmp_path, vectors)
+    os.replace(tmp_path, path)
+
+
+def _sorted_shards(
+    docs: Iterable[Document],
+    tokenizer,
+    shard_size: int,
+    sort_buffer: int,
+) -> Iterator[Tuple[List[int], List[Document], List[int]]]:
+    """
+    스트리밍 입력을 sort_buffer 단위로 모아 토큰 길이순 정렬 후 shard로 분할
+
+    Yields:
+        (원본 순서 index 리스트, 문서 리스트, 토큰 수 리스트)
+    """
+
+    def _flush(buffer: List[Tuple[int, Document]]):
+        texts = [doc.page_content for _, doc in buffer]
+        lengths = [
+            len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]
+        ]
+        order = sorted(range(len(buffer)), key=lambda i: lengths[i])
+        for start in range(0, len(order), shard_size):
+            picked = order[start : start + shard_size]
+            yield (
+                [buffer[i][0] for i in picked],
+                [buffer[i][1] for i in picked],
+                [lengths[i] for i in picked],
+            )
+
+    buffer: List[Tuple[int, Document]] = []
+    for position, doc in enumerate(docs):
+        buffer.append((position, doc))
+        if len(buffer) >= sort_buffer:
+            yield from _flush(buffer)
+            buffer = []
+    if buffer:
+        yield from _flush(buffer)
+
+
+def embed_corpus(
+    docs: Iterable[Document],
+    model_name: str,
+    checkpoint_dir: Optional[Path] = None,
+    num_workers: Optional[int] = None,
+    threads_per_worker: int = DEFAULT_THREADS_PER_WORKER,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    sort_buffer: int = DEFAULT_SORT_BUFFER,
+    device: str = "cpu",
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    encode_kwargs: Optional[Dict[str, Any]] = None,
+    model=None,
+) -> Tuple[List[Document], np.ndarray, List[int]]:
+    """
+    문서 스트림을 병렬로 임베딩
+
+    Args:
+        docs: Document iterable (splitter 출력 등, 한 번만 순회)
+        model_name: SentenceTransformer 모델 이름
+        checkpoint_dir: shard checkpoint 저장 위치 (None이면 checkpoint 없음)
+        num_workers: CPU worker 프로세스 수 (0이면 현재 프로세스에서 실행,
+            None이면 cpu_count / threads_per_worker, device가 cuda면 0)
+        threads_per_worker: worker별 torch 스레드 수 (현재 프로세스에서 실행할 때는 적용하지 않음)
+        batch_size: 배치당 최대 문장 수
+        max_tokens_per_batch: 배치당 패딩 포함 최대 토큰 수
+        shard_size: worker 하나에 넘기는 청크 수 (checkpoint 단위)
+        sort_buffer: 토큰 길이 정렬에 사용할 스트리밍 버퍼 크기
+        encode_kwargs: SentenceTransformer.encode 추가 인자
+        model: 이미 로드된 SentenceTransformer (현재 프로세스에서 실행할 때 모델을 다시 로드하지 않음)
+
+    Returns:
+        (입력 순서의 문서 리스트, (N, dim) 임베딩, 청크별 토큰 수)
+    """
+    from transformers import AutoTokenizer
+
+    encode_kwargs = {"normalize_embeddings": True, **(encode_kwargs or {})}
+    if num_workers is None:
+        num_workers = (
+            0
+            if device != "cpu"
+            else max(1, (os.cpu_count() or 1) // max(threads_per_worker, 1))
+        )
+    if checkpoint_dir is not None:
+        checkpoint_dir = Path(checkpoint_dir)
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+
+    executor: Optional[ProcessPoolExecutor] = None
+    local_executor: Optional[EmbeddingExecutor] = None
+    if num_workers > 0:
+        executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, device, threads_per_worker, max_tokens_per_batch),
+        )
+
+    all_docs: Dict[int, Document] = {}
+    all_lengths: Dict[int, int] = {}
+    vectors_by_position: Dict[int, np.ndarray] = {}
+    pending: Dict[Future, Tuple[List[int], Optional[Path]]] = {}
+    max_pending = max(num_workers, 1) * 2
+
+    resumed = 0
+    embedded = 0
+    started = time.perf_counter()
+
+    def _collect(positions: List[int], vectors: np.ndarray) -> None:
+        for position, vector in zip(positions, vectors):
+            vectors_by_position[position] = vector
+
+    def _report() -> None:
+        elapsed = time.perf_counter() - started
+        rate = embedded / elapsed if elapsed > 0 else 0.0
+        print(
+            f"   ⚡ Embedded {embedded} chunks (+{resumed} from checkpoint) "
+            f"in {elapsed:.1f}s -> {rate:.1f} docs/sec"
+        )
+
+    def _drain(block_until: int) -> None:
+        nonlocal embedded
+        while len(pending) > block_until:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                positions, ckpt_path = pending.pop(future)
+                vectors = future.result()
+                if ckpt_path is not None:
+                    _save_checkpoint(ckpt_path, vectors)
+                _collect(positions, vectors)
+                embedded += len(positions)
+                _report()
+
+    try:
+        for positions, shard_docs, lengths in _sorted_shards(
+            docs, tokenizer, shard_size, sort_buffer
+        ):
+            for position, doc, length in zip(positions, shard_docs, lengths):
+                all_docs[position] = doc
+                all_lengths[position] = length
+
+            texts = [doc.page_content for doc in shard_docs]
+            ckpt_path = None
+            if checkpoint_dir is not None:
+                key = _shard_key(texts, model_name, encode_kwargs)
+                ckpt_path = checkpoint_dir / f"shard_{key}.npy"
+                if ckpt_path.exists():
+                    _collect(positions, np.load(ckpt_path))
+                    resumed += len(positions)
+                    continue
+
+            if executor is None:
+                if local_executor is None:
+                    # 현재 프로세스에서 실행: 호출 쪽 torch 스레드 설정은 건드리지 않음
+                    if model is not None:
+                        local_executor = EmbeddingExecutor(
+                            model, max_tokens_per_batch=max_tokens_per_batch
+                        )
+                    else:
+                        local_executor = _load_executor(
+                            model_name, device, max_tokens_per_batch
+                        )
+                local_executor.max_batch_size = batch_size
+                vectors = local_executor.encode(texts, **encode_kwargs)
+                if ckpt_path is not None:
+                    _save_checkpoint(ckpt_path, vectors)
+                _collect(positions, vectors)
+                embedded += len(positions)
+                _report()
+            else:
+                future = executor.submit(_embed_shard, texts, batch_size, encode_kwargs)
+                pending[future] = (positions, ckpt_path)
+                _drain(max_pending)
+
+        _drain(0)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    order = sorted(all_docs)
+    if not order:
+        return [], np.zeros((0, 0), dtype=np.float32), []
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"✅ Embedding finished: {len(order)} chunks "
+        f"({embedded} embedded, {resumed} resumed) in {elapsed:.1f}s "
+        f"[{num_workers or 1} worker(s), {embedded / elapsed if elapsed > 0 else 0:.1f} docs/sec]"
+    )
+    return (
+        [all_docs[p] for p in order],
+        np.stack([vectors_by_position[p] for p in order]).astype(np.float32),
+        [all_lengths[p] for p in order],
+    )
+
+
+def embed_texts(texts: List[str], model_name: str, **kwargs) -> List[List[float]]:
+    """
+    문자열 리스트 임베딩 (indexing.incremental_update의 embed_documents용)
+
+    shard 하나 분량 이하면 worker 프로세스를 띄우지 않고 현재 프로세스에서 임베딩
+    (model을 주면 호출 쪽에서 로드한 모델을 그대로 사용)
+    """
+    if len(texts) <= kwargs.get("shard_size", DEFAULT_SHARD_SIZE):
+        kwargs.setdefault("num_workers", 0)
+    docs = (Document(page_content=text) for text in texts)
+    _, vectors, _ = embed_corpus(docs, model_name, **kwargs)
+    return vectors.tolist()
+
+
+def clear_checkpoints(checkpoint_dir: Path) -> None:
+    """빌드 완료 후 shard checkpoint 삭제"""
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
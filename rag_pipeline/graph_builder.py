@@ -1,8 +1,10 @@
 from __future__ import annotations
+import functools
 from pathlib import Path
 from langgraph.graph import StateGraph
 from rag_pipeline.graph_state import GraphState
-from rag_pipeline import nodes, config
+from rag_pipeline import nodes, config, tracing
+from rag_pipeline.settings import RunSettings
 from typing import List
 
 
@@ -10,10 +12,28 @@ def build_graph(
     pdf_path: Path | None = None,
     img_path: Path | None = None,
     retrieval_type: str | None = None,
-    hybrid_weights: List[float] | None = None,
+    hybrid_weights: List[float] | float | None = None,
+    settings: RunSettings | None = None,
 ):
+    """
+    settings: 검색 설정 (없으면 config + retrieval_type / hybrid_weights 인자)
+    검색 node에는 functools.partial로 고정해 넘기므로 같은 프로세스에서 설정별 graph를 따로 만들 수 있음
+    """
+    if settings is None:
+        settings = RunSettings.from_config()
+        if retrieval_type:
+            settings = settings.replace(retrieval_type=retrieval_type)
+        if isinstance(hybrid_weights, (list, tuple)):
+            settings = settings.replace(hybrid_weight=hybrid_weights[0])
+        elif hybrid_weights is not None:
+            settings = settings.replace(hybrid_weight=hybrid_weights)
+
     g = StateGraph(GraphState)
 
+    def add_node(name: str, fn):
+        # node 실행 시간을 "node.<이름>" span으로 기록
+        g.add_node(name, tracing.traced(f"node.{name}", fn))
+
     # Routing function for complexity
     def route_complexity(state: GraphState) -> str:
         """Route based on query complexity"""
@@ -21,23 +41,29 @@ def build_graph(
         return decision
 
     # 1. Entry point: Extract variables
-    g.add_node("extract_variables", nodes.node_extract_variables)
+    add_node("extract_variables", nodes.node_extract_variables)
 
     # 2. Complexity check
-    g.add_node("complexity_check", nodes.node_simple_or_not)
+    add_node("complexity_check", nodes.node_simple_or_not)
 
     # 3. Query expansion retrieval (used for both simple and complex)
-    g.add_node("query_expansion_retrieve", nodes.node_query_expansion_retrieve)
+    add_node(
+        "query_expansion_retrieve",
+        functools.partial(nodes.node_query_expansion_retrieve, settings=settings),
+    )
 
     # 4. Simple query path
-    g.add_node("simple_answer", nodes.node_simple_llm_answer)
+    add_node("simple_answer", nodes.node_simple_llm_answer)
 
     # 5. Complex query path
 
-    g.add_node(
-        "query_decomposition_expansion", nodes.node_query_decomposition_with_expansion
+    add_node(
+        "query_decomposition_expansion",
+        functools.partial(
+            nodes.node_query_decomposition_with_expansion, settings=settings
+        ),
     )
-    g.add_node("complex_answer", nodes.node_complex_llm_answer)
+    add_node("complex_answer", nodes.node_complex_llm_answer)
 
     # Set entry point
     g.set_entry_point("extract_variables")
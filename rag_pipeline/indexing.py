@@ -0,0 +1,560 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain.schema import Document
+from langchain.text_splitter import MarkdownHeaderTextSplitter
+from langchain_community.vectorstores import FAISS
+import numpy as np
+from rag_pipeline import text_splitter, vector_search
+
+# ----- 버전 관리되는 인덱스 디렉토리 레이아웃 -----
+# <db_path>/CURRENT          -> 현재 버전 디렉토리 이름 (예: "v0003")
+# <db_path>/v0003/index.faiss, index.pkl, bm25_corpus.json, manifest.json
+#                 vectors.npy (선택: 전체 차원 벡터, 인덱스가 축소 차원일 때 재점수화용)
+# CURRENT가 없으면 <db_path> 자체를 레거시 (비버전) 인덱스로 취급
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+BM25_CORPUS_FILE = "bm25_corpus.json"
+_VERSION_RE = re.compile(r"^v(\d+)$")
+
+CONTENT_HEADERS = [("#", "Header1"), ("##", "Header2"), ("###", "Header3")]
+# subsection id에 쓰는 헤더 (# / ## 단위, data/md_content/split_by_subsection.py와 같은 단위)
+SUBSECTION_HEADERS = ("Header1", "Header2")
+_SUBSECTION_HEADER_RE = re.compile(r"^#{1,2}\s+\S")
+
+# 본문 헤더 분할기: langchain (기본, 파일 전체 로드) / streaming (text_splitter.split_file, 한 줄씩 읽음)
+# 두 분할기는 공백 / 빈 줄 처리가 달라 청크 hash가 다름 -> manifest의 splitter로 기록하고 업데이트도 같은 분할기 사용
+CONTENT_SPLITTERS = ("langchain", "streaming")
+
+# ----- 임베딩 task adapter (jina-embeddings-v3 retrieval LoRA) -----
+# 쿼리와 패시지를 서로 다른 adapter로 임베딩 (manifest의 embed_tasks에 기록)
+DEFAULT_EMBED_TASKS = {"query": "retrieval.query", "passage": "retrieval.passage"}
+NO_EMBED_TASKS = {"query": None, "passage": None}
+
+
+def chunk_hash(text: str) -> str:
+    """청크 내용의 content hash (docstore id로 사용)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_key(doc: Document) -> str:
+    """변경 리포트용 청크 식별 키 (예제 id 또는 소스 + 헤더 경로 (+ 토큰 예산 분할 순번))"""
+    if doc.metadata.get("example_id"):
+        return str(doc.metadata["example_id"])
+    headers = [
+        str(value)
+        for key, value in sorted(doc.metadata.items())
+        if key.startswith("Header")
+    ]
+    key = " > ".join([str(doc.metadata.get("source", ""))] + headers)
+    if "section_chunk" in doc.metadata:
+        key += f" #{doc.metadata['section_chunk']}"
+    return key
+
+
+def subsection_id(source: str, headers: Dict[str, str], occurrence: int = 0) -> str:
+    """
+    소스 + # / ## 헤더 경로 + 같은 경로 안에서의 순번 기반 id (본문이 바뀌어도 유지)
+
+    load_content_documents가 metadata["subsection_id"]로 붙이는 값이며,
+    split_by_subsection.py의 JSONL 레코드 id와 같은 규칙
+    """
+    path = [str(headers[key]) for key in SUBSECTION_HEADERS if key in headers]
+    key = json.dumps([str(source), path, occurrence], ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _attach_subsection_ids(docs: Sequence[Document]) -> None:
+    """
+    파일 하나의 분할 결과에 subsection_id 부여
+
+    # / ## 경로가 바뀌거나 # / ## 헤더 줄로 시작하면 새 subsection (같은 경로면 순번 증가)
+    """
+    occurrences: Dict[Tuple[str, ...], int] = {}
+    previous = None
+    for doc in docs:
+        path = tuple(
+            str(doc.metadata[key]) for key in SUBSECTION_HEADERS if key in doc.metadata
+        )
+        if path != previous or _SUBSECTION_HEADER_RE.match(doc.page_content):
+            occurrences[path] = occurrences.get(path, -1) + 1
+            previous = path
+        doc.metadata["subsection_id"] = subsection_id(
+            doc.metadata["source"], doc.metadata, occurrences[path]
+        )
+
+
+def bm25_tokenize(text: str) -> List[str]:
+    """retrievers.py의 BM25 토큰화와 동일한 공백 기준 토큰화"""
+    return text.split()
+
+
+def dedupe_documents(docs: Iterable[Document]) -> Tuple[List[Document], List[str], int]:
+    """content hash 기준 중복 제거 -> (docs, ids, 제거된 중복 수)"""
+    unique_docs: List[Document] = []
+    ids: List[str] = []
+    seen = set()
+    duplicates = 0
+    for doc in docs:
+        doc_id = chunk_hash(doc.page_content)
+        if doc_id in seen:
+            duplicates += 1
+            continue
+        seen.add(doc_id)
+        unique_docs.append(doc)
+        ids.append(doc_id)
+    return unique_docs, ids, duplicates
+
+
+def load_content_documents(
+    md_paths: Sequence[Path], chunker=None, splitter: str = "langchain"
+) -> List[Document]:
+    """
+    Markdown 파일들을 헤더 기준으로 분할 (create_vectordb.py와 동일한 규칙)
+
+    chunker (chunking.TokenBudgetChunker)를 주면 토큰 예산을 넘는 섹션을 다시 분할
+    splitter="streaming"이면 파일을 한 줄씩 읽는 text_splitter.split_file로 분할 (큰 파일용)
+    각 청크의 metadata["subsection_id"]는 split_by_subsection.py 레코드 id와 대응
+    """
+    if splitter not in CONTENT_SPLITTERS:
+        raise ValueError(
+            f"Unknown splitter '{splitter}' (expected one of {CONTENT_SPLITTERS})"
+        )
+    if splitter == "streaming":
+        header_splitter = text_splitter.MarkdownHeaderTextSplitter(
+            CONTENT_HEADERS, strip_headers=False
+        )
+    else:
+        header_splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=CONTENT_HEADERS,
+            strip_headers=False,
+        )
+    documents: List[Document] = []
+    for md_path in md_paths:
+        md_path = Path(md_path)
+        if splitter == "streaming":
+            file_docs = list(header_splitter.split_file(md_path))
+        else:
+            raw_text = md_path.read_text(encoding="utf-8")
+            file_docs = header_splitter.split_text(raw_text)
+        for doc in file_docs:
+            doc.metadata["source"] = md_path.name
+        _attach_subsection_ids(file_docs)
+        documents.extend(file_docs)
+    if chunker is not None:
+        documents = chunker.split_documents(documents)
+    return documents
+
+
+def load_summary_documents(json_path: Path) -> List[Document]:
+    """examples_text_summary_pair.json에서 summary Document 생성 (create_summary_vectordb.py와 동일)"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    documents: List[Document] = []
+    for idx, item in enumerate(data):
+        if "summary" not in item:
+            print(f"Warning: Item {idx} missing 'summary' field, skipping...")
+            continue
+
+        # parent_id는 examples_original.jsonl의 id와 매칭되어야 함
+        metadata = {
+            "source": Path(json_path).name,
+            "index": idx,
+            "parent_id": str(idx),
+        }
+        if "id" in item:
+            metadata["example_id"] = item["id"]
+            metadata["parent_id"] = item["id"]
+        if "original" in item:
+            metadata["original_length"] = len(item["original"])
+
+        documents.append(Document(page_content=item["summary"], metadata=metadata))
+    return documents
+
+
+# ----- 버전 디렉토리 관리 -----
+def resolve_index_path(db_path: Path) -> Path:
+    """CURRENT 포인터가 가리키는 버전 디렉토리 (없으면 레거시 경로 그대로)"""
+    db_path = Path(db_path)
+    pointer = db_path / CURRENT_FILE
+    if pointer.exists():
+        return db_path / pointer.read_text(encoding="utf-8").strip()
+    return db_path
+
+
+def read_manifest(db_path: Path) -> Dict[str, Any]:
+    manifest_path = resolve_index_path(db_path) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def index_exists(db_path: Path) -> bool:
+    return (resolve_index_path(db_path) / "index.faiss").exists()
+
+
+def task_encode_kwargs(task: Optional[str]) -> Dict[str, str]:
+    """SentenceTransformer.encode에 넘길 task adapter 인자 (task가 없으면 빈 dict)"""
+    return {"task": task, "prompt_name": task} if task else {}
+
+
+def index_embed_tasks(db_path: Path) -> Dict[str, Optional[str]]:
+    """인덱스를 만들 때 사용한 task adapter (manifest에 없는 레거시 인덱스는 task 없음)"""
+    return {**NO_EMBED_TASKS, **read_manifest(db_path).get("embed_tasks", {})}
+
+
+def check_index_compatibility(
+    db_path: Path,
+    embed_model: Optional[str],
+    embed_tasks: Dict[str, Optional[str]],
+) -> None:
+    """인덱스의 임베딩 모델 / task adapter가 현재 설정과 다르면 ValueError"""
+    built_model = read_manifest(db_path).get("embed_model")
+    if embed_model and built_model and built_model != embed_model:
+        raise ValueError(
+            f"Index at {db_path} was built with {built_model}, "
+            f"but the configured embedding model is {embed_model}"
+        )
+    built_tasks = index_embed_tasks(db_path)
+    expected_tasks = {**NO_EMBED_TASKS, **embed_tasks}
+    if built_tasks != expected_tasks:
+        raise ValueError(
+            f"Index at {db_path} was built with embedding tasks {built_tasks}, "
+            f"but the configured tasks are {expected_tasks}. "
+            "Rebuild the index or change EMBED_TASK_ADAPTERS to match."
+        )
+
+
+def resolve_embed_tasks(
+    db_paths: Sequence[Path],
+    adapters: Optional[bool] = None,
+    embed_model: Optional[str] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    검색에 사용할 task adapter 결정 + 기존 인덱스와 호환되는지 확인 (다르면 ValueError)
+
+    adapters가 None이면 인덱스 manifest를 따름 (manifest가 없는 레거시 인덱스는 task 없음)
+    쿼리 encoder는 하나이므로 인덱스끼리 task가 다르면 거부
+    """
+    existing = [Path(p) for p in db_paths if index_exists(p)]
+    if adapters is not None:
+        tasks = DEFAULT_EMBED_TASKS if adapters else NO_EMBED_TASKS
+    elif existing:
+        tasks = index_embed_tasks(existing[0])
+    else:
+        tasks = DEFAULT_EMBED_TASKS
+    for db_path in existing:
+        check_index_compatibility(db_path, embed_model, tasks)
+    return dict(tasks)
+
+
+def load_vectorstore(
+    db_path: Path,
+    embeddings,
+    embed_model: Optional[str] = None,
+    embed_tasks: Optional[Dict[str, Optional[str]]] = None,
+    embed_dim: Optional[int] = None,
+) -> FAISS:
+    """
+    현재 버전의 FAISS 인덱스 로드
+
+    embed_tasks / embed_dim을 주면 인덱스와 비교해 다른 설정으로 만든 인덱스는 거부
+    """
+    if embed_tasks is not None:
+        check_index_compatibility(db_path, embed_model, embed_tasks)
+    vectordb = FAISS.load_local(
+        str(resolve_index_path(db_path)),
+        embeddings=embeddings,
+        allow_dangerous_deserialization=True,
+    )
+    if embed_dim and vectordb.index.d != embed_dim:
+        raise ValueError(
+            f"Index at {db_path} stores {vectordb.index.d}-d vectors, "
+            f"but the configured embedding dimension is {embed_dim}. "
+            "Rebuild the index or change EMBED_DIM to match."
+        )
+    return vectordb
+
+
+def load_bm25_corpus(db_path: Path, vectordb: FAISS) -> Dict[str, List[str]]:
+    """저장된 BM25 토큰 코퍼스 로드 (레거시 인덱스는 docstore에서 재생성)"""
+    corpus_path = resolve_index_path(db_path) / BM25_CORPUS_FILE
+    if corpus_path.exists():
+        with open(corpus_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {
+        doc_id: bm25_tokenize(vectordb.docstore.search(doc_id).page_content)
+        for doc_id in vectordb.index_to_docstore_id.values()
+    }
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _list_versions(db_path: Path) -> List[Tuple[int, str]]:
+    versions = []
+    for child in db_path.iterdir():
+        match = _VERSION_RE.match(child.name)
+        if match and child.is_dir():
+            versions.append((int(match.group(1)), child.name))
+    return sorted(versions)
+
+
+def _prune_versions(db_path: Path, keep: int) -> None:
+    current = resolve_index_path(db_path).name
+    versions = _list_versions(db_path)
+    for _, name in versions[: max(len(versions) - keep, 0)]:
+        if name != current:
+            shutil.rmtree(db_path / name, ignore_errors=True)
+
+
+def write_version(
+    db_path: Path,
+    vectordb: FAISS,
+    manifest: Dict[str, Any],
+    bm25_corpus: Optional[Dict[str, List[str]]] = None,
+    keep: int = 3,
+    full_vectors: Optional[np.ndarray] = None,
+) -> Path:
+    """
+    새 인덱스 버전을 staging 디렉토리에 쓴 뒤 rename + CURRENT 포인터 교체로 원자적으로 공개
+
+    읽는 쪽은 항상 CURRENT가 가리키는 완성된 버전만 보게 됨
+    full_vectors는 FAISS 행 순서와 같은 전체 차원 벡터 (2단계 검색의 재점수화용)
+    """
+    db_path = Path(db_path)
+    db_path.mkdir(parents=True, exist_ok=True)
+
+    versions = _list_versions(db_path)
+    version = f"v{(versions[-1][0] + 1) if versions else 1:04d}"
+    staging = db_path / f".{version}.tmp"
+    if staging.exists():
+        shutil.rmtree(staging)
+
+    vectordb.save_local(str(staging))
+
+    if bm25_corpus is None:
+        bm25_corpus = {
+            doc_id: bm25_tokenize(vectordb.docstore.search(doc_id).page_content)
+            for doc_id in vectordb.index_to_docstore_id.values()
+        }
+    # FAISS 행 순서와 동일하게 정렬해서 저장
+    ordered_corpus = {
+        doc_id: bm25_corpus[doc_id]
+        for _, doc_id in sorted(vectordb.index_to_docstore_id.items())
+    }
+    with open(staging / BM25_CORPUS_FILE, "w", encoding="utf-8") as f:
+        json.dump(ordered_corpus, f, ensure_ascii=False)
+    if full_vectors is not None:
+        vector_search.save_full_vectors(staging, full_vectors)
+
+    manifest = {
+        **manifest,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "num_chunks": vectordb.index.ntotal,
+    }
+    with open(staging / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    os.replace(staging, db_path / version)
+    _atomic_write_text(db_path / CURRENT_FILE, version)
+    _prune_versions(db_path, keep)
+    return db_path / version
+
+
+def incremental_update(
+    db_path: Path,
+    docs: Iterable[Document],
+    embeddings,
+    manifest: Optional[Dict[str, Any]] = None,
+    embed_documents: Optional[Callable[[List[str]], List[List[float]]]] = None,
+    keep: int = 3,
+    dry_run: bool = False,
+    sources: Optional[Iterable[str]] = None,
+    prune: bool = False,
+) -> Dict[str, Any]:
+    """
+    content hash 기준으로 인덱스를 증분 업데이트
+
+    - 새 청크 / 내용이 바뀐 청크만 임베딩
+    - 사라진 청크는 FAISS와 BM25 코퍼스에서 삭제
+      (docs가 다루는 소스 (metadata["source"], sources로 추가 지정)나 같은 example_id의 청크만,
+      prune=True면 docs에 없는 모든 청크)
+    - 메타데이터만 바뀐 청크는 재임베딩 없이 docstore만 갱신
+
+    Returns:
+        변경 내역 리포트 (added / removed / updated / metadata_only / unchanged ...)
+    """
+    embed_documents = embed_documents or embeddings.embed_documents
+    new_docs, new_ids, duplicates = dedupe_documents(docs)
+    new_by_id = dict(zip(new_ids, new_docs))
+
+    # Matryoshka 차원 (인덱스에는 축소 차원, vectors.npy에는 전체 차원 저장)
+    embed_dim = (manifest or {}).get("embed_dim") or read_manifest(db_path).get(
+        "embed_dim"
+    )
+    # 인덱스 타입 (flat / int8 / binary), 기존 인덱스는 manifest에 기록된 타입 유지
+    index_type = (
+        (manifest or {}).get("index_type")
+        or read_manifest(db_path).get("index_type")
+        or "flat"
+    )
+    full_vectors: Optional[np.ndarray] = None
+
+    vectordb: Optional[FAISS] = None
+    existing: Dict[str, Tuple[str, Document]] = {}  # content hash -> (docstore id, doc)
+    bm25_corpus: Dict[str, List[str]] = {}
+    if index_exists(db_path):
+        # 다른 모델 / task adapter로 만든 인덱스에 섞어 넣지 않도록 확인
+        vectordb = load_vectorstore(
+            db_path,
+            embeddings,
+            embed_model=(manifest or {}).get("embed_model"),
+            embed_tasks=(manifest or {}).get("embed_tasks"),
+            embed_dim=embed_dim,
+        )
+        bm25_corpus = load_bm25_corpus(db_path, vectordb)
+        full_vectors = vector_search.load_full_vectors(
+            resolve_index_path(db_path), mmap=False
+        )
+        for doc_id in vectordb.index_to_docstore_id.values():
+            doc = vectordb.docstore.search(doc_id)
+            existing[chunk_hash(doc.page_content)] = (doc_id, doc)
+
+    # 이번 업데이트가 다루는 소스의 청크만 삭제 대상 (다른 소스 / source가 없는 레거시 청크는 유지)
+    scope_sources = {
+        str(d.metadata["source"]) for d in new_docs if "source" in d.metadata
+    }
+    scope_sources.update(sources or ())
+    scope_examples = {
+        str(d.metadata["example_id"]) for d in new_docs if d.metadata.get("example_id")
+    }
+
+    def in_scope(doc: Document) -> bool:
+        return (
+            prune
+            or str(doc.metadata.get("source")) in scope_sources
+            or str(doc.metadata.get("example_id")) in scope_examples
+        )
+
+    added_ids = [doc_id for doc_id in new_ids if doc_id not in existing]
+    stale = [(h, existing[h]) for h in existing if h not in new_by_id]
+    removed = [(h, entry) for h, entry in stale if in_scope(entry[1])]
+    metadata_only = [
+        h
+        for h in new_ids
+        if h in existing and existing[h][1].metadata != new_by_id[h].metadata
+    ]
+
+    added_keys = {chunk_key(new_by_id[doc_id]) for doc_id in added_ids}
+    removed_keys = {chunk_key(doc) for _, (_, doc) in removed}
+    updated_keys = sorted(added_keys & removed_keys)
+
+    # 청크 단위 집계 (한 키에 청크가 여러 개일 수 있음)
+    # updated: 같은 키의 이전 청크를 대체한 새 청크, removed: 대체되지 않고 사라진 청크
+    report: Dict[str, Any] = {
+        "db_path": str(db_path),
+        "added": sum(
+            1
+            for doc_id in added_ids
+            if chunk_key(new_by_id[doc_id]) not in removed_keys
+        ),
+        "removed": sum(
+            1 for _, (_, doc) in removed if chunk_key(doc) not in added_keys
+        ),
+        "updated": sum(
+            1 for doc_id in added_ids if chunk_key(new_by_id[doc_id]) in removed_keys
+        ),
+        "metadata_only": len(metadata_only),
+        "unchanged": len(new_ids) - len(added_ids) - len(metadata_only),
+        "out_of_scope": len(stale) - len(removed),
+        "duplicates_skipped": duplicates,
+        "embedded": len(added_ids),
+        "deleted": len(removed),
+        "updated_keys": updated_keys,
+        "added_keys": sorted(added_keys - removed_keys),
+        "removed_keys": sorted(removed_keys - added_keys),
+        "version": resolve_index_path(db_path).name if vectordb else None,
+    }
+
+    if dry_run or not (added_ids or removed or metadata_only):
+        return report
+
+    if removed and vectordb is not None:
+        removed_doc_ids = [doc_id for _, (doc_id, _) in removed]
+        if full_vectors is not None:
+            # FAISS delete는 남은 행 순서를 유지하므로 같은 행을 지우면 정렬 유지
+            removed_set = set(removed_doc_ids)
+            keep_rows = [
+                doc_id not in removed_set
+                for _, doc_id in sorted(vectordb.index_to_docstore_id.items())
+            ]
+            full_vectors = full_vectors[np.asarray(keep_rows, dtype=bool)]
+        vectordb.delete(removed_doc_ids)
+        for doc_id in removed_doc_ids:
+            bm25_corpus.pop(doc_id, None)
+
+    for h in metadata_only:
+        doc_id, _ = existing[h]
+        vectordb.docstore._dict[doc_id] = Document(
+            id=doc_id,
+            page_content=new_by_id[h].page_content,
+            metadata=new_by_id[h].metadata,
+        )
+
+    if added_ids:
+        texts = [new_by_id[doc_id].page_content for doc_id in added_ids]
+        metadatas = [new_by_id[doc_id].metadata for doc_id in added_ids]
+        vectors = np.asarray(embed_documents(texts), dtype=np.float32)
+        index_vectors = vector_search.truncate_embeddings(vectors, embed_dim)
+        text_embeddings = list(zip(texts, index_vectors.tolist()))
+        if vectordb is None:
+            vectordb = vector_search.create_vectorstore(
+                texts,
+                index_vectors,
+                embeddings,
+                metadatas=metadatas,
+                ids=added_ids,
+                index_type=index_type,
+            )
+            full_vectors = vectors
+        else:
+            vectordb.add_embeddings(text_embeddings, metadatas=metadatas, ids=added_ids)
+            if full_vectors is not None:
+                full_vectors = np.concatenate([full_vectors, vectors])
+        for doc_id, text in zip(added_ids, texts):
+            bm25_corpus[doc_id] = bm25_tokenize(text)
+
+    version_path = write_version(
+        db_path,
+        vectordb,
+        manifest={
+            **read_manifest(db_path),  # 이전 버전의 빌드 설정 유지
+            **(manifest or {}),
+            "changes": {
+                key: report[key]
+                for key in ("added", "removed", "updated", "metadata_only", "unchanged")
+            },
+        },
+        bm25_corpus=bm25_corpus,
+        keep=keep,
+        full_vectors=full_vectors,
+    )
+    report["version"] = version_path.name
+    return report
@@ -0,0 +1,476 @@
+"""
+임베딩 모델 / reranker 추론 backend
+
+- torch: 기존 SentenceTransformer + HuggingFaceCrossEncoder (fp32)
+- onnx:  ONNX로 export한 모델을 ONNX Runtime(CPU)으로 실행, 선택적으로 int8 dynamic quantization
+
+export 결과는 onnx_dir/<모델 이름>/ 아래에 캐시되며, 처음 로드할 때 없으면 자동으로 export합니다.
+task LoRA adapter가 있는 임베딩 모델 (jina-embeddings-v3)은 task마다 adapter를 고정한 그래프를
+onnx_dir/<모델 이름>/<task>/ 아래에 따로 export합니다.
+torch / transformers는 export할 때만 필요합니다.
+"""
+
+from __future__ import annotations
+import logging
+import inspect
+import json
+import shutil
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+ONNX_OPSET = 17
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+EXPORT_INFO_FILE = "export_info.json"
+# 2: task adapter별 그래프 (이전 형식의 export는 다시 export)
+EMBEDDER_EXPORT_FORMAT = 2
+# 그래프를 만들 task adapter (검색에 쓰는 query / passage만, 그래프마다 모델 전체 크기)
+EXPORT_TASKS = ("retrieval.query", "retrieval.passage")
+
+
+def model_dir(onnx_dir: Path, model_name: str) -> Path:
+    return Path(onnx_dir) / model_name.replace("/", "__")
+
+
+def _read_export_info(out_dir: Path) -> Dict[str, Any]:
+    with open(out_dir / EXPORT_INFO_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _graph_dir(out_dir: Path, task: Optional[str] = None) -> Path:
+    """task adapter별 그래프 디렉토리 (adapter가 없는 모델은 out_dir)"""
+    return out_dir / task if task else out_dir
+
+
+def _quantize(graph_dir: Path) -> Path:
+    """fp32 ONNX 모델의 가중치를 int8로 dynamic quantization"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = graph_dir / INT8_FILE
+    logger.debug("⚙️ Quantizing %s -> %s (int8)", graph_dir / FP32_FILE, quantized_path)
+    quantize_dynamic(
+        model_input=str(graph_dir / FP32_FILE),
+        model_output=str(quantized_path),
+        weight_type=QuantType.QInt8,
+        use_external_data_format=True,
+    )
+    return quantized_path
+
+
+def _export(wrapper, tokenizer, graph_dir: Path, output_name: str) -> None:
+    """input_ids / attention_mask -> output_name 그래프를 graph_dir/model.onnx로 export"""
+    import torch
+
+    graph_dir.mkdir(parents=True, exist_ok=True)
+    dummy = tokenizer(
+        ["dummy input for export", "a second, slightly longer dummy input"],
+        padding=True,
+        return_tensors="pt",
+    )
+    axes = {0: "batch", 1: "sequence"}
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # dynamic_axes + trace 기반 exporter (dynamo exporter는 trust_remote_code 모델의 분기를 처리하지 못함)
+        export_kwargs["dynamo"] = False
+
+    logger.debug("⚙️ Exporting %s", graph_dir / FP32_FILE)
+    with torch.no_grad():
+        # 2GB를 넘는 모델은 external data (가중치 별도 파일)로 저장됨
+        torch.onnx.export(
+            wrapper,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            str(graph_dir / FP32_FILE),
+            input_names=["input_ids", "attention_mask"],
+            output_names=[output_name],
+            dynamic_axes={
+                "input_ids": axes,
+                "attention_mask": axes,
+                output_name: {0: "batch"},
+            },
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+            **export_kwargs,
+        )
+
+
+def _save_export_info(out_dir: Path, tokenizer, export_info: Dict[str, Any]) -> None:
+    """tokenizer + export 정보 저장 (마지막에 기록 -> 중간에 실패한 export는 다시 시도)"""
+    tokenizer.save_pretrained(str(out_dir))
+    with open(out_dir / EXPORT_INFO_FILE, "w", encoding="utf-8") as f:
+        json.dump(export_info, f, indent=2, ensure_ascii=False)
+
+
+@contextmanager
+def _merged_lora(model, task_index: int):
+    """
+    task LoRA 가중치를 base 가중치에 합친 상태로 model 사용 (끝나면 원래 가중치 복원, jina-embeddings-v3)
+
+    jina의 LoRA는 weight parametrization (lora_forward)으로 등록되고, adapter_mask가 주어지면
+    torch.unique 루프로 문장별 task를 고르므로 그대로 trace하면 task 선택이 그래프에 제대로 남지 않음.
+    가중치를 미리 합쳐 두면 adapter_mask 없이 (LoRA 분기 없이) export할 수 있음
+    """
+    import torch
+    from torch.nn.utils import parametrize
+
+    saved = []
+    with torch.no_grad():
+        for module in model.modules():
+            if not parametrize.is_parametrized(module, "weight"):
+                continue
+            lora = module.parametrizations.weight[0]
+            if not hasattr(lora, "lora_forward"):
+                continue
+            original = module.parametrizations.weight.original
+            saved.append((original, original.detach().clone()))
+            original.copy_(lora.lora_forward(original, current_task=task_index))
+    if not saved:
+        raise RuntimeError(
+            "Model has task adapters (_adaptation_map) but no LoRA parametrizations to merge"
+        )
+    try:
+        yield model
+    finally:
+        with torch.no_grad():
+            for original, value in saved:
+                original.copy_(value)
+
+
+def export_embedder(model_name: str, onnx_dir: Path, quantize: bool = True) -> Path:
+    """
+    SentenceTransformer 임베딩 모델의 transformer 부분을 ONNX로 export (pooling은 numpy)
+
+    task LoRA adapter가 있는 모델 (jina-embeddings-v3)은 task마다 LoRA 가중치를 합친 그래프를 따로 저장
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out_dir = model_dir(onnx_dir, model_name)
+    info_path = out_dir / EXPORT_INFO_FILE
+    info = _read_export_info(out_dir) if info_path.exists() else {}
+    if info.get("format") != EMBEDDER_EXPORT_FORMAT:
+        shutil.rmtree(out_dir, ignore_errors=True)  # 이전 형식 / 중단된 export
+        st_model = SentenceTransformer(model_name, trust_remote_code=True, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        pooler = st_model[1] if len(st_model) > 1 else None
+        pooling = "cls" if getattr(pooler, "pooling_mode_cls_token", False) else "mean"
+        # task 이름 -> LoRA adapter index (jina LoRA 래퍼의 forward는 *args, **kwargs라 시그니처로는 알 수 없음)
+        adaptation_map = getattr(transformer, "_adaptation_map", None) or {}
+        tasks: Dict[str, int] = {
+            task: index
+            for task, index in adaptation_map.items()
+            if task in EXPORT_TASKS
+        }
+        if adaptation_map and not tasks:
+            raise ValueError(
+                f"{model_name} has none of the task adapters {EXPORT_TASKS}"
+            )
+
+        class _Wrapper(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, input_ids, attention_mask):
+                return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+        for task, task_index in tasks.items() or [(None, None)]:
+            with _merged_lora(transformer, task_index) if task else nullcontext():
+                _export(
+                    _Wrapper(transformer),
+                    st_model.tokenizer,
+                    _graph_dir(out_dir, task),
+                    "last_hidden_state",
+                )
+        info = {
+            "format": EMBEDDER_EXPORT_FORMAT,
+            "model_name": model_name,
+            "kind": "embedder",
+            "pooling": pooling,
+            "max_seq_length": st_model.max_seq_length,
+            "dim": st_model.get_sentence_embedding_dimension(),
+            "tasks": sorted(tasks),
+            "prompts": dict(getattr(st_model, "prompts", {}) or {}),
+        }
+        _save_export_info(out_dir, st_model.tokenizer, info)
+    if quantize:
+        for task in info["tasks"] or [None]:
+            if not (_graph_dir(out_dir, task) / INT8_FILE).exists():
+                _quantize(_graph_dir(out_dir, task))
+    return out_dir
+
+
+def export_reranker(model_name: str, onnx_dir: Path, quantize: bool = True) -> Path:
+    """Cross-Encoder (sequence classification) reranker를 ONNX로 export"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    out_dir = model_dir(onnx_dir, model_name)
+    if not (out_dir / FP32_FILE).exists():
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+
+        class _Wrapper(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, input_ids, attention_mask):
+                return self.model(
+                    input_ids=input_ids, attention_mask=attention_mask
+                ).logits
+
+        _export(_Wrapper(model), tokenizer, out_dir, "logits")
+        _save_export_info(
+            out_dir,
+            tokenizer,
+            {
+                "model_name": model_name,
+                "kind": "reranker",
+                "num_labels": model.config.num_labels,
+                "max_seq_length": min(tokenizer.model_max_length, 8192),
+            },
+        )
+    if quantize and not (out_dir / INT8_FILE).exists():
+        _quantize(out_dir)
+    return out_dir
+
+
+def _create_session(path: Path, num_threads: int):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    # 쿼리 단위 요청이므로 연산자 내부 병렬화만 사용 (0이면 ORT 기본값 = 물리 코어 수)
+    options.intra_op_num_threads = num_threads
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(
+        str(path), sess_options=options, providers=["CPUExecutionProvider"]
+    )
+
+
+class OnnxSentenceEncoder:
+    """SentenceTransformer.encode 호환 ONNX Runtime 임베딩 모델"""
+
+    def __init__(self, out_dir: Path, quantized: bool = True, num_threads: int = 0):
+        from transformers import AutoTokenizer
+
+        info = _read_export_info(out_dir)
+        self.model_name = info["model_name"]
+        self.pooling = info["pooling"]
+        self.max_seq_length = info["max_seq_length"]
+        self.dim: int = info["dim"]
+        self.tasks: List[str] = info["tasks"]
+        self.prompts: Dict[str, str] = info.get("prompts", {})
+        self.quantized = quantized
+        self.num_threads = num_threads
+        self.out_dir = Path(out_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(out_dir))
+        # task별 session은 처음 사용할 때 생성 (쿼리 / 패시지 adapter를 모두 쓰지 않으면 하나만 로드)
+        self._sessions: Dict[Optional[str], Any] = {}
+        self._sessions_lock = threading.Lock()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _session(self, task: Optional[str]):
+        if self.tasks and task not in self.tasks:
+            raise ValueError(
+                f"ONNX export of {self.model_name} needs a task adapter "
+                f"(one of {self.tasks}), got {task!r}"
+            )
+        if not self.tasks and task is not None:
+            raise ValueError(
+                f"{self.model_name} has no task adapters, got task {task!r}"
+            )
+        with self._sessions_lock:
+            if task not in self._sessions:
+                graph_dir = _graph_dir(self.out_dir, task)
+                self._sessions[task] = _create_session(
+                    graph_dir / (INT8_FILE if self.quantized else FP32_FILE),
+                    self.num_threads,
+                )
+            return self._sessions[task]
+
+    def _forward(self, texts: List[str], task: Optional[str] = None) -> np.ndarray:
+        features = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        attention_mask = features["attention_mask"].astype(np.int64)
+        inputs = {
+            "input_ids": features["input_ids"].astype(np.int64),
+            "attention_mask": attention_mask,
+        }
+        hidden = self._session(task).run(None, inputs)[0]
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(
+        self,
+        sentences: Union[str, Sequence[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        convert_to_tensor: bool = False,
+        normalize_embeddings: bool = False,
+        task: Optional[str] = None,
+        prompt_name: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        prompt = self.prompts.get(prompt_name, "") if prompt_name else ""
+        if prompt:
+            texts = [prompt + text for text in texts]
+        batches = [
+            self._forward(texts[i : i + batch_size], task=task)
+            for i in range(0, len(texts), max(batch_size, 1))
+        ]
+        vectors = (
+            np.concatenate(batches).astype(np.float32)
+            if batches
+            else np.zeros((0, self.dim), dtype=np.float32)
+        )
+        if normalize_embeddings:
+            vectors /= np.clip(
+                np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None
+            )
+        if single:
+            vectors = vectors[0]
+        if convert_to_tensor:
+            import torch
+
+            return torch.from_numpy(vectors)
+        return vectors
+
+
+class OnnxCrossEncoder:
+    """HuggingFaceCrossEncoder.score 호환 ONNX Runtime reranker"""
+
+    def __init__(
+        self,
+        out_dir: Path,
+        quantized: bool = True,
+        num_threads: int = 0,
+        batch_size: int = 32,
+    ):
+        from transformers import AutoTokenizer
+
+        info = _read_export_info(out_dir)
+        self.model_name = info["model_name"]
+        self.num_labels = info["num_labels"]
+        self.max_seq_length = info["max_seq_length"]
+        self.batch_size = batch_size
+        self.quantized = quantized
+        self.tokenizer = AutoTokenizer.from_pretrained(str(out_dir))
+        self.session = _create_session(
+            out_dir / (INT8_FILE if quantized else FP32_FILE), num_threads
+        )
+
+    def score(self, text_pairs: List[List[str]]) -> List[float]:
+        scores: List[float] = []
+        for i in range(0, len(text_pairs), self.batch_size):
+            batch = text_pairs[i : i + self.batch_size]
+            features = self.tokenizer(
+                [pair[0] for pair in batch],
+                [pair[1] for pair in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            logits = self.session.run(
+                None,
+                {
+                    "input_ids": features["input_ids"].astype(np.int64),
+                    "attention_mask": features["attention_mask"].astype(np.int64),
+                },
+            )[0]
+            if self.num_labels == 1:
+                # CrossEncoder.predict 기본 activation (sigmoid)과 동일
+                scores.extend((1.0 / (1.0 + np.exp(-logits[:, 0]))).tolist())
+            else:
+                scores.extend(logits[:, 1].tolist())
+        return scores
+
+
+class EncoderEmbeddings(Embeddings):
+    """encode 인터페이스 모델을 LangChain Embeddings로 감싸는 래퍼 (모델 중복 로드 방지)"""
+
+    def __init__(self, encoder, document_encoder=None, **encode_kwargs: Any):
+        """
+        Args:
+            encoder: 쿼리 임베딩에 사용할 encoder
+            document_encoder: 문서 임베딩에 사용할 encoder (None이면 encoder, task adapter 분리용)
+        """
+        self.encoder = encoder
+        self.document_encoder = document_encoder or encoder
+        self.encode_kwargs = {"normalize_embeddings": True, **encode_kwargs}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.document_encoder.encode(list(texts), **self.encode_kwargs).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encoder.encode(text, **self.encode_kwargs).tolist()
+
+
+def load_embedder(
+    model_name: str,
+    backend: str = "torch",
+    device: str = "cpu",
+    onnx_dir: Optional[Path] = None,
+    quantize: bool = True,
+    num_threads: int = 0,
+):
+    """backend에 맞는 임베딩 모델 (SentenceTransformer.encode 인터페이스) 로드"""
+    if backend == "onnx":
+        out_dir = export_embedder(model_name, onnx_dir, quantize=quantize)
+        logger.debug(
+            "⚡ ONNX Runtime embedder: %s (%s, threads=%s)",
+            model_name,
+            "int8" if quantize else "fp32",
+            num_threads or "auto",
+        )
+        return OnnxSentenceEncoder(out_dir, quantized=quantize, num_threads=num_threads)
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, trust_remote_code=True)
+    model.to(device)
+    return model
+
+
+def load_reranker(
+    model_name: str,
+    backend: str = "torch",
+    onnx_dir: Optional[Path] = None,
+    quantize: bool = True,
+    num_threads: int = 0,
+):
+    """backend에 맞는 Cross-Encoder reranker (score 인터페이스) 로드"""
+    if backend == "onnx":
+        out_dir = export_reranker(model_name, onnx_dir, quantize=quantize)
+        logger.debug(
+            "⚡ ONNX Runtime reranker: %s (%s, threads=%s)",
+            model_name,
+            "int8" if quantize else "fp32",
+            num_threads or "auto",
+        )
+        return OnnxCrossEncoder(out_dir, quantized=quantize, num_threads=num_threads)
+
+    from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+
+    return HuggingFaceCrossEncoder(model_name=model_name)
@@ -0,0 +1,146 @@
+"""
+LLM 응답 캐시 (설정 스윕용)
+
+요청 (model / messages / 샘플링 파라미터)이 같으면 검색 설정이 달라도 같은 응답을 재사용합니다.
+(변수 추출 / 복잡도 판단 / 질문 분해 / 쿼리 변환, 그리고 컨텍스트가 같아진 답변 생성)
+
+같은 프롬프트를 여러 번 샘플링하는 경우 (summary_mean / HyDE)를 위해 scope 안에서 몇 번째 호출인지를
+키에 포함합니다. -> i번째 샘플은 다른 설정 실행의 i번째 샘플과 공유되고 샘플 간 다양성은 유지
+scope 밖의 호출은 캐시하지 않으므로 일반 실행 (main.run)에는 영향이 없습니다.
+
+    cache = LLMCache(Path("./eval_output/llm_cache.jsonl"))
+    cache_openai(utils.client, cache)
+    with cache.scope():  # 질문 1회 실행 단위
+        run(question, settings=settings)
+"""
+
+from __future__ import annotations
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# scope별 {요청: 호출 횟수}
+_counters: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar(
+    "llm_cache_counters", default=None
+)
+
+
+class LLMCache:
+    """요청 해시 -> 응답 (path를 주면 JSONL로 저장해 다음 실행에서도 재사용)"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._responses: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._responses[item["key"]] = item["response"]
+            logger.info("📦 Loaded %s cached LLM responses", len(self._responses))
+
+    @contextmanager
+    def scope(self):
+        token = _counters.set({})
+        try:
+            yield self
+        finally:
+            _counters.reset(token)
+
+    def key(self, request: Dict[str, Any]) -> Optional[str]:
+        """scope 안이면 (요청, scope 안에서의 호출 순번) 해시, 밖이면 None"""
+        counters = _counters.get()
+        if counters is None:
+            return None
+        body = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        occurrence = counters.get(body, 0)
+        counters[body] = occurrence + 1
+        return hashlib.sha256(f"{body}#{occurrence}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            response = self._responses.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        with self._lock:
+            self._responses[key] = response
+            if self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    item = {"key": key, "response": response}
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+def _to_dict(response) -> Dict[str, Any]:
+    usage = getattr(response, "usage", None)
+    return {
+        "model": getattr(response, "model", None),
+        "content": response.choices[0].message.content,
+        "usage": {
+            key: getattr(usage, key, None)
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens")
+        },
+    }
+
+
+def _from_dict(cached: Dict[str, Any]):
+    return SimpleNamespace(
+        model=cached.get("model"),
+        choices=[
+            SimpleNamespace(
+                index=0,
+                finish_reason="stop",
+                message=SimpleNamespace(role="assistant", content=cached["content"]),
+            )
+        ],
+        usage=SimpleNamespace(**cached.get("usage", {})),
+        cached=True,
+    )
+
+
+def cache_openai(client, cache: LLMCache) -> None:
+    """
+    client.chat.completions.create 응답 캐시 (utils.client를 공유하는 모든 모듈에 적용)
+
+    instrument_openai / limit_openai 뒤에 감싸면 캐시 hit은 llm span / rate limit을 거치지 않음
+    """
+    completions = client.chat.completions
+    create = completions.create
+    if getattr(create, "_cached", False):
+        create.cache = cache
+        return
+
+    @functools.wraps(create)
+    def cached_create(**kwargs):
+        key = cached_create.cache.key(kwargs)
+        if key is not None:
+            hit = cached_create.cache.get(key)
+            if hit is not None:
+                return _from_dict(hit)
+        response = create(**kwargs)
+        if key is not None:
+            cached_create.cache.put(key, _to_dict(response))
+        return response
+
+    cached_create._cached = True
+    cached_create.cache = cache
+    completions.create = cached_create
@@ -1,10 +1,14 @@
 from __future__ import annotations
+import logging
 import json
-from typing import List
+from typing import List, Optional
 from rag_pipeline.graph_state import GraphState
 from rag_pipeline import retrievers, config, utils, query_decomposition
+from rag_pipeline.settings import RunSettings
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 
 def node_retrieve_file_embedding(state: GraphState, pdf_path: str) -> GraphState:
     query = state["question"][-1]
@@ -95,8 +99,9 @@ def node_relevance_check(state: GraphState) -> GraphState:
         score_file_path = config.SCORE_PATH
 
         if not Path(score_file_path).exists():
-            print(
-                f"Warning: Score file not found at {score_file_path}, skipping relevance check"
+            logger.warning(
+                "Warning: Score file not found at %s, skipping relevance check",
+                score_file_path,
             )
             return {
                 "filtered_context": state.get("context", []),
@@ -106,7 +111,7 @@ def node_relevance_check(state: GraphState) -> GraphState:
 
         with open(score_file_path, "r", encoding="utf-8") as f:
             scores: List[float] = json.load(f)
-            print(f"Loaded {len(scores)} similarity scores")
+            logger.debug("Loaded %s similarity scores", len(scores))
 
         context_docs = state["context"]  # List[Document]
         if not context_docs:
@@ -126,8 +131,10 @@ def node_relevance_check(state: GraphState) -> GraphState:
                 filtered_scores.append(score)
                 filtered_context.append(contents[i])
 
-        print(
-            f"Filtered {len(filtered_context)} documents above threshold {config.SIM_THRESHOLD}"
+        logger.debug(
+            "Filtered %s documents above threshold %s",
+            len(filtered_context),
+            config.SIM_THRESHOLD,
         )
 
         return {
@@ -137,7 +144,7 @@ def node_relevance_check(state: GraphState) -> GraphState:
         }
 
     except Exception as e:
-        print(f"Error in relevance check: {e}")
+        logger.error("Error in relevance check: %s", e)
         # 에러 발생 시 원본 컨텍스트 반환
         return {
             "filtered_context": state.get("context", []),
@@ -174,7 +181,7 @@ def node_llm_answer(state: GraphState) -> GraphState:
         return {"answer": answer, "messages": [("assistant", answer)]}
 
     except Exception as e:
-        print(f"Error in LLM answer generation: {e}")
+        logger.error("Error in LLM answer generation: %s", e)
         return {
             "answer": f"Error generating answer: {str(e)}",
             "messages": [("assistant", f"Error: {str(e)}")],
@@ -189,27 +196,32 @@ def node_simple_or_not(state: GraphState) -> dict:
 
     # Ensure response is valid
     if decision not in ["simple", "complex"]:
-        print(f"Invalid complexity decision: '{decision}', defaulting to 'simple'")
+        logger.warning(
+            "Invalid complexity decision: '%s', defaulting to 'simple'", decision
+        )
         decision = "simple"
 
-    print(f"Question complexity determined as: {decision}")
+    logger.info("Question complexity determined as: %s", decision)
     # Return as a dictionary with a routing key
     return {"next": decision}
 
 
-def node_query_decomposition(state: GraphState) -> GraphState:
+def node_query_decomposition(
+    state: GraphState, settings: Optional[RunSettings] = None
+) -> GraphState:
     """복잡한 질문을 하위 질문들로 분해하고 각각 처리합니다."""
     try:
         query: str = state["question"][-1]
 
-        hybrid_weight_embedding = config.HYBRID_WEIGHT
-        hybrid_weight_bm25 = 1 - hybrid_weight_embedding
-        hybrid_weights = [hybrid_weight_embedding, hybrid_weight_bm25]
-        retrieval_type = config.RETRIEVAL_TYPE
+        settings = settings or RunSettings.from_config()
+        hybrid_weights = settings.hybrid_weights
+        retrieval_type = settings.retrieval_type
 
-        print(f"Starting query decomposition for: {query}")
-        print(
-            f"Using retrieval_type: {retrieval_type}, hybrid_weights: {hybrid_weights}"
+        logger.debug("Starting query decomposition for: %s", query)
+        logger.debug(
+            "Using retrieval_type: %s, hybrid_weights: %s",
+            retrieval_type,
+            hybrid_weights,
         )
 
         # 복잡한 질문 처리
@@ -218,6 +230,7 @@ def node_query_decomposition(state: GraphState) -> GraphState:
             retrieval_type=retrieval_type,
             hybrid_weights=hybrid_weights,
             max_subquestions=5,
+            settings=settings,
         )
 
         return {
@@ -229,7 +242,7 @@ def node_query_decomposition(state: GraphState) -> GraphState:
         }
 
     except Exception as e:
-        print(f"Error in query decomposition: {e}")
+        logger.error("Error in query decomposition: %s", e)
         return {
             "subquestions": [state["question"][-1]],
             "subquestion_results": [],
@@ -259,7 +272,7 @@ def node_complex_llm_answer(state: GraphState) -> GraphState:
         return {"answer": final_answer, "messages": [("assistant", final_answer)]}
 
     except Exception as e:
-        print(f"Error in complex LLM answer generation: {e}")
+        logger.error("Error in complex LLM answer generation: %s", e)
         return {
             "answer": f"Error generating complex answer: {str(e)}",
             "messages": [("assistant", f"Error: {str(e)}")],
@@ -268,7 +281,7 @@ def node_complex_llm_answer(state: GraphState) -> GraphState:
 
 def node_relevance_check_parent(state: GraphState) -> GraphState:
     """Parent retrieval relevance check with multiple similarity scores"""
-    print("🔍 Starting parent relevance check...")
+    logger.debug("🔍 Starting parent relevance check...")
 
     try:
         output_dir = Path(config.OUTPUT_DIR)
@@ -288,7 +301,7 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
                 content_expanded_query_score_path.exists(),
             ]
         ):
-            print(
+            logger.warning(
                 "   ⚠️ Warning: Some score files not found, skipping parent relevance check"
             )
             return {
@@ -299,7 +312,7 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
                 "filtered_examples": state.get("examples", []),
             }
 
-        print("📂 Loading similarity scores...")
+        logger.debug("📂 Loading similarity scores...")
         with open(content_query_score_path, "r", encoding="utf-8") as f:
             content_query_scores = json.load(f)
 
@@ -309,8 +322,11 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
         with open(content_expanded_query_score_path, "r", encoding="utf-8") as f:
             summary_expanded_query_scores = json.load(f)
 
-        print(
-            f"   ✅ Loaded scores - Content: {len(content_query_scores)}, Summary: {len(summary_query_scores)}, Expanded: {len(summary_expanded_query_scores)}"
+        logger.debug(
+            "   ✅ Loaded scores - Content: %s, Summary: %s, Expanded: %s",
+            len(content_query_scores),
+            len(summary_query_scores),
+            len(summary_expanded_query_scores),
         )
 
         # Create score summary string
@@ -335,7 +351,7 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
         examples = state.get("examples", [])
 
         if not content and not examples:
-            print("   ⚠️ Warning: No content or examples found in state")
+            logger.warning("   ⚠️ Warning: No content or examples found in state")
             return {
                 "context": [],
                 "examples": [],
@@ -344,8 +360,8 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
                 "filtered_examples": [],
             }
 
-        print(
-            f"📊 Filtering content and examples (threshold: {config.SIM_THRESHOLD})..."
+        logger.debug(
+            "📊 Filtering content and examples (threshold: %s)...", config.SIM_THRESHOLD
         )
 
         # Filter content based on content-query similarity scores
@@ -360,8 +376,10 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
                 content_query_filtered_scores.append(str(score))
                 content_query_filtered_context.append(content_texts[i])
 
-        print(
-            f"   ✅ Filtered content: {len(content_query_filtered_context)}/{len(content_texts)} documents"
+        logger.debug(
+            "   ✅ Filtered content: %s/%s documents",
+            len(content_query_filtered_context),
+            len(content_texts),
         )
 
         # Filter examples based on summary-expanded-query similarity scores
@@ -383,15 +401,19 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
                 examples_expanded_query_filtered_scores.append(str(score))
                 examples_expanded_query_filtered_context.append(content_examples[i])
 
-        print(
-            f"   ✅ Filtered examples: {len(examples_expanded_query_filtered_context)}/{len(content_examples)} documents"
+        logger.debug(
+            "   ✅ Filtered examples: %s/%s documents",
+            len(examples_expanded_query_filtered_context),
+            len(content_examples),
         )
 
         # Check if we have any filtered results
         if not (
             content_query_filtered_context or examples_expanded_query_filtered_context
         ):
-            print("   ⚠️ Warning: No documents passed the similarity threshold")
+            logger.warning(
+                "   ⚠️ Warning: No documents passed the similarity threshold"
+            )
             return {
                 "context": [],
                 "examples": [],
@@ -415,7 +437,7 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
         else:
             filtered_context = examples_expanded_query_filtered_str
 
-        print("✅ Parent relevance check completed successfully")
+        logger.info("✅ Parent relevance check completed successfully")
 
         return {
             "context": filtered_context,
@@ -428,10 +450,8 @@ def node_relevance_check_parent(state: GraphState) -> GraphState:
         }
 
     except Exception as e:
-        print(f"❌ Error in parent relevance check: {e}")
-        import traceback
-
-        traceback.print_exc()
+        logger.error("❌ Error in parent relevance check: %s", e)
+        logger.debug("Traceback:", exc_info=True)
 
         # Return original state on error
         return {
@@ -456,7 +476,7 @@ def node_parent_retrieve(state: GraphState) -> GraphState:
         }
 
     except Exception as e:
-        print(f"Error in parent retrieve: {e}")
+        logger.error("Error in parent retrieve: %s", e)
         return {
             "context": [],
             "examples": [],
@@ -484,7 +504,7 @@ def node_parent_retrieve_hybrid(state: GraphState) -> GraphState:
         }
 
     except Exception as e:
-        print(f"Error in parent hybrid retrieve: {e}")
+        logger.error("Error in parent hybrid retrieve: %s", e)
         return {
             "context": [],
             "examples": [],
@@ -497,26 +517,27 @@ def node_extract_variables(state: GraphState) -> GraphState:
 
     try:
         extracted_variables = utils.extract_variables(query)
-        print(f"Extracted variables: {extracted_variables}")
+        logger.debug("Extracted variables: %s", extracted_variables)
         return {"extracted_variables": extracted_variables}
     except Exception as e:
-        print(f"Error in variable extraction: {e}")
+        logger.error("Error in variable extraction: %s", e)
         return {"extracted_variables": "{}"}
 
 
-def node_query_decomposition_with_expansion(state: GraphState) -> GraphState:
+def node_query_decomposition_with_expansion(
+    state: GraphState, settings: Optional[RunSettings] = None
+) -> GraphState:
     """Query decomposition using pre-retrieved content and examples"""
     try:
         query: str = state["question"][-1]
         content_docs = state.get("content_docs", [])
         example_docs = state.get("example_docs", [])
 
-        hybrid_weight_embedding = config.HYBRID_WEIGHT
-        hybrid_weight_bm25 = 1 - hybrid_weight_embedding
-        hybrid_weights = [hybrid_weight_embedding, hybrid_weight_bm25]
-        retrieval_type = config.RETRIEVAL_TYPE
+        settings = settings or RunSettings.from_config()
+        hybrid_weights = settings.hybrid_weights
+        retrieval_type = settings.retrieval_type
 
-        print(f"Starting query decomposition with expansion for: {query}")
+        logger.debug("Starting query decomposition with expansion for: %s", query)
 
         from rag_pipeline.query_decomposition import (
             process_complex_query_with_expansion,
@@ -529,6 +550,7 @@ def node_query_decomposition_with_expansion(state: GraphState) -> GraphState:
             retrieval_type=retrieval_type,
             hybrid_weights=hybrid_weights,
             max_subquestions=5,
+            settings=settings,
         )
 
         return {
@@ -538,7 +560,7 @@ def node_query_decomposition_with_expansion(state: GraphState) -> GraphState:
         }
 
     except Exception as e:
-        print(f"Error in query decomposition with expansion: {e}")
+        logger.error("Error in query decomposition with expansion: %s", e)
         return {
             "subquestions": [state["question"][-1]],
             "subquestion_results": [],
@@ -546,12 +568,16 @@ def node_query_decomposition_with_expansion(state: GraphState) -> GraphState:
         }
 
 
-def node_query_expansion_retrieve(state: GraphState) -> GraphState:
+def node_query_expansion_retrieve(
+    state: GraphState, settings: Optional[RunSettings] = None
+) -> GraphState:
     """Query expansion retrieval node for content and examples databases"""
     query: str = state["question"][-1]
 
     try:
-        content_docs, examples_docs = retrievers.query_expansion_retrieve(query)
+        content_docs, examples_docs = retrievers.query_expansion_retrieve(
+            query, settings=settings
+        )
 
         return {
             "content_docs": content_docs,
@@ -559,7 +585,7 @@ def node_query_expansion_retrieve(state: GraphState) -> GraphState:
         }
 
     except Exception as e:
-        print(f"Error in query expansion retrieve: {e}")
+        logger.error("Error in query expansion retrieve: %s", e)
         return {
             "content_docs": [],
             "example_docs": [],
@@ -624,7 +650,7 @@ def node_simple_llm_answer(state: GraphState) -> GraphState:
         return {"answer": answer, "messages": [("assistant", answer)]}
 
     except Exception as e:
-        print(f"Error in simple LLM answer generation: {e}")
+        logger.error("Error in simple LLM answer generation: %s", e)
         return {
             "answer": f"Error generating answer: {str(e)}",
             "messages": [("assistant", f"Error: {str(e)}")],
@@ -727,7 +753,7 @@ Structure your response clearly with proper technical language.""",
             )
             answer = response.choices[0].message.content
         except Exception as e:
-            print(f"Error in complex answer generation: {e}")
+            logger.error("Error in complex answer generation: %s", e)
             answer = utils.generate_llm_answer(query, full_context)
 
         if not isinstance(answer, str):
@@ -736,7 +762,7 @@ Structure your response clearly with proper technical language.""",
         return {"answer": answer, "messages": [("assistant", answer)]}
 
     except Exception as e:
-        print(f"Error in complex LLM answer generation: {e}")
+        logger.error("Error in complex LLM answer generation: %s", e)
         return {
             "answer": f"Error generating complex answer: {str(e)}",
             "messages": [("assistant", f"Error: {str(e)}")],
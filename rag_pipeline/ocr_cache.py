@@ -0,0 +1,175 @@
+"""
+업로드 파일 OCR 캐시 (content hash 기반, 디스크 저장)
+
+같은 datasheet에 대해 여러 번 질문할 때 PDF 변환 / 페이지 OCR / split / 임베딩을 반복하지 않도록
+두 단계로 저장합니다.
+
+- 페이지: (모델에 보내는 페이지 이미지, OCR 모델, 프롬프트) 해시 -> 추출한 markdown
+    pages/<key[:2]>/<key>.md
+- 파일: (원본 파일 바이트 (이미지 폴더면 파일명 + 바이트), OCR 모델, 프롬프트, header 설정) 해시
+    files/<key>.json                -> split된 chunk (page_content / metadata)
+    files/<key>.<embed_id>.npy      -> chunk 임베딩 (임베딩 모델 / task / backend별)
+
+파일 캐시가 있으면 PDF 변환과 OCR을 모두 건너뛰고, 페이지 캐시는 파일 일부만 바뀐 경우
+(페이지 추가 등) 바뀌지 않은 페이지의 OCR을 재사용합니다.
+
+    cache = OCRCache(Path("./data/ocr_cache"), model="gpt-4o-mini", prompt=OCR_PROMPT)
+    key = cache.file_key(pdf_path)
+    docs = cache.get_docs(key)
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+# (경로, 크기, 수정 시각 ...) -> content hash (같은 파일을 프로세스 안에서 다시 읽지 않음)
+_content_hashes: Dict[Tuple[Any, ...], str] = {}
+_content_hashes_lock = threading.Lock()
+
+
+def content_hash(path: Path) -> str:
+    """원본 파일 (PDF) 또는 이미지 폴더 (파일명 + 바이트)의 sha256"""
+    path = Path(path)
+    stat = path.stat()
+    stat_key: Tuple[Any, ...] = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if path.is_dir():
+        entries = sorted(p for p in path.iterdir() if p.is_file())
+        stat_key += tuple(
+            (p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in entries
+        )
+    with _content_hashes_lock:
+        digest = _content_hashes.get(stat_key)
+    if digest is not None:
+        return digest
+
+    h = hashlib.sha256()
+    if path.is_dir():
+        for p in entries:
+            h.update(p.name.encode("utf-8") + b"\0")
+            h.update(hashlib.sha256(p.read_bytes()).digest())
+    else:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    digest = h.hexdigest()
+    with _content_hashes_lock:
+        _content_hashes[stat_key] = digest
+    return digest
+
+
+def _atomic_write(path: Path, write) -> None:
+    """임시 파일에 쓴 뒤 rename (동시에 같은 키를 쓰거나 중간에 중단돼도 깨진 파일이 남지 않음)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+class OCRCache:
+    """페이지 OCR 결과 / 파일별 chunk / chunk 임베딩 디스크 캐시"""
+
+    def __init__(self, root: Path, model: str, prompt: str, salt: str = ""):
+        self.root = Path(root)
+        self.model = model
+        self.prompt = prompt
+        # split 설정 등 결과에 영향을 주는 값 (바뀌면 파일 캐시 무효화)
+        self.salt = salt
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _digest(self, *parts: bytes) -> str:
+        h = hashlib.sha256()
+        for part in (self.model.encode(), self.prompt.encode(), *parts):
+            h.update(len(part).to_bytes(8, "little"))
+            h.update(part)
+        return h.hexdigest()
+
+    def _count(self, found: bool) -> None:
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    # ----- 페이지 -----
+    def page_key(self, image_url: str) -> str:
+        """모델에 보내는 이미지 (data URL) 기준 해시"""
+        return self._digest(image_url.encode("utf-8"))
+
+    def _page_path(self, key: str) -> Path:
+        return self.root / "pages" / key[:2] / f"{key}.md"
+
+    def get_page(self, key: str) -> Optional[str]:
+        path = self._page_path(key)
+        text = path.read_text(encoding="utf-8") if path.exists() else None
+        self._count(text is not None)
+        return text
+
+    def put_page(self, key: str, text: str) -> None:
+        _atomic_write(
+            self._page_path(key), lambda p: p.write_text(text, encoding="utf-8")
+        )
+
+    # ----- 파일 -----
+    def file_key(self, path: Path) -> str:
+        """파일 content hash + OCR 모델 / 프롬프트 / split 설정"""
+        return self._digest(self.salt.encode("utf-8"), content_hash(path).encode())
+
+    def _docs_path(self, key: str) -> Path:
+        return self.root / "files" / f"{key}.json"
+
+    def _vectors_path(self, key: str, embed_id: str) -> Path:
+        embed_hash = hashlib.sha256(embed_id.encode("utf-8")).hexdigest()[:16]
+        return self.root / "files" / f"{key}.{embed_hash}.npy"
+
+    def get_docs(self, key: str) -> Optional[List[Document]]:
+        path = self._docs_path(key)
+        if not path.exists():
+            self._count(False)
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            records: List[Dict[str, Any]] = json.load(f)
+        self._count(True)
+        return [
+            Document(page_content=r["page_content"], metadata=r["metadata"])
+            for r in records
+        ]
+
+    def put_docs(self, key: str, docs: List[Document]) -> None:
+        records = [
+            {"page_content": d.page_content, "metadata": d.metadata} for d in docs
+        ]
+
+        def write(p: Path) -> None:
+            with open(p, "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False)
+
+        _atomic_write(self._docs_path(key), write)
+
+    def get_vectors(self, key: str, embed_id: str) -> Optional[np.ndarray]:
+        path = self._vectors_path(key, embed_id)
+        vectors = np.load(path) if path.exists() else None
+        self._count(vectors is not None)
+        return vectors
+
+    def put_vectors(self, key: str, embed_id: str, vectors: np.ndarray) -> None:
+        def write(p: Path) -> None:
+            with open(p, "wb") as f:
+                np.save(f, np.asarray(vectors, dtype=np.float32))
+
+        _atomic_write(self._vectors_path(key, embed_id), write)
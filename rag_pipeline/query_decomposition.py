@@ -1,8 +1,12 @@
 from __future__ import annotations
+import logging
 from typing import List, Dict, Any, Optional
 from rag_pipeline import utils, retrievers, config
+from rag_pipeline.settings import RunSettings
 from langchain.schema import Document
 
+logger = logging.getLogger(__name__)
+
 
 def decompose_query(original_query: str, max_subquestions: int = 5) -> List[str]:
     """
@@ -74,9 +78,7 @@ def decompose_query(original_query: str, max_subquestions: int = 5) -> List[str]
 
         # Fallback if no valid sub-questions generated
         if not subquestions:
-            print(
-                "Warning: No valid sub-questions generated, creating fallback questions"
-            )
+            logger.warning("Warning: No valid sub-questions generated, creating fallback questions")
             # Simple fallback strategy
             subquestions = [
                 f"What are the fundamental concepts related to: {original_query}?",
@@ -88,7 +90,7 @@ def decompose_query(original_query: str, max_subquestions: int = 5) -> List[str]
         return subquestions[:max_subquestions]
 
     except Exception as e:
-        print(f"Error in query decomposition: {e}")
+        logger.error("Error in query decomposition: %s", e)
         # Return fallback questions
         return [
             f"What are the basic principles underlying this question: {original_query}?",
@@ -101,6 +103,7 @@ def process_subquestion(
     retrieval_type: Optional[str] = None,
     hybrid_weights: Optional[List[float]] = None,
     previous_results: Optional[List[Dict[str, Any]]] = None,
+    settings: Optional[RunSettings] = None,
 ) -> Dict[str, Any]:
     """
     하위 질문에 대해 검색 및 답변 생성을 수행합니다.
@@ -111,39 +114,46 @@ def process_subquestion(
         retrieval_type: 검색 타입 (hyde, summary, summary_mean, None)
         hybrid_weights: 하이브리드 검색 가중치
         previous_results: 이전 단계들의 처리 결과 리스트
+        settings: 검색 TOP_K / rerank / 점수 하한 (없으면 config)
 
     Returns:
         검색된 컨텍스트와 답변을 포함한 딕셔너리
     """
     current_step = len(previous_results) + 1 if previous_results else 1
-    print(f"   Processing Step {current_step} subquestion: {subquestion}")
+    logger.debug("   Processing Step %s subquestion: %s", current_step, subquestion)
     
     # 1) 검색 타입에 따라 적절한 검색 함수 선택
     if retrieval_type == "hyde" and hybrid_weights:
         context_docs, explanation = retrievers.hyde_hybrid_retrieve(
-            subquestion, weights=hybrid_weights
+            subquestion, weights=hybrid_weights, settings=settings
         )
     elif retrieval_type == "hyde":
-        context_docs, explanation = retrievers.hyde_retrieve(subquestion)
+        context_docs, explanation = retrievers.hyde_retrieve(
+            subquestion, settings=settings
+        )
     elif retrieval_type == "summary" and hybrid_weights:
         context_docs, explanation = retrievers.summary_hybrid_retrieve(
-            subquestion, weights=hybrid_weights
+            subquestion, weights=hybrid_weights, settings=settings
         )
     elif retrieval_type == "summary":
-        context_docs, explanation = retrievers.summary_retrieve(subquestion)
+        context_docs, explanation = retrievers.summary_retrieve(
+            subquestion, settings=settings
+        )
     elif retrieval_type == "summary_mean" and hybrid_weights:
         context_docs, explanation = retrievers.summary_mean_retrieve_hybrid(
-            subquestion, weights=hybrid_weights
+            subquestion, weights=hybrid_weights, settings=settings
         )
     elif retrieval_type == "summary_mean":
-        context_docs, explanation = retrievers.summary_mean_retrieve(subquestion)
+        context_docs, explanation = retrievers.summary_mean_retrieve(
+            subquestion, settings=settings
+        )
     elif hybrid_weights:
         context_docs = retrievers.vectordb_hybrid_retrieve(
-            subquestion, weights=hybrid_weights
+            subquestion, weights=hybrid_weights, settings=settings
         )
         explanation = ""
     else:
-        context_docs = retrievers.vectordb_retrieve(subquestion)
+        context_docs = retrievers.vectordb_retrieve(subquestion, settings=settings)
         explanation = ""
 
     # 2) 컨텍스트 문서들을 문자열로 변환
@@ -163,7 +173,7 @@ def process_subquestion(
             qa_pair = f"=== Step {i} ===\nQuestion: {result['question']}\nAnswer: {result['answer']}"
             previous_qa_contexts.append(qa_pair)
         
-        print(f"   📚 Including Q&A context from {len(previous_results)} previous steps")
+        logger.debug("   📚 Including Q&A context from %s previous steps", len(previous_results))
     
     previous_qa_context = "\n\n".join(previous_qa_contexts)
 
@@ -181,7 +191,7 @@ def process_subquestion(
     # 5) 컨텍스트 크기 관리 및 품질 보장
     max_context_length = 25000  # 안전한 컨텍스트 길이
     if len(full_context) > max_context_length:
-        print(f"   ⚠️ Context length ({len(full_context)}) exceeds limit, applying intelligent truncation")
+        logger.warning("   ⚠️ Context length (%s) exceeds limit, applying intelligent truncation", len(full_context))
         
         # 이전 Q&A는 최대한 보존하고 검색 문서를 조정
         if previous_qa_context:
@@ -202,13 +212,13 @@ def process_subquestion(
             # 이전 Q&A가 없으면 검색 문서만 조정
             full_context = retrieved_context[:max_context_length] + "\n\n[Retrieved context truncated due to length]"
         
-        print(f"   📏 Final context length: {len(full_context)} characters")
+        logger.debug("   📏 Final context length: %s characters", len(full_context))
 
     # 6) 하위 질문에 대한 답변 생성 (요구사항 2: 전체 컨텍스트 활용)
-    print(f"   🤖 Generating answer for Step {current_step} with full context...")
+    logger.debug("   🤖 Generating answer for Step %s with full context...", current_step)
     answer = utils.generate_llm_answer(subquestion, full_context)
 
-    print(f"   ✅ Step {current_step} completed (answer length: {len(answer)} chars)")
+    logger.debug("   ✅ Step %s completed (answer length: %s chars)", current_step, len(answer))
 
     return {
         "question": subquestion,
@@ -297,7 +307,7 @@ def aggregate_subquestion_results(
         return final_answer
 
     except Exception as e:
-        print(f"Error in final answer generation: {e}")
+        logger.error("Error in final answer generation: %s", e)
         # Fallback: simple concatenation
         return f"Based on the sequential analysis of sub-questions:\n\n{combined_answers}\n\nThese findings address the original question: {original_query}"
 
@@ -307,6 +317,7 @@ def process_complex_query(
     retrieval_type: Optional[str] = None,
     hybrid_weights: Optional[List[float]] = None,
     max_subquestions: int = 5,
+    settings: Optional[RunSettings] = None,
 ) -> Dict[str, Any]:
     """
     복잡한 질문에 대한 전체 처리 과정을 수행합니다.
@@ -317,19 +328,20 @@ def process_complex_query(
         retrieval_type: 검색 타입
         hybrid_weights: 하이브리드 검색 가중치
         max_subquestions: 최대 하위 질문 개수
+        settings: 검색 TOP_K / rerank / 점수 하한 (없으면 config)
 
     Returns:
         최종 결과를 포함한 딕셔너리
     """
-    print(f"🔍 Processing complex query: {original_query}")
+    logger.debug("🔍 Processing complex query: %s", original_query)
 
     try:
         # 1. 질문 분해 (요구사항 1)
-        print("📝 Step 1: Decomposing query into sub-questions...")
+        logger.debug("📝 Step 1: Decomposing query into sub-questions...")
         subquestions = decompose_query(original_query, max_subquestions)
 
         if not subquestions:
-            print("⚠️ Warning: No sub-questions generated, falling back to simple processing")
+            logger.warning("⚠️ Warning: No sub-questions generated, falling back to simple processing")
             return {
                 "original_query": original_query,
                 "subquestions": [original_query],
@@ -339,18 +351,18 @@ def process_complex_query(
                 "all_context_docs": [],
             }
 
-        print(f"📋 Generated {len(subquestions)} sub-questions:")
+        logger.debug("📋 Generated %s sub-questions:", len(subquestions))
         for i, sq in enumerate(subquestions, 1):
-            print(f"  {i}. {sq}")
+            logger.debug("  %s. %s", i, sq)
 
         # 2. 각 하위 질문을 순차적으로 처리 (요구사항 1 & 2)
-        print("⚡ Step 2: Processing sub-questions sequentially with cumulative context...")
+        logger.debug("⚡ Step 2: Processing sub-questions sequentially with cumulative context...")
         subquestion_results = []
 
         for i, subquestion in enumerate(subquestions, 1):
             try:
-                print(f"\n🔄 Processing Step {i}/{len(subquestions)}")
-                print(f"   Question: {subquestion}")
+                logger.debug("\n🔄 Processing Step %s/%s", i, len(subquestions))
+                logger.debug("   Question: %s", subquestion)
 
                 # 요구사항 2: 이전 단계들의 결과를 모두 전달하여 cumulative context 구성
                 result = process_subquestion(
@@ -358,15 +370,16 @@ def process_complex_query(
                     retrieval_type,
                     hybrid_weights,
                     previous_results=subquestion_results,  # 누적된 이전 단계들의 결과
+                    settings=settings,
                 )
 
                 subquestion_results.append(result)
 
-                print(f"   ✅ Step {i} completed successfully")
-                print(f"   📊 Context included: {len(result.get('previous_context', []))} previous Q&A pairs + current retrieval")
+                logger.debug("   ✅ Step %s completed successfully", i)
+                logger.debug("   📊 Context included: %s previous Q&A pairs + current retrieval", len(result.get('previous_context', [])))
 
             except Exception as e:
-                print(f"   ❌ Error processing Step {i}: {e}")
+                logger.error("   ❌ Error processing Step %s: %s", i, e)
                 # 에러가 발생한 하위 질문에 대해서도 기본 결과 추가
                 error_result = {
                     "question": subquestion,
@@ -381,13 +394,13 @@ def process_complex_query(
                 subquestion_results.append(error_result)
 
         # 3. 결과 종합
-        print("Step 3: Aggregating sequential results...")
+        logger.debug("Step 3: Aggregating sequential results...")
         try:
             final_answer = aggregate_subquestion_results(
                 original_query, subquestion_results
             )
         except Exception as e:
-            print(f"Error in aggregation: {e}")
+            logger.error("Error in aggregation: %s", e)
             # 폴백: 간단한 답변 조합
             answers = [
                 result["answer"] for result in subquestion_results if result["answer"]
@@ -417,8 +430,8 @@ def process_complex_query(
             cumulative_qa_parts.append(f"Step {i} Q: {result['question']}\nStep {i} A: {result['answer']}")
         cumulative_qa_context = "\n\n".join(cumulative_qa_parts)
 
-        print("✅ Sequential complex query processing completed successfully")
-        print(f"📈 Total steps processed: {len(subquestion_results)}")
+        logger.info("✅ Sequential complex query processing completed successfully")
+        logger.debug("📈 Total steps processed: %s", len(subquestion_results))
 
         return {
             "original_query": original_query,
@@ -432,7 +445,7 @@ def process_complex_query(
         }
 
     except Exception as e:
-        print(f"💥 Critical error in complex query processing: {e}")
+        logger.error("💥 Critical error in complex query processing: %s", e)
         # 최종 폴백
         return {
             "original_query": original_query,
@@ -453,6 +466,7 @@ def process_complex_query_with_expansion(
     retrieval_type: Optional[str] = None,
     hybrid_weights: Optional[List[float]] = None,
     max_subquestions: int = 5,
+    settings: Optional[RunSettings] = None,
 ) -> Dict[str, Any]:
     """
     사전 검색된 content와 examples를 활용하여 복잡한 질문을 처리합니다.
@@ -466,16 +480,17 @@ def process_complex_query_with_expansion(
         retrieval_type: 검색 타입
         hybrid_weights: 하이브리드 검색 가중치
         max_subquestions: 최대 하위 질문 개수
+        settings: 검색 TOP_K / rerank / 점수 하한 (없으면 config)
 
     Returns:
         최종 결과를 포함한 딕셔너리
     """
-    print(f"🔍 Processing complex query with expansion: {original_query}")
-    print(f"📊 Initial resources: {len(content_docs)} content docs, {len(example_docs)} example docs")
+    logger.debug("🔍 Processing complex query with expansion: %s", original_query)
+    logger.debug("📊 Initial resources: %s content docs, %s example docs", len(content_docs), len(example_docs))
 
     try:
         # 1. 초기 컨텍스트 구성 (사전 검색된 데이터 활용)
-        print("📝 Step 1: Building initial context from pre-retrieved data...")
+        logger.debug("📝 Step 1: Building initial context from pre-retrieved data...")
         initial_context_parts = []
 
         if content_docs:
@@ -505,10 +520,10 @@ def process_complex_query_with_expansion(
                 )  # Limit for context size
 
         initial_context = "\n\n".join(initial_context_parts)
-        print(f"   📏 Initial context length: {len(initial_context)} characters")
+        logger.debug("   📏 Initial context length: %s characters", len(initial_context))
 
         # 2. 컨텍스트 인식 질문 분해
-        print("🔧 Step 2: Decomposing query with context awareness...")
+        logger.debug("🔧 Step 2: Decomposing query with context awareness...")
 
         try:
             response = utils.client.chat.completions.create(
@@ -568,7 +583,7 @@ Break down this question into focused sub-questions that can effectively leverag
                         subquestions.append(question)
 
             if not subquestions:
-                print("   ⚠️ Warning: No context-aware sub-questions generated, using fallback")
+                logger.warning("   ⚠️ Warning: No context-aware sub-questions generated, using fallback")
                 subquestions = [
                     f"What are the fundamental concepts related to: {original_query}?",
                     f"How can the available examples help understand: {original_query}?",
@@ -576,15 +591,15 @@ Break down this question into focused sub-questions that can effectively leverag
                 ]
 
             subquestions = subquestions[:max_subquestions]
-            print(f"   ✅ Generated {len(subquestions)} context-aware sub-questions")
+            logger.debug("   ✅ Generated %s context-aware sub-questions", len(subquestions))
 
         except Exception as e:
-            print(f"   ❌ Error in context-aware query decomposition: {e}")
-            print("   🔄 Falling back to standard decomposition...")
+            logger.error("   ❌ Error in context-aware query decomposition: %s", e)
+            logger.debug("   🔄 Falling back to standard decomposition...")
             subquestions = decompose_query(original_query, max_subquestions)
 
         if not subquestions:
-            print("   ❌ Critical: No sub-questions could be generated")
+            logger.error("   ❌ Critical: No sub-questions could be generated")
             return {
                 "original_query": original_query,
                 "subquestions": [original_query],
@@ -596,12 +611,12 @@ Break down this question into focused sub-questions that can effectively leverag
                 "processing_summary": "Failed to decompose query",
             }
 
-        print(f"📋 Final sub-questions for processing:")
+        logger.debug("📋 Final sub-questions for processing:")
         for i, sq in enumerate(subquestions, 1):
-            print(f"  {i}. {sq}")
+            logger.debug("  %s. %s", i, sq)
 
         # 3. 순차적 하위 질문 처리 (초기 컨텍스트 포함)
-        print("⚡ Step 3: Processing sub-questions sequentially with initial context...")
+        logger.debug("⚡ Step 3: Processing sub-questions sequentially with initial context...")
         subquestion_results = []
         
         # 초기 컨텍스트를 첫 번째 단계의 "이전 결과"로 활용
@@ -612,19 +627,19 @@ Break down this question into focused sub-questions that can effectively leverag
 
         for i, subquestion in enumerate(subquestions, 1):
             try:
-                print(f"Processing sub-question {i}/{len(subquestions)}: {subquestion}")
+                logger.debug("Processing sub-question %s/%s: %s", i, len(subquestions), subquestion)
 
                 # 이전 결과들 + 초기 컨텍스트 포함
                 previous_results_with_context = []
                 if initial_result and i == 1:
                     # 첫 번째 단계에서만 초기 컨텍스트 포함
                     previous_results_with_context.append(initial_result)
-                    print(f"   📚 Including initial context for first step")
+                    logger.debug("   📚 Including initial context for first step")
                 
                 # 모든 이전 단계의 결과 누적
                 previous_results_with_context.extend(subquestion_results)
                 
-                print(f"   📊 Total context sources: {len(previous_results_with_context)}")
+                logger.debug("   📊 Total context sources: %s", len(previous_results_with_context))
 
                 # 하위 질문 처리 (요구사항 2: 누적 컨텍스트 사용)
                 result = process_subquestion(
@@ -632,15 +647,16 @@ Break down this question into focused sub-questions that can effectively leverag
                     retrieval_type,
                     hybrid_weights,
                     previous_results=previous_results_with_context,
+                    settings=settings,
                 )
 
                 subquestion_results.append(result)
 
-                print(f"   ✅ Step {i} completed successfully")
+                logger.debug("   ✅ Step %s completed successfully", i)
                 # print(f"   📈 Answer length: {len(result.get('answer', ''))} characters")
 
             except Exception as e:
-                print(f"   ❌ Error processing Step {i}: {e}")
+                logger.error("   ❌ Error processing Step %s: %s", i, e)
                 # 에러 발생 시에도 기본 결과 추가
                 error_result = {
                     "question": subquestion,
@@ -655,15 +671,15 @@ Break down this question into focused sub-questions that can effectively leverag
                 subquestion_results.append(error_result)
 
         # 4. 최종 답변 종합
-        print("🎯 Step 4: Aggregating sequential results into final answer...")
+        logger.debug("🎯 Step 4: Aggregating sequential results into final answer...")
         try:
             final_answer = aggregate_subquestion_results(
                 original_query, subquestion_results
             )
-            print(f"   ✅ Final answer generated (length: {len(final_answer)} characters)")
+            logger.debug("   ✅ Final answer generated (length: %s characters)", len(final_answer))
         except Exception as e:
-            print(f"   ❌ Error in final aggregation: {e}")
-            print("   🔄 Using fallback aggregation...")
+            logger.error("   ❌ Error in final aggregation: %s", e)
+            logger.debug("   🔄 Using fallback aggregation...")
             # 폴백: 간단한 답변 조합
             answers = [
                 result["answer"] for result in subquestion_results if result.get("answer")
@@ -674,7 +690,7 @@ Break down this question into focused sub-questions that can effectively leverag
             )
 
         # 5. 모든 컨텍스트 통합
-        print("📚 Step 5: Consolidating all contexts...")
+        logger.debug("📚 Step 5: Consolidating all contexts...")
         all_retrieved_contexts = []
         all_context_docs = list(content_docs)  # 초기 content 문서들로 시작
 
@@ -694,7 +710,7 @@ Break down this question into focused sub-questions that can effectively leverag
         combined_context = "\n\n".join(all_retrieved_contexts)
 
         # 6. 누적 Q&A 컨텍스트 구성 (전체 진행 과정 추적용)
-        print("📝 Step 6: Building cumulative Q&A context...")
+        logger.debug("📝 Step 6: Building cumulative Q&A context...")
         cumulative_qa_parts = []
         
         if initial_context:
@@ -707,12 +723,12 @@ Break down this question into focused sub-questions that can effectively leverag
         
         cumulative_qa_context = "\n\n".join(cumulative_qa_parts)
 
-        print("✅ Complex query processing with expansion completed successfully")
-        print(f"📈 Processing summary:")
-        print(f"   - Original query: {original_query}")
-        print(f"   - Sub-questions processed: {len(subquestion_results)}")
-        print(f"   - Total context docs: {len(all_context_docs)}")
-        print(f"   - Final answer length: {len(final_answer)} characters")
+        logger.info("✅ Complex query processing with expansion completed successfully")
+        logger.debug("📈 Processing summary:")
+        logger.debug("   - Original query: %s", original_query)
+        logger.debug("   - Sub-questions processed: %s", len(subquestion_results))
+        logger.debug("   - Total context docs: %s", len(all_context_docs))
+        logger.debug("   - Final answer length: %s characters", len(final_answer))
 
         return {
             "original_query": original_query,
@@ -726,9 +742,8 @@ Break down this question into focused sub-questions that can effectively leverag
         }
 
     except Exception as e:
-        print(f"💥 Critical error in complex query processing with expansion: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("💥 Critical error in complex query processing with expansion: %s", e)
+        logger.debug("Traceback:", exc_info=True)
         
         # 최종 폴백
         return {
@@ -0,0 +1,72 @@
+"""
+API 호출 속도 제한
+
+여러 스레드가 같은 OpenAI client를 공유할 때 분당 요청 수 (RPM) 한도를 넘지 않도록
+호출 직전에 대기합니다. (token bucket: 한도만큼 burst 허용, 이후 일정 간격으로 충전)
+
+    limiter = RateLimiter(requests_per_minute=500)
+    limit_openai(utils.client, limiter)
+"""
+
+from __future__ import annotations
+import functools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """스레드 안전한 token bucket (requests_per_minute <= 0이면 제한 없음)"""
+
+    def __init__(self, requests_per_minute: float, burst: int = 0):
+        self.rate = requests_per_minute / 60.0
+        # 기본 burst: 1초 분량
+        self.capacity = float(burst or max(1, int(requests_per_minute // 60)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """요청 하나를 보낼 수 있을 때까지 대기 -> 대기한 시간 (초)"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def limit_openai(client, limiter: RateLimiter) -> None:
+    """
+    client.chat.completions.create 호출마다 limiter.acquire()
+
+    utils.client를 공유하는 모든 모듈에 적용됨 (이미 감싼 client는 limiter만 교체)
+    """
+    completions = client.chat.completions
+    create = completions.create
+    if getattr(create, "_rate_limited", False):
+        create.limiter = limiter
+        return
+
+    @functools.wraps(create)
+    def limited_create(*args, **kwargs):
+        waited = limited_create.limiter.acquire()
+        if waited > 0:
+            logger.debug("⏳ Rate limited: waited %.2fs", waited)
+        return create(*args, **kwargs)
+
+    limited_create._rate_limited = True
+    limited_create.limiter = limiter
+    completions.create = limited_create
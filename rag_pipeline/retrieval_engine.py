@@ -0,0 +1,581 @@
+"""
+조합형 검색 엔진
+
+query transform -> embed -> candidate search -> fuse -> rerank -> filter
+
+- 각 단계는 교체 가능한 함수 (transforms / fusers / filters 인자로 주입)
+- 인덱스 (버전별), BM25, 저장된 벡터, 쿼리 변환 (LLM 출력), 임베딩은 엔진 안에 캐시
+- 단계별 소요 시간은 RetrievalResult.timings에 기록
+retrievers.py의 기존 검색 함수들은 이 엔진을 호출하는 얇은 래퍼입니다.
+"""
+
+from __future__ import annotations
+import logging
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from rank_bm25 import BM25Okapi
+
+from rag_pipeline import indexing, tracing, vector_search
+
+logger = logging.getLogger(__name__)
+
+NUM_SAMPLES = 5  # hyde / summary_mean에서 생성하는 LLM 샘플 수
+
+
+@dataclass
+class QueryPlan:
+    """query transform 단계 결과"""
+
+    query: str  # 원래 질문 (rerank에 사용)
+    texts: List[str]  # 임베딩할 텍스트 (여러 개면 평균 벡터)
+    role: str = "query"  # query | passage (task adapter 선택)
+    lexical_query: str = ""  # BM25 쿼리
+    explanation: Any = ""  # 래퍼 반환값 (질문 설명, HyDE 문서 목록 등)
+
+
+@dataclass
+class Candidate:
+    doc: Document
+    row: int
+    dense: float = 0.0
+    lexical: float = 0.0
+    score: float = 0.0
+
+
+@dataclass
+class RetrievalResult:
+    docs: List[Document]  # 최종 문서 (rerank / filter 후)
+    scores: List[float]  # rerank 전 top-k 점수 (fuse 순서, SCORE_PATH 저장용)
+    plan: QueryPlan
+    query_vector: np.ndarray
+    candidates: List[Candidate] = field(default_factory=list)
+    rerank_scores: Optional[List[float]] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class Corpus:
+    """검색 대상 문서 집합 (FAISS 인덱스 버전 또는 메모리 문서 리스트)"""
+
+    def __init__(
+        self,
+        docs: List[Document],
+        vectordb=None,
+        vectors: Optional[np.ndarray] = None,
+        bm25_tokens: Optional[List[List[str]]] = None,
+        name: str = "",
+    ):
+        self.docs = docs  # 행 순서
+        self.vectordb = vectordb
+        self.vectors = vectors  # 전체 차원 벡터 (없으면 엔진이 passage encoder로 생성)
+        self.name = name
+        self._bm25_tokens = bm25_tokens
+        self._bm25: Optional[BM25Okapi] = None
+
+    @classmethod
+    def from_vectorstore(cls, db_path: Path, vectordb) -> "Corpus":
+        rows = sorted(vectordb.index_to_docstore_id.items())
+        docs = [vectordb.docstore.search(doc_id) for _, doc_id in rows]
+        bm25_corpus = indexing.load_bm25_corpus(db_path, vectordb)
+        index_dir = indexing.resolve_index_path(db_path)
+        vectors = vector_search.load_full_vectors(index_dir)
+        if vectors is None and isinstance(vectordb.index, faiss.IndexFlat):
+            vectors = vectordb.index.reconstruct_n(0, vectordb.index.ntotal)
+        return cls(
+            docs,
+            vectordb=vectordb,
+            vectors=vectors,
+            bm25_tokens=[bm25_corpus[doc_id] for _, doc_id in rows],
+            name=str(index_dir),
+        )
+
+    @property
+    def bm25(self) -> BM25Okapi:
+        if self._bm25 is None:
+            tokens = self._bm25_tokens or [
+                indexing.bm25_tokenize(doc.page_content) for doc in self.docs
+            ]
+            self._bm25 = BM25Okapi(tokens)
+        return self._bm25
+
+    @property
+    def quantized(self) -> bool:
+        return (
+            self.vectordb is not None
+            and vector_search.index_type_of(self.vectordb) != "flat"
+        )
+
+
+# ----- query transform 단계 -----
+def _mean_plan(query: str, texts: List[str], role: str, explanation: Any) -> QueryPlan:
+    if not texts:
+        logger.warning("   Warning: No LLM samples generated, using original query")
+        return QueryPlan(query, [query], "query", query, explanation)
+    return QueryPlan(query, texts, role, texts[0], explanation)
+
+
+def _sample(generate: Callable[[str], str], query: str, label: str) -> List[str]:
+    samples = []
+    for i in range(NUM_SAMPLES):
+        try:
+            samples.append(generate(query))
+        except Exception as e:
+            logger.warning("   Warning: Error generating %s %s: %s", label, i + 1, e)
+    return samples
+
+
+def transform_original(query: str) -> QueryPlan:
+    return QueryPlan(query, [query], "query", query, "")
+
+
+# LLM 변환만 utils (OpenAI client / config)가 필요 -> 오프라인 평가 / 벤치마크는 utils 없이 import 가능
+def transform_summary(query: str) -> QueryPlan:
+    from rag_pipeline import utils
+
+    explanation = utils.generate_summary(query)
+    return QueryPlan(query, [explanation], "query", explanation, explanation)
+
+
+def transform_summary_mean(query: str) -> QueryPlan:
+    from rag_pipeline import utils
+
+    summaries = _sample(utils.generate_summary, query, "summary")
+    return _mean_plan(query, summaries, "query", summaries)
+
+
+def transform_hyde(query: str) -> QueryPlan:
+    from rag_pipeline import utils
+
+    # HyDE 가설 문서는 문서와 같은 passage adapter로 임베딩
+    hypo_docs = _sample(utils.generate_hyde_document, query, "HyDE document")
+    return _mean_plan(query, hypo_docs, "passage", hypo_docs)
+
+
+TRANSFORMS: Dict[str, Callable[[str], QueryPlan]] = {
+    "original_query": transform_original,
+    "summary": transform_summary,
+    "summary_mean": transform_summary_mean,
+    "hyde": transform_hyde,
+}
+
+
+# ----- fuse 단계 -----
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    if scores.size and scores.max() > scores.min():
+        return (scores - scores.min()) / (scores.max() - scores.min())
+    return np.zeros_like(scores)
+
+
+def fuse_dense(candidates: List[Candidate], weights: Sequence[float]) -> None:
+    for c in candidates:
+        c.score = c.dense
+
+
+def fuse_weighted_sum(candidates: List[Candidate], weights: Sequence[float]) -> None:
+    """w_dense * cosine + w_bm25 * min-max 정규화 BM25"""
+    w_dense, w_lexical = weights
+    lexical = _min_max(np.array([c.lexical for c in candidates], dtype=np.float64))
+    for c, lex in zip(candidates, lexical):
+        c.score = w_dense * c.dense + w_lexical * float(lex)
+
+
+FUSERS: Dict[str, Callable[[List[Candidate], Sequence[float]], None]] = {
+    "dense": fuse_dense,
+    "weighted_sum": fuse_weighted_sum,
+}
+
+
+# ----- filter 단계 -----
+def min_score_filter(threshold: float) -> Callable[[List[Candidate]], List[Candidate]]:
+    """fuse 점수가 threshold 미만인 후보 제거"""
+    return lambda candidates: [c for c in candidates if c.score >= threshold]
+
+
+def min_similarity_filter(
+    threshold: float,
+) -> Callable[[List[Candidate]], List[Candidate]]:
+    """dense cosine 유사도가 threshold 미만인 후보 제거 (hybrid여도 fuse 점수가 아닌 cosine 기준)"""
+    return lambda candidates: [c for c in candidates if c.dense >= threshold]
+
+
+class _LRU(OrderedDict):
+    """스레드 안전한 LRU (factory는 lock 밖에서 실행 -> 느린 LLM 호출이 다른 스레드를 막지 않음)"""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        with self._lock:
+            if key not in self:
+                return None
+            self.move_to_end(key)
+            return self[key]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self[key] = value
+            self.move_to_end(key)
+            if len(self) > self.maxsize:
+                self.popitem(last=False)
+
+    def get_or_set(self, key, factory: Callable[[], Any]):
+        value = self.lookup(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+
+class _TTLCache(_LRU):
+    """_LRU + 마지막 사용 후 ttl초가 지난 항목 제거 (사용 순서로 정렬돼 있으므로 앞에서부터 확인)"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def _expire(self, now: float) -> None:
+        while self:
+            key, (_, last_used) = next(iter(self.items()))
+            if now - last_used <= self.ttl:
+                break
+            self.popitem(last=False)
+            logger.debug("🗑️ Evicted expired cache entry: %s", key)
+
+    def lookup(self, key):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if key not in self:
+                return None
+            value, _ = self[key]
+            self[key] = (value, now)
+            self.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self[key] = (value, now)
+            self.move_to_end(key)
+            if len(self) > self.maxsize:
+                self.popitem(last=False)
+
+
+class RetrievalEngine:
+    """검색 단계 조합 / 캐시 / 시간 측정"""
+
+    def __init__(
+        self,
+        query_encoder,
+        passage_encoder,
+        embeddings,
+        reranker=None,
+        embed_model: Optional[str] = None,
+        embed_tasks: Optional[Dict[str, Optional[str]]] = None,
+        embed_dim: Optional[int] = None,
+        two_stage_search: bool = False,
+        rescore_candidates: int = 0,
+        transforms: Optional[Dict[str, Callable[[str], QueryPlan]]] = None,
+        fusers: Optional[Dict[str, Callable]] = None,
+        cache_size: int = 1024,
+        cache_transforms: bool = True,
+        first_stage_k: int = 0,
+        file_corpus_ttl: float = 1800.0,
+        file_corpus_max: int = 8,
+    ):
+        self.encoders = {"query": query_encoder, "passage": passage_encoder}
+        self.embeddings = embeddings
+        self.reranker = reranker
+        self.load_kwargs = dict(
+            embed_model=embed_model, embed_tasks=embed_tasks, embed_dim=embed_dim
+        )
+        self.two_stage_search = two_stage_search
+        self.rescore_candidates = rescore_candidates
+        self.transforms = {**TRANSFORMS, **(transforms or {})}
+        self.fusers = {**FUSERS, **(fusers or {})}
+        self.cache_transforms = cache_transforms
+        # 1단계 (search + fuse) 후보 수 하한. top_k보다 크게 잡으면 TOP_K만 다른 검색이
+        # 캐시된 같은 후보 목록을 잘라 쓰므로 설정 스윕에서 1단계를 다시 수행하지 않음
+        self.first_stage_k = first_stage_k
+
+        self._corpora: Dict[str, Corpus] = {}
+        self._parents: Dict[str, Dict[str, dict]] = {}
+        self._plans = _LRU(cache_size)
+        self._vectors = _LRU(cache_size * 8)
+        self._first_stage = _LRU(cache_size)
+        self._rerank_scores = _LRU(cache_size * 8)
+        # 업로드 파일 corpus (파일 해시 -> 벡터 + BM25), 마지막 사용 후 file_corpus_ttl초 동안 유지
+        self._file_corpora = _TTLCache(file_corpus_max, file_corpus_ttl)
+
+    def clear_caches(self) -> None:
+        """쿼리 변환 (LLM 출력) / 쿼리 임베딩 / 1단계 후보 / rerank 점수 캐시 비우기 (인덱스는 유지)"""
+        self._plans.clear()
+        self._vectors.clear()
+        self._first_stage.clear()
+        self._rerank_scores.clear()
+
+    # ----- 캐시된 리소스 -----
+    def corpus(self, db_path: Path) -> Corpus:
+        """현재 버전 인덱스 (CURRENT가 바뀌면 새로 로드)"""
+        key = str(indexing.resolve_index_path(db_path))
+        if key not in self._corpora:
+            vectordb = indexing.load_vectorstore(
+                db_path, self.embeddings, **self.load_kwargs
+            )
+            self._corpora[key] = Corpus.from_vectorstore(db_path, vectordb)
+        return self._corpora[key]
+
+    def corpus_from_documents(
+        self,
+        docs: List[Document],
+        name: str = "",
+        vectors: Optional[np.ndarray] = None,
+    ) -> Corpus:
+        """메모리 문서 리스트 (PDF / 이미지 OCR 결과 등, vectors를 주면 임베딩 생략)"""
+        if vectors is None:
+            vectors = self.encoders["passage"].encode(
+                [d.page_content for d in docs], normalize_embeddings=True
+            )
+        return Corpus(list(docs), vectors=np.atleast_2d(vectors), name=name)
+
+    def file_corpus(
+        self, key: str, build: Callable[[], Optional[Corpus]]
+    ) -> Optional[Corpus]:
+        """
+        업로드 파일 corpus (key: 파일 content hash)
+
+        같은 파일에 대한 후속 질문은 chunk 임베딩 / BM25를 다시 만들지 않고 쿼리만 임베딩
+        build가 None을 반환하면 (텍스트 추출 실패) 캐시하지 않음
+        """
+        corpus = self._file_corpora.lookup(key)
+        if corpus is None:
+            corpus = build()
+            if corpus is not None:
+                self._file_corpora.put(key, corpus)
+        return corpus
+
+    def parent_map(self, jsonl_path: Path) -> Dict[str, dict]:
+        """examples_original.jsonl -> {parent_id: parent 문서}"""
+        key = str(jsonl_path)
+        if key not in self._parents:
+            parent_map = {}
+            with open(jsonl_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parent_doc = json.loads(line)
+                    parent_map[parent_doc["id"].replace("parent-", "")] = parent_doc
+            self._parents[key] = parent_map
+        return self._parents[key]
+
+    def encode(self, texts: List[str], role: str) -> np.ndarray:
+        """(role, text) 단위 캐시 후 누락분만 배치 encode"""
+        found = {t: self._vectors.lookup((role, t)) for t in dict.fromkeys(texts)}
+        missing = [t for t, vector in found.items() if vector is None]
+        if missing:
+            vectors = self.encoders[role].encode(missing, normalize_embeddings=True)
+            for text, vector in zip(missing, np.atleast_2d(vectors)):
+                found[text] = vector
+                self._vectors.put((role, text), vector)
+        return np.stack([found[t] for t in texts])
+
+    @contextmanager
+    def _timed(self, timings: Dict[str, float], stage: str, **attrs):
+        start = time.perf_counter()
+        try:
+            with tracing.span(f"retrieve.{stage}", **attrs):
+                yield
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+    # ----- 단계 -----
+    def transform(self, transform: str, query: str) -> QueryPlan:
+        if transform not in self.transforms:
+            raise ValueError(
+                f"Unknown query transform '{transform}'. Valid options: {sorted(self.transforms)}"
+            )
+        if not self.cache_transforms:
+            return self.transforms[transform](query)
+        return self._plans.get_or_set(
+            (transform, query), lambda: self.transforms[transform](query)
+        )
+
+    def embed(self, plan: QueryPlan) -> np.ndarray:
+        """plan.texts 임베딩 (여러 개면 평균 후 정규화)"""
+        vectors = self.encode(plan.texts, plan.role)
+        query_vec = vectors.mean(axis=0)
+        norm = np.linalg.norm(query_vec)
+        return query_vec / norm if norm > 0 else query_vec
+
+    def dense_scores(
+        self, corpus: Corpus, query_vec: np.ndarray, rows: Optional[List[int]] = None
+    ) -> np.ndarray:
+        """저장된 전체 차원 벡터와의 cosine (벡터가 없으면 passage encoder로 생성)"""
+        rows = list(range(len(corpus.docs))) if rows is None else rows
+        if not rows:
+            return np.zeros(0, dtype=np.float32)
+        if corpus.vectors is None:
+            corpus.vectors = self.encoders["passage"].encode(
+                [doc.page_content for doc in corpus.docs], normalize_embeddings=True
+            )
+        vectors = np.asarray(corpus.vectors[rows], dtype=np.float32)
+        query = vector_search.truncate_embeddings(query_vec, vectors.shape[1])
+        return vectors @ query
+
+    def search(
+        self,
+        corpus: Corpus,
+        plan: QueryPlan,
+        query_vec: np.ndarray,
+        k: int,
+        hybrid: bool,
+    ) -> List[Candidate]:
+        """
+        후보 검색
+        - hybrid: 전체 문서의 dense + BM25 점수
+        - 그 외: FAISS top-k (축소 차원 / 양자화면 전체 차원 재점수화), 메모리 문서는 전체 스캔
+        """
+        if hybrid or corpus.vectordb is None:
+            rows = list(range(len(corpus.docs)))
+        else:
+            full_vectors = (
+                corpus.vectors if self.two_stage_search or corpus.quantized else None
+            )
+            rows = vector_search.search_rows(
+                corpus.vectordb.index,
+                query_vec,
+                k,
+                full_vectors=full_vectors,
+                candidates=self.rescore_candidates,
+            )
+        dense = self.dense_scores(corpus, query_vec, rows)
+        lexical = np.zeros(len(rows))
+        if hybrid:
+            with tracing.span("bm25", docs=len(corpus.docs)):
+                lexical = corpus.bm25.get_scores(plan.lexical_query.split())
+        return [
+            Candidate(
+                corpus.docs[row], row, float(d), float(lexical[row] if hybrid else 0.0)
+            )
+            for row, d in zip(rows, dense)
+        ]
+
+    def fuse(
+        self, candidates: List[Candidate], fuser: str, weights: Sequence[float], k: int
+    ) -> List[Candidate]:
+        self.fusers[fuser](candidates, weights)
+        return sorted(candidates, key=lambda c: c.score, reverse=True)[:k]
+
+    def rerank(
+        self, query: str, candidates: List[Candidate]
+    ) -> Tuple[List[Candidate], Optional[List[float]]]:
+        """Cross-Encoder 재정렬 (실패하면 기존 순서 유지, (질문, 문서) 점수는 캐시)"""
+        if not candidates:
+            return candidates, None
+        logger.debug("🔄 Applying reranking to %s documents...", len(candidates))
+        try:
+            keys = [(query, c.doc.page_content) for c in candidates]
+            cached = {key: self._rerank_scores.lookup(key) for key in keys}
+            missing = [key for key, score in cached.items() if score is None]
+            if missing:
+                with tracing.span("rerank", pairs=len(missing)):
+                    new_scores = self.reranker.score([list(key) for key in missing])
+                for key, score in zip(missing, new_scores):
+                    cached[key] = float(score)
+                    self._rerank_scores.put(key, float(score))
+            scores = [cached[key] for key in keys]
+            ranked = sorted(zip(candidates, scores), key=lambda t: t[1], reverse=True)
+            logger.debug(
+                "   ✅ Reranking completed, scores: %s", [s for _, s in ranked][:3]
+            )
+            return [c for c, _ in ranked], [float(s) for _, s in ranked]
+        except Exception as rerank_error:
+            logger.error("   ❌ Reranking failed: %s", rerank_error)
+            logger.debug("   Falling back to original results")
+            return candidates, None
+
+    # ----- 전체 파이프라인 -----
+    def retrieve(
+        self,
+        query: str,
+        corpus: Corpus,
+        transform: str = "original_query",
+        plan: Optional[QueryPlan] = None,
+        top_k: int = 3,
+        weights: Optional[Sequence[float]] = None,
+        fuser: Optional[str] = None,
+        rerank: bool = False,
+        filters: Iterable[Callable[[List[Candidate]], List[Candidate]]] = (),
+    ) -> RetrievalResult:
+        """
+        Args:
+            query: 원래 질문
+            corpus: 검색 대상 (engine.corpus / corpus_from_documents)
+            transform: query transform 이름 (plan을 직접 주면 생략)
+            top_k: 반환 문서 수
+            weights: [dense, BM25] 가중치 (주면 hybrid 검색)
+            fuser: fuse 함수 이름 (기본: hybrid면 weighted_sum, 아니면 dense)
+            rerank: Cross-Encoder 재정렬 여부
+            filters: 후보 리스트를 받아 걸러내는 함수들 (마지막 단계)
+        """
+        timings: Dict[str, float] = {}
+        hybrid = weights is not None
+        with self._timed(timings, "transform", transform=transform):
+            plan = plan or self.transform(transform, query)
+        with self._timed(timings, "embed"):
+            query_vec = self.embed(plan)
+        fuser = fuser or ("weighted_sum" if hybrid else "dense")
+        weights = tuple(weights or (1.0, 0.0))
+        first_k = max(top_k, self.first_stage_k)
+
+        # 인덱스 코퍼스의 1단계 결과는 (버전, plan, 가중치, k) 단위로 캐시 (메모리 문서는 매번 검색)
+        key = None
+        if corpus.vectordb is not None:
+            key = (corpus.name, plan.role, tuple(plan.texts), plan.lexical_query)
+            key += (hybrid, fuser, weights, first_k)
+        candidates = self._first_stage.lookup(key) if key else None
+        if candidates is None:
+            with self._timed(timings, "search", corpus=corpus.name, hybrid=hybrid):
+                candidates = self.search(corpus, plan, query_vec, first_k, hybrid)
+            with self._timed(timings, "fuse"):
+                candidates = self.fuse(candidates, fuser, weights, first_k)
+            if key:
+                self._first_stage.put(key, candidates)
+        candidates = candidates[:top_k]
+        scores = [c.score for c in candidates]
+
+        rerank_scores = None
+        if rerank and self.reranker is not None:
+            with self._timed(timings, "rerank"):
+                candidates, rerank_scores = self.rerank(plan.query, candidates)
+        with self._timed(timings, "filter"):
+            for candidate_filter in filters:
+                candidates = candidate_filter(candidates)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "⏱️ Retrieval stages: %s",
+                ", ".join(
+                    f"{stage} {seconds * 1000:.1f}ms"
+                    for stage, seconds in timings.items()
+                ),
+            )
+        return RetrievalResult(
+            docs=[c.doc for c in candidates],
+            scores=scores,
+            plan=plan,
+            query_vector=query_vec,
+            candidates=candidates,
+            rerank_scores=rerank_scores,
+            timings=timings,
+        )
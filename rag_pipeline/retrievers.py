@@ -1,47 +1,91 @@
 from __future__ import annotations
+import logging
 import json
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, List, Optional, Sequence, Tuple
 import torch
-import numpy as np
-from sentence_transformers import SentenceTransformer, util
-from rank_bm25 import BM25Okapi
-
-# from langchain.embeddings import (
-#     HuggingFaceEmbeddings,
-#     HuggingFaceCrossEncoder,
-# )
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
-
-# from langchain.vectorstores import FAISS
-from langchain_community.vectorstores import FAISS
-
-from langchain.retrievers import EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
 
 from langchain.storage import InMemoryStore
 from langchain.schema import Document
 from langchain.schema.messages import HumanMessage
 
-from rag_pipeline import config, utils
-import torch.nn.functional as F
+from rag_pipeline import config, indexing, inference_backend, utils
+from rag_pipeline.embedding_executor import EmbeddingExecutor
+from rag_pipeline.ocr_cache import content_hash
+from rag_pipeline.retrieval_engine import (
+    Corpus,
+    QueryPlan,
+    RetrievalEngine,
+    RetrievalResult,
+    min_similarity_filter,
+)
+from rag_pipeline.settings import RunSettings
+
+logger = logging.getLogger(__name__)
 
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
-# 기본 임베딩 모델 로드
-model = SentenceTransformer(config.EMBED_MODEL_NAME, trust_remote_code=True)
-model.to(device)
+# 인덱스를 만들 때 사용한 task adapter (설정과 다르거나 인덱스끼리 다르면 여기서 ValueError)
+EMBED_TASKS = indexing.resolve_embed_tasks(
+    [config.CONTENT_DB_PATH, config.SUMMARY_DB_PATH],
+    adapters=config.EMBED_TASK_ADAPTERS,
+    embed_model=config.EMBED_MODEL_NAME,
+)
+
+# 기본 임베딩 모델 로드 (config.INFERENCE_BACKEND: torch | onnx)
+model = inference_backend.load_embedder(
+    config.EMBED_MODEL_NAME,
+    backend=config.INFERENCE_BACKEND,
+    device=device,
+    onnx_dir=config.ONNX_DIR,
+    quantize=config.ONNX_QUANTIZE,
+    num_threads=config.ONNX_NUM_THREADS,
+)
+
+# 토큰 길이 bucket 기반 동적 배치 실행기 (모든 encode 호출은 이 실행기를 거침)
+# 질문 / 질문 설명은 query adapter, 문서 / HyDE 가설 문서는 passage adapter로 임베딩
+query_encoder = EmbeddingExecutor(
+    model,
+    max_tokens_per_batch=config.EMBED_MAX_TOKENS_PER_BATCH,
+    encode_kwargs=indexing.task_encode_kwargs(EMBED_TASKS["query"]),
+)
+passage_encoder = EmbeddingExecutor(
+    model,
+    max_tokens_per_batch=config.EMBED_MAX_TOKENS_PER_BATCH,
+    encode_kwargs=indexing.task_encode_kwargs(EMBED_TASKS["passage"]),
+)
 
-# LangChain용 임베딩 래퍼
-embeddings = HuggingFaceEmbeddings(
-    model_name=config.EMBED_MODEL_NAME,
-    model_kwargs={"device": device, "trust_remote_code": True},
-    encode_kwargs={"normalize_embeddings": True},
+# LangChain용 임베딩 래퍼 (위 모델을 그대로 사용)
+embeddings = inference_backend.EncoderEmbeddings(
+    query_encoder, document_encoder=passage_encoder
 )
 
 # Cross-Encoder Reranker
-reranker = HuggingFaceCrossEncoder(model_name=config.RERANKER_NAME)
+reranker = inference_backend.load_reranker(
+    config.RERANKER_NAME,
+    backend=config.INFERENCE_BACKEND,
+    onnx_dir=config.ONNX_DIR,
+    quantize=config.ONNX_QUANTIZE,
+    num_threads=config.ONNX_NUM_THREADS,
+)
+
+
+# 검색 엔진 (인덱스 / BM25 / LLM 쿼리 변환 / 임베딩 캐시를 프로세스 안에서 공유)
+engine = RetrievalEngine(
+    query_encoder,
+    passage_encoder,
+    embeddings,
+    reranker=reranker,
+    embed_model=config.EMBED_MODEL_NAME,
+    embed_tasks=EMBED_TASKS,
+    embed_dim=config.EMBED_DIM,
+    two_stage_search=config.TWO_STAGE_SEARCH,
+    rescore_candidates=config.RESCORE_CANDIDATES,
+    file_corpus_ttl=config.FILE_INDEX_TTL,
+    file_corpus_max=config.FILE_INDEX_MAX,
+)
+
+PARENT_JSONL_PATH = Path("./vectordb/jina_processed/examples_original.jsonl")
 
 
 def load_parent_store(jsonl_path: Path) -> InMemoryStore:
@@ -60,1013 +104,385 @@ def load_parent_store(jsonl_path: Path) -> InMemoryStore:
     return store
 
 
-def _rerank(query: str, docs: List[Document]) -> Tuple[List[Document], List[float]]:
-    """Cross-Encoder 점수로 재정렬 - 디버깅 로그 추가"""
-    print(f"🔄 Starting reranking with {len(docs)} documents...")
-
-    try:
-        passages = [d.page_content for d in docs]
-        print(f"   Extracted {len(passages)} passages")
+def _query_text(query: HumanMessage | str) -> str:
+    return query.content if hasattr(query, "content") else query
+
+
+def _save_scores(path: Path, scores: Sequence[float]) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([float(s) for s in scores], f, ensure_ascii=False)
+
+
+def _retrieve(
+    corpus,
+    query_text: str,
+    transform: str = "original_query",
+    weights: Optional[Sequence[float]] = None,
+    top_k: Optional[int] = None,
+    plan=None,
+    settings: Optional[RunSettings] = None,
+) -> RetrievalResult:
+    """settings (없으면 config)의 TOP_K / RERANK / 점수 하한을 따라 엔진 검색 실행"""
+    settings = settings or RunSettings.from_config()
+    if not settings.rerank:
+        logger.debug("⏭️ Skipping reranking (disabled)")
+    filters = ()
+    if settings.sim_threshold is not None:
+        filters = (min_similarity_filter(settings.sim_threshold),)
+    return engine.retrieve(
+        query_text,
+        corpus,
+        transform=transform,
+        plan=plan,
+        top_k=top_k or settings.top_k,
+        weights=weights,
+        rerank=settings.rerank,
+        filters=filters,
+    )
 
-        pairs = [[query, passage] for passage in passages]
-        print(f"   Created {len(pairs)} query-passage pairs")
 
-        print(f"   Using reranker: {config.RERANKER_NAME}")
-        scores = reranker.score(pairs)
-        print(f"   ✅ Reranker scores computed: {scores}")
+def _file_corpus(
+    source: Path, to_docs: Callable[[Path], List[Document]]
+) -> Optional[Corpus]:
+    """
+    업로드 파일 (PDF / 이미지 폴더) corpus
+
+    - 메모리: 파일 content hash 단위로 벡터 + BM25 유지 (config.FILE_INDEX_TTL초 동안 미사용 시 제거)
+    - 디스크: OCR 캐시가 켜져 있으면 chunk / chunk 임베딩 재사용
+    """
+
+    def build() -> Optional[Corpus]:
+        docs = to_docs(source)
+        if not docs:
+            return None
+        cache = utils.ocr_cache
+        if cache is None:
+            return engine.corpus_from_documents(docs, name=str(source))
+
+        key = cache.file_key(source)
+        embed_id = "|".join(
+            [
+                config.EMBED_MODEL_NAME,
+                str(EMBED_TASKS["passage"]),
+                config.INFERENCE_BACKEND,
+                str(config.ONNX_QUANTIZE),
+            ]
+        )
+        vectors = cache.get_vectors(key, embed_id)
+        if vectors is not None and len(vectors) != len(docs):
+            vectors = None
+        corpus = engine.corpus_from_documents(docs, name=str(source), vectors=vectors)
+        if vectors is None:
+            cache.put_vectors(key, embed_id, corpus.vectors)
+        return corpus
 
-        ranked = sorted(zip(docs, scores), key=lambda t: t[1], reverse=True)
-        docs_sorted, scores_sorted = zip(*ranked)
+    return engine.file_corpus(content_hash(source), build)
 
-        print(f"   ✅ Reranking completed successfully")
-        return list(docs_sorted), list(scores_sorted)
 
-    except Exception as e:
-        print(f"   ❌ Error in _rerank: {e}")
-        print(f"   Error type: {type(e).__name__}")
-        raise e
+def _retrieve_from_docs(
+    query: HumanMessage | str, corpus: Corpus, top_k: int
+) -> List[Document]:
+    """업로드 파일 (PDF / 이미지) 문서에서 config.RETRIEVAL_TYPE 방식으로 검색"""
+    transform = (
+        config.RETRIEVAL_TYPE
+        if config.RETRIEVAL_TYPE in engine.transforms
+        else "original_query"
+    )
+    weights = None
+    if config.HYBRID_WEIGHT < 1.0:
+        weights = (config.HYBRID_WEIGHT, 1.0 - config.HYBRID_WEIGHT)
+
+    result = _retrieve(
+        corpus,
+        _query_text(query),
+        transform=transform,
+        weights=weights,
+        top_k=top_k,
+    )
+    _save_scores(config.SCORE_PATH, result.scores)
+    return result.docs
 
 
 def retrieve_from_file_embedding(
     query: HumanMessage | str, pdf_path: Path, top_k: int = config.TOP_K
 ) -> List[Document]:
-    docs = utils.pdf_to_docs(pdf_path)
+    corpus = _file_corpus(pdf_path, utils.pdf_to_docs)
 
-    if not docs:
+    if corpus is None:
         return "Failed to extract text from PDF!"
 
-    query_text = query.content if hasattr(query, "content") else query
-    texts = [d.page_content for d in docs]
-
-    # Determine retrieval approach based on config
-    hybrid_weight_check = config.HYBRID_WEIGHT < 1.0
-
-    if config.RETRIEVAL_TYPE == "original_query":
-        search_query = query_text
-    elif config.RETRIEVAL_TYPE == "hyde":
-        # Generate HyDE documents and use their average embedding
-        hypo_docs = []
-        hydes = []
-        for _ in range(5):
-            try:
-                hypo_doc = utils.generate_hyde_document(query_text)
-                embedding = model.encode(hypo_doc, normalize_embeddings=True)
-                hypo_docs.append(hypo_doc)  # 텍스트 저장
-                hydes.append(embedding)  # 벡터 저장
-            except Exception as e:
-                print(f"Error generating HyDE document: {e}")
-                continue
-
-        if hydes:
-            mean_hyde = np.mean(np.stack(hydes, axis=0), axis=0)
-            norm = np.linalg.norm(mean_hyde)
-            if norm > 0:
-                mean_hyde /= norm
-            q_vecs = mean_hyde
-        else:
-            q_vecs = model.encode(
-                [query_text], convert_to_tensor=True, normalize_embeddings=True
-            )[0]
-        search_query = None
-    elif config.RETRIEVAL_TYPE == "summary":
-        search_query = utils.generate_summary(query_text)
-    elif config.RETRIEVAL_TYPE == "summary_mean":
-        # Generate multiple summaries and use their average embedding
-        summaries = []
-        summary_texts = []
-        for _ in range(5):
-            try:
-                summary_text = utils.generate_summary(query_text)
-                embedding = model.encode(summary_text, normalize_embeddings=True)
-                summary_texts.append(summary_text)
-                summaries.append(embedding)
-            except Exception as e:
-                print(f"Error generating summary: {e}")
-                continue
-
-        if summaries:
-            mean_summary = np.mean(np.stack(summaries, axis=0), axis=0)
-            norm = np.linalg.norm(mean_summary)
-            if norm > 0:
-                mean_summary /= norm
-            q_vecs = mean_summary
-        else:
-            q_vecs = model.encode(
-                [query_text], convert_to_tensor=True, normalize_embeddings=True
-            )[0]
-        search_query = None
-    else:
-        search_query = query_text
-
-    # Calculate similarity scores
-    doc_vecs = model.encode(texts, convert_to_tensor=True, normalize_embeddings=True)
-
-    if search_query is not None:
-        q_vecs = model.encode(
-            [search_query], convert_to_tensor=True, normalize_embeddings=True
-        )[0]
-
-    # Vector similarity scores
-    cos_sim = util.cos_sim(q_vecs, doc_vecs)[0].float().cpu().numpy()
-
-    if hybrid_weight_check:
-        # Hybrid retrieval: combine vector similarity with BM25
-
-        # Tokenize documents for BM25
-        tokenized_docs = [doc.split() for doc in texts]
-        bm25 = BM25Okapi(tokenized_docs)
-
-        if config.RETRIEVAL_TYPE == "hyde":
-            search_query = hypo_docs[0] if hypo_docs else query_text
-        elif config.RETRIEVAL_TYPE == "summary_mean":
-            search_query = summary_texts[0] if summary_texts else query_text
-
-        bm25_query = search_query.split()
-        bm25_scores = np.array(bm25.get_scores(bm25_query))
-
-        # Normalize BM25 scores to [0, 1]
-        if bm25_scores.max() > bm25_scores.min():
-            bm25_scores = (bm25_scores - bm25_scores.min()) / (
-                bm25_scores.max() - bm25_scores.min()
-            )
-
-        # Combine scores using hybrid weights
-        hybrid_weight_embedding = config.HYBRID_WEIGHT
-        hybrid_weight_bm25 = 1.0 - hybrid_weight_embedding
-
-        combined_scores = (
-            hybrid_weight_embedding * cos_sim + hybrid_weight_bm25 * bm25_scores
-        )
-
-        best_idx = combined_scores.argsort()[-top_k:][::-1]
-        best_scores = combined_scores[best_idx]
-    else:
-        # Pure vector similarity
-        best_idx = cos_sim.argsort()[-top_k:][::-1]
-        best_scores = cos_sim[best_idx]
-
-    best_docs = [docs[i] for i in best_idx]
-
-    with open(config.SCORE_PATH, "w") as f:
-        json.dump(best_scores.tolist(), f)
-
-    # Apply reranking if enabled
-    if config.RERANK:
-        print("🔄 Applying reranking...")
-        try:
-            reranked_docs, scores = _rerank(query_text, best_docs)
-            print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-            print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-            return reranked_docs
-        except Exception as rerank_error:
-            print(f"   ❌ Reranking failed: {rerank_error}")
-            print(f"   Falling back to original results")
-            return best_docs
-    else:
-        print("⏭️ Skipping reranking (disabled)")
-
-    return best_docs
+    return _retrieve_from_docs(query, corpus, top_k)
 
 
 def retrieve_from_img_embedding(
     query: HumanMessage | str, img_path: Path, top_k: int = config.TOP_K
 ) -> List[Document]:
-    docs = utils.img_to_docs(img_path)
+    corpus = _file_corpus(img_path, utils.img_to_docs)
 
-    if not docs:
+    if corpus is None:
         return "Failed to extract text from image!"
 
-    query_text = query.content if hasattr(query, "content") else query
-    texts = [d.page_content for d in docs]
-
-    # Determine retrieval approach based on config
-    hybrid_weight_check = config.HYBRID_WEIGHT < 1.0
-
-    if config.RETRIEVAL_TYPE == "original_query":
-        search_query = query_text
-    elif config.RETRIEVAL_TYPE == "hyde":
-        # Generate HyDE documents and use their average embedding
-        hydes = []
-        hypo_docs = []
-        for _ in range(5):
-            try:
-                hypo_doc = utils.generate_hyde_document(query_text)
-                embedding = model.encode(hypo_doc, normalize_embeddings=True)
-                hydes.append(embedding)
-                hypo_docs.append(hypo_doc)
-            except Exception as e:
-                print(f"Error generating HyDE document: {e}")
-                continue
-
-        if hydes:
-            mean_hyde = np.mean(np.stack(hydes, axis=0), axis=0)
-            norm = np.linalg.norm(mean_hyde)
-            if norm > 0:
-                mean_hyde /= norm
-            q_vecs = mean_hyde
-        else:
-            q_vecs = model.encode(
-                [query_text], convert_to_tensor=True, normalize_embeddings=True
-            )[0]
-        search_query = None
-    elif config.RETRIEVAL_TYPE == "summary":
-        search_query = utils.generate_summary(query_text)
-    elif config.RETRIEVAL_TYPE == "summary_mean":
-        # Generate multiple summaries and use their average embedding
-        summaries = []
-        summary_texts = []
-        for _ in range(5):
-            try:
-                summary_text = utils.generate_summary(query_text)
-                embedding = model.encode(summary_text, normalize_embeddings=True)
-                summary_texts.append(summary_text)
-                summaries.append(embedding)
-            except Exception as e:
-                print(f"Error generating summary: {e}")
-                continue
-
-        if summaries:
-            mean_summary = np.mean(np.stack(summaries, axis=0), axis=0)
-            norm = np.linalg.norm(mean_summary)
-            if norm > 0:
-                mean_summary /= norm
-            q_vecs = mean_summary
-        else:
-            q_vecs = model.encode(
-                [query_text], convert_to_tensor=True, normalize_embeddings=True
-            )[0]
-        search_query = None
-    else:
-        search_query = query_text
-
-    # Calculate similarity scores
-    doc_vecs = model.encode(texts, convert_to_tensor=True, normalize_embeddings=True)
-
-    if search_query is not None:
-        q_vecs = model.encode(
-            [search_query], convert_to_tensor=True, normalize_embeddings=True
-        )[0]
-
-    # Vector similarity scores
-    cos_sim = util.cos_sim(q_vecs, doc_vecs)[0].float().cpu().numpy()
-
-    if hybrid_weight_check:
-        # Hybrid retrieval: combine vector similarity with BM25
-
-        # Tokenize documents for BM25
-        tokenized_docs = [doc.split() for doc in texts]
-        bm25 = BM25Okapi(tokenized_docs)
-
-        if config.RETRIEVAL_TYPE == "hyde":
-            search_query = hypo_docs[0] if hypo_docs else query_text
-        elif config.RETRIEVAL_TYPE == "summary_mean":
-            search_query = summary_texts[0] if summary_texts else query_text
-
-        bm25_query = search_query.split()
-        bm25_scores = np.array(bm25.get_scores(bm25_query))
-
-        # Normalize BM25 scores to [0, 1]
-        if bm25_scores.max() > bm25_scores.min():
-            bm25_scores = (bm25_scores - bm25_scores.min()) / (
-                bm25_scores.max() - bm25_scores.min()
-            )
+    return _retrieve_from_docs(query, corpus, top_k)
 
-        # Combine scores using hybrid weights
-        hybrid_weight_embedding = config.HYBRID_WEIGHT
-        hybrid_weight_bm25 = 1.0 - hybrid_weight_embedding
 
-        combined_scores = (
-            hybrid_weight_embedding * cos_sim + hybrid_weight_bm25 * bm25_scores
-        )
-
-        best_idx = combined_scores.argsort()[-top_k:][::-1]
-        best_scores = combined_scores[best_idx]
-    else:
-        # Pure vector similarity
-        best_idx = cos_sim.argsort()[-top_k:][::-1]
-        best_scores = cos_sim[best_idx]
-
-    best_docs = [docs[i] for i in best_idx]
-
-    with open(config.SCORE_PATH, "w") as f:
-        json.dump(best_scores.tolist(), f)
-
-    # Apply reranking if enabled
-    if config.RERANK:
-        print("🔄 Applying reranking...")
-        try:
-            reranked_docs, scores = _rerank(query_text, best_docs)
-            print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-            print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-            return reranked_docs
-        except Exception as rerank_error:
-            print(f"   ❌ Reranking failed: {rerank_error}")
-            print(f"   Falling back to original results")
-            return best_docs
-    else:
-        print("⏭️ Skipping reranking (disabled)")
-
-    return best_docs
-
-
-def vectordb_retrieve(query: HumanMessage | str) -> List[Document]:
-    """기본 벡터 DB 검색 - 상세한 디버깅 로그 추가"""
-    print(f"🔍 Starting vectordb_retrieve with query: {query}")
+def vectordb_retrieve(
+    query: HumanMessage | str, settings: Optional[RunSettings] = None
+) -> List[Document]:
+    """기본 벡터 DB 검색"""
+    logger.debug("🔍 Starting vectordb_retrieve with query: %s", query)
 
     try:
-        # Step 1: Query 변환
-        print("📝 Step 1: Converting query to text...")
-        query_text = query.content if hasattr(query, "content") else query
-        print(f"   Query text: '{query_text}' (type: {type(query_text)})")
-
-        # Step 2: Vector DB 로딩
-        print("📂 Step 2: Loading vector database...")
-        print(f"   DB path: {config.CONTENT_DB_PATH}")
-        print(f"   Path exists: {config.CONTENT_DB_PATH.exists()}")
-
         if not config.CONTENT_DB_PATH.exists():
             raise FileNotFoundError(
                 f"Vector database not found at {config.CONTENT_DB_PATH}"
             )
 
-        vectordb = FAISS.load_local(
-            config.CONTENT_DB_PATH,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True,
+        result = _retrieve(
+            engine.corpus(config.CONTENT_DB_PATH),
+            _query_text(query),
+            settings=settings,
         )
-        print(f"   ✅ Vector DB loaded successfully")
-        print(f"   DB info: {len(vectordb.docstore._dict)} documents in store")
+        logger.debug("   ✅ Found %s documents", len(result.docs))
 
-        # Step 3: Query 임베딩 생성
-        print("🔢 Step 3: Generating query embedding...")
-        query_emb = model.encode(
-            query_text,
-            convert_to_tensor=False,
-            normalize_embeddings=True,
-        )
-        print(f"   ✅ Query embedding shape: {query_emb.shape}")
-        print(f"   Embedding dtype: {query_emb.dtype}")
-
-        # Step 4: 유사도 검색
-        print(f"🔍 Step 4: Performing similarity search (TOP_K={config.TOP_K})...")
-        sem = vectordb.similarity_search_by_vector(query_emb, k=config.TOP_K)
-        print(f"   ✅ Found {len(sem)} documents")
-
-        if not sem:
-            print("   ⚠️ Warning: No documents found in similarity search")
+        if not result.docs:
+            logger.warning("   ⚠️ Warning: No documents found in similarity search")
             return []
 
-        # 검색 결과 미리보기
-        for i, doc in enumerate(sem[:2]):  # 첫 2개 문서만 미리보기
-            preview = (
-                doc.page_content[:100] + "..."
-                if len(doc.page_content) > 100
-                else doc.page_content
-            )
-            print(f"   Doc {i+1} preview: {preview}")
-
-        # Step 5: 문서 임베딩 생성
-        print("🔢 Step 5: Generating document embeddings...")
-        doc_contents = [d.page_content for d in sem]
-        print(f"   Processing {len(doc_contents)} document contents")
-
-        doc_vecs = model.encode(
-            doc_contents,
-            convert_to_tensor=False,
-            normalize_embeddings=True,
-        )
-        print(f"   ✅ Document embeddings shape: {doc_vecs.shape}")
-
-        # Step 6: 코사인 유사도 계산
-        print("📊 Step 6: Computing cosine similarity...")
-        cos_sim = util.cos_sim(query_emb, doc_vecs)[0].float().cpu().numpy()
-        print(f"   ✅ Similarity scores: {cos_sim}")
-        print(f"   Max score: {cos_sim.max():.4f}, Min score: {cos_sim.min():.4f}")
-
-        # Step 7: 출력 디렉토리 확인 및 점수 저장
-        print("💾 Step 7: Saving similarity scores...")
-        output_dir = Path(config.OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        print(f"   Output directory: {output_dir}")
-
-        with open(config.SAVE_PATH, "w", encoding="utf-8") as f:
-            json.dump(cos_sim.tolist(), f, ensure_ascii=False)
-        print(f"   ✅ Scores saved to: {config.SAVE_PATH}")
-
-        # Step 8: Reranking (선택적)
-        if config.RERANK:
-            print("🔄 Step 8: Applying reranking...")
-            try:
-                reranked_docs, scores = _rerank(query_text, sem)
-                print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-                print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-                return reranked_docs
-            except Exception as rerank_error:
-                print(f"   ❌ Reranking failed: {rerank_error}")
-                print(f"   Falling back to original results")
-                return sem
-        else:
-            print("⏭️ Step 8: Skipping reranking (disabled)")
-
-        print("✅ vectordb_retrieve completed successfully")
-        return sem
+        _save_scores(config.SAVE_PATH, result.scores)
+        logger.debug("   ✅ Scores saved to: %s", config.SAVE_PATH)
+        return result.docs
 
     except FileNotFoundError as e:
-        print(f"❌ FileNotFoundError in vectordb_retrieve: {e}")
-        print(f"   Check if vector database exists at: {config.CONTENT_DB_PATH}")
+        logger.error("❌ FileNotFoundError in vectordb_retrieve: %s", e)
+        logger.debug(
+            "   Check if vector database exists at: %s", config.CONTENT_DB_PATH
+        )
         return []
 
     except Exception as e:
-        print(f"❌ Unexpected error in vectordb_retrieve: {e}")
-        print(f"   Error type: {type(e).__name__}")
-        print(f"   Error details: {str(e)}")
+        logger.error("❌ Unexpected error in vectordb_retrieve: %s", e)
+        logger.error("   Error type: %s", type(e).__name__)
 
-        # 스택 트레이스 출력
-        import traceback
-
-        print("📋 Full traceback:")
-        traceback.print_exc()
+        logger.debug("📋 Full traceback:")
+        logger.debug("Traceback:", exc_info=True)
 
         return []
 
 
 def vectordb_hybrid_retrieve(
-    query: HumanMessage | str, weights: List[float]
+    query: HumanMessage | str,
+    weights: List[float],
+    settings: Optional[RunSettings] = None,
 ) -> List[Document]:
-    """FAISS + BM25 하이브리드 검색 - 반환값 일관성 수정"""
+    """FAISS + BM25 하이브리드 검색"""
     try:
-        query_text = query.content if hasattr(query, "content") else query
-
-        vectordb = FAISS.load_local(
-            config.CONTENT_DB_PATH,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True,
+        result = _retrieve(
+            engine.corpus(config.CONTENT_DB_PATH),
+            _query_text(query),
+            weights=weights,
+            settings=settings,
         )
-
-        # Use weighted sum hybrid approach instead of ensemble retriever
-        all_docs: List[Document] = list(vectordb.docstore._dict.values())
-        texts: List[str] = [doc.page_content for doc in all_docs]
-
-        # Vector similarity scores
-        query_emb = model.encode(
-            query_text, convert_to_tensor=False, normalize_embeddings=True
-        )
-        doc_vecs = model.encode(
-            texts, convert_to_tensor=True, normalize_embeddings=True
-        )
-        cos_sim_scores = util.cos_sim(query_emb, doc_vecs)[0].cpu().numpy()
-
-        # BM25 scores
-        tokenized_texts = [text.split() for text in texts]
-        bm25 = BM25Okapi(tokenized_texts)
-        bm25_query_tokens = query_text.split()
-        bm25_scores = np.array(bm25.get_scores(bm25_query_tokens))
-
-        # Normalize BM25 scores to [0, 1]
-        if bm25_scores.max() > bm25_scores.min():
-            bm25_scores = (bm25_scores - bm25_scores.min()) / (
-                bm25_scores.max() - bm25_scores.min()
-            )
-        else:
-            bm25_scores = np.zeros_like(bm25_scores)
-
-        # Combine scores using weighted sum
-        w1, w2 = weights
-        hybrid_scores = w1 * cos_sim_scores + w2 * bm25_scores
-
-        # Get top-k documents
-        top_indices = hybrid_scores.argsort()[-config.TOP_K :][::-1]
-        sem = [all_docs[i] for i in top_indices]
-        top_scores = hybrid_scores[top_indices]
-
-        # 출력 디렉토리 생성 확인
-        output_dir = Path(config.OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        with open(config.SCORE_PATH, "w", encoding="utf-8") as f:
-            json.dump(top_scores.tolist(), f, ensure_ascii=False)
-
-        # Apply reranking if enabled
-        if config.RERANK:
-            print("🔄 Applying reranking...")
-            try:
-                reranked_docs, scores = _rerank(query_text, sem)
-                print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-                print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-                return reranked_docs
-            except Exception as rerank_error:
-                print(f"   ❌ Reranking failed: {rerank_error}")
-                print(f"   Falling back to original results")
-                return sem
-        else:
-            print("⏭️ Skipping reranking (disabled)")
-
-        return sem
+        _save_scores(config.SCORE_PATH, result.scores)
+        return result.docs
 
     except Exception as e:
-        print(f"Error in vectordb_hybrid_retrieve: {e}")
+        logger.error("Error in vectordb_hybrid_retrieve: %s", e)
         return []
 
 
-def summary_retrieve(query: HumanMessage | str) -> Tuple[List[Document], str]:
+def summary_retrieve(
+    query: HumanMessage | str, settings: Optional[RunSettings] = None
+) -> Tuple[List[Document], str]:
     """FAISS + LLM 설명 + 임베딩 검색"""
-    query_text = query.content if hasattr(query, "content") else query
-
-    vectordb = FAISS.load_local(
-        config.CONTENT_DB_PATH,
-        embeddings=embeddings,
-        allow_dangerous_deserialization=True,
-    )
-
-    query_explanation = utils.generate_summary(query_text)
-
-    query_emb = model.encode(
-        query_explanation,
-        convert_to_tensor=False,
-        normalize_embeddings=True,
+    result = _retrieve(
+        engine.corpus(config.CONTENT_DB_PATH),
+        _query_text(query),
+        transform="summary",
+        settings=settings,
     )
-
-    sem = vectordb.similarity_search_by_vector(query_emb, k=config.TOP_K)
-
-    doc_vecs = model.encode(
-        [d.page_content for d in sem],
-        convert_to_tensor=False,
-        normalize_embeddings=True,
-    )
-
-    cos_sim = util.cos_sim(query_emb, doc_vecs)[0].float().cpu().numpy()
-    with open(config.SCORE_PATH, "w", encoding="utf-8") as f:
-        json.dump(cos_sim.tolist(), f, ensure_ascii=False)
-
-    # Apply reranking if enabled
-    if config.RERANK:
-        print("🔄 Applying reranking...")
-        try:
-            reranked_docs, scores = _rerank(query_text, sem)
-            print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-            print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-            return reranked_docs, query_explanation
-        except Exception as rerank_error:
-            print(f"   ❌ Reranking failed: {rerank_error}")
-            print(f"   Falling back to original results")
-            return sem, query_explanation
-    else:
-        print("⏭️ Skipping reranking (disabled)")
-
-    return sem, query_explanation
+    _save_scores(config.SCORE_PATH, result.scores)
+    return result.docs, result.plan.explanation
 
 
 def summary_hybrid_retrieve(
-    query: HumanMessage | str, weights: List[float] = [0.5, 0.5]
+    query: HumanMessage | str,
+    weights: List[float] = [0.5, 0.5],
+    settings: Optional[RunSettings] = None,
 ) -> Tuple[List[Document], str]:
     """FAISS + BM25 하이브리드 검색 + LLM 설명"""
-    query_text = query.content if hasattr(query, "content") else query
-
-    vectordb = FAISS.load_local(
-        config.CONTENT_DB_PATH,
-        embeddings=embeddings,
-        allow_dangerous_deserialization=True,
+    result = _retrieve(
+        engine.corpus(config.CONTENT_DB_PATH),
+        _query_text(query),
+        transform="summary",
+        weights=weights,
+        settings=settings,
     )
+    _save_scores(config.SCORE_PATH, result.scores)
+    return result.docs, result.plan.explanation
 
-    # LLM으로 질문 설명 생성
-    query_explanation = utils.generate_summary(query_text)
-
-    all_docs: List[Document] = list(vectordb.docstore._dict.values())
-    texts: List[str] = [doc.page_content for doc in all_docs]
-
-    # Step 5: FAISS 기반 코사인 유사도 계산
-    doc_vecs = model.encode(texts, convert_to_tensor=True, normalize_embeddings=True)
-    query_vec = model.encode(
-        query_explanation, convert_to_tensor=True, normalize_embeddings=True
-    )
-
-    cos_sim_scores = util.cos_sim(query_vec, doc_vecs)[0].cpu().numpy()
-
-    # Step 6: BM25 점수 계산
-    tokenized_texts = [text.split() for text in texts]
-    bm25 = BM25Okapi(tokenized_texts)
-    bm25_query = query_explanation.split()
-    bm25_scores = np.array(bm25.get_scores(bm25_query))
-
-    # Step 7: BM25 점수 정규화
-    if bm25_scores.max() > bm25_scores.min():
-        bm25_scores = (bm25_scores - bm25_scores.min()) / (
-            bm25_scores.max() - bm25_scores.min()
-        )
 
-    # Step 8: 가중합 스코어 계산
-    w1, w2 = weights
-    hybrid_scores = w1 * cos_sim_scores + w2 * bm25_scores
-
-    # Step 9: 정렬 및 결과 문서 추출
-    top_k = config.TOP_K
-    top_indices = hybrid_scores.argsort()[-top_k:][::-1]
-    top_docs = [all_docs[i] for i in top_indices]
-    top_scores = hybrid_scores[top_indices]
-
-    # Step 10: 저장 및 반환
-    Path(config.SCORE_PATH).parent.mkdir(parents=True, exist_ok=True)
-    with open(config.SCORE_PATH, "w", encoding="utf-8") as f:
-        json.dump(top_scores.tolist(), f, ensure_ascii=False)
-
-    # Apply reranking if enabled
-    if config.RERANK:
-        print("🔄 Applying reranking...")
-        try:
-            reranked_docs, scores = _rerank(query_text, top_docs)
-            print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-            print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-            return reranked_docs, query_explanation
-        except Exception as rerank_error:
-            print(f"   ❌ Reranking failed: {rerank_error}")
-            print(f"   Falling back to original results")
-            return top_docs, query_explanation
-    else:
-        print("⏭️ Skipping reranking (disabled)")
-
-    return top_docs, query_explanation
-
-
-def hyde_retrieve(query: str) -> Tuple[List[Document], List[str]]:
-    """HyDE 검색 - 에러 처리 및 반환값 일관성 개선"""
+def summary_mean_retrieve(
+    query: HumanMessage | str, settings: Optional[RunSettings] = None
+) -> Tuple[List[Document], List[str]]:
+    """LLM 설명 5개의 평균 임베딩으로 검색"""
     try:
-        query_text = query.content if hasattr(query, "content") else query
-
-        vectordb = FAISS.load_local(
-            config.CONTENT_DB_PATH,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True,
+        result = _retrieve(
+            engine.corpus(config.CONTENT_DB_PATH),
+            _query_text(query),
+            transform="summary_mean",
+            settings=settings,
         )
+        _save_scores(config.SCORE_PATH, result.scores)
+        return result.docs, result.plan.explanation
 
-        hydes: List[np.ndarray] = []
-        hypo_docs: List[str] = []
-
-        for i in range(5):
-            try:
-                hypo_doc = utils.generate_hyde_document(query_text)
-                hypo_docs.append(hypo_doc)
-
-                embedding = model.encode(
-                    hypo_doc,
-                    convert_to_tensor=True,
-                    normalize_embeddings=True,
-                ).cpu()
-                hydes.append(embedding)
-
-            except Exception as e:
-                print(f"Error generating HyDE document {i+1}: {e}")
-                continue
-
-        if not hydes:
-            print("Warning: No HyDE documents generated, falling back to direct search")
-            return vectordb_retrieve(query), []
-
-        mean_hyde = torch.stack(hydes).mean(dim=0)
-        mean_hyde = F.normalize(mean_hyde, p=2, dim=0)
+    except Exception as e:
+        logger.error("❌ Error in summary_mean_retrieve: %s", e)
+        return [], []
 
-        mean_hyde_np = mean_hyde.float().numpy()
 
-        sem = vectordb.similarity_search_by_vector(mean_hyde_np, k=config.TOP_K)
+def summary_mean_retrieve_hybrid(
+    query: HumanMessage | str,
+    weights: List[float] = [0.5, 0.5],
+    settings: Optional[RunSettings] = None,
+) -> Tuple[List[Document], List[str]]:
+    """LLM 설명 5개의 평균 임베딩 + BM25 하이브리드 검색"""
+    try:
+        result = _retrieve(
+            engine.corpus(config.CONTENT_DB_PATH),
+            _query_text(query),
+            transform="summary_mean",
+            weights=weights,
+            settings=settings,
+        )
+        _save_scores(config.SCORE_PATH, result.scores)
+        return result.docs, result.plan.explanation
 
-        sem_vecs = model.encode(
-            [d.page_content for d in sem],
-            convert_to_tensor=True,
-            normalize_embeddings=True,
-        ).cpu()
+    except Exception as e:
+        logger.error("❌ Error in summary_mean_retrieve_hybrid: %s", e)
+        logger.debug("Traceback:", exc_info=True)
+        return [], []
 
-        dtype = torch.float32
-        mean_hyde = mean_hyde.to(dtype)
-        sem_vecs = sem_vecs.to(dtype)
-        sem_hyde_cos_sim = util.cos_sim(mean_hyde.unsqueeze(0), sem_vecs)[0].numpy()
 
-        # 출력 디렉토리 생성 확인
-        output_dir = Path(config.OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        with open(config.SCORE_PATH, "w", encoding="utf-8") as f:
-            json.dump(sem_hyde_cos_sim.tolist(), f, ensure_ascii=False)
-
-        # Apply reranking if enabled
-        if config.RERANK:
-            print("🔄 Applying reranking...")
-            try:
-                reranked_docs, scores = _rerank(query_text, sem)
-                print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-                print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-                return reranked_docs, hypo_docs
-            except Exception as rerank_error:
-                print(f"   ❌ Reranking failed: {rerank_error}")
-                print(f"   Falling back to original results")
-                return sem, hypo_docs
-        else:
-            print("⏭️ Skipping reranking (disabled)")
-
-        return sem, hypo_docs
+def hyde_retrieve(
+    query: str, settings: Optional[RunSettings] = None
+) -> Tuple[List[Document], List[str]]:
+    """HyDE 검색"""
+    try:
+        result = _retrieve(
+            engine.corpus(config.CONTENT_DB_PATH),
+            _query_text(query),
+            transform="hyde",
+            settings=settings,
+        )
+        _save_scores(config.SCORE_PATH, result.scores)
+        return result.docs, result.plan.explanation
 
     except Exception as e:
-        print(f"Error in hyde_retrieve: {e}")
+        logger.error("Error in hyde_retrieve: %s", e)
         return [], []
 
 
 def hyde_hybrid_retrieve(
-    query: HumanMessage | str, weights: List[float]
+    query: HumanMessage | str,
+    weights: List[float],
+    settings: Optional[RunSettings] = None,
 ) -> Tuple[List[Document], str]:
     """HyDE + 하이브리드 검색"""
-    query_text = query.content if hasattr(query, "content") else query
-
-    vectordb = FAISS.load_local(
-        config.CONTENT_DB_PATH,
-        embeddings=embeddings,
-        allow_dangerous_deserialization=True,
+    result = _retrieve(
+        engine.corpus(config.CONTENT_DB_PATH),
+        _query_text(query),
+        transform="hyde",
+        weights=weights,
+        settings=settings,
     )
-    all_docs: List[Document] = list(vectordb.docstore._dict.values())
-    texts: List[str] = [doc.page_content for doc in all_docs]
-
-    # HyDE 문서 생성
-    hydes: List[np.ndarray] = []
-    hypo_docs: List[str] = []
+    _save_scores(config.SCORE_PATH, result.scores)
+    return result.docs, result.plan.explanation
 
-    for _ in range(5):
-        hypo_doc = utils.generate_hyde_document(query_text)
-        hypo_docs.append(hypo_doc)
 
-        embedding = model.encode(
-            hypo_doc,
-            convert_to_tensor=False,
-            normalize_embeddings=True,
+def _parent_docs(summary_docs: List[Document]) -> List[dict]:
+    """summary / examples 문서의 parent_id로 원본 문서 조회"""
+    if not PARENT_JSONL_PATH.exists():
+        logger.warning(
+            "   ⚠️ Warning: Parent-child mapping file not found at %s",
+            PARENT_JSONL_PATH,
         )
-        hydes.append(embedding)
-
-    # 가설 문서 임베딩의 평균 계산
-    mean_hyde = np.mean(np.stack(hydes, axis=0), axis=0)
-    norm = np.linalg.norm(mean_hyde)
-    if norm > 0:
-        mean_hyde /= norm
-
-    doc_vecs = model.encode(texts, convert_to_tensor=True, normalize_embeddings=True)
-
-    cos_sim_scores = util.cos_sim(mean_hyde, doc_vecs)[0].cpu().numpy()  # (N,)
-
-    # BM25
-    tokenized_texts = [text.split() for text in texts]
-    bm25 = BM25Okapi(tokenized_texts)
-
-    bm25_query = hypo_docs[0] if hypo_docs else query_text
-    bm25_query_tokens = bm25_query.split()
-    bm25_raw_scores = np.array(bm25.get_scores(bm25_query_tokens))
-
-    if bm25_raw_scores.max() > bm25_raw_scores.min():
-        bm25_scores = (bm25_raw_scores - bm25_raw_scores.min()) / (
-            bm25_raw_scores.max() - bm25_raw_scores.min()
-        )
-    else:
-        bm25_scores = np.zeros_like(bm25_raw_scores)
-
-    w1, w2 = weights
-    hybrid_scores = w1 * cos_sim_scores + w2 * bm25_scores
-
-    top_k = config.TOP_K
-    top_indices = hybrid_scores.argsort()[-top_k:][::-1]
-    top_docs = [all_docs[i] for i in top_indices]
-    top_scores = hybrid_scores[top_indices]
-
-    Path(config.SCORE_PATH).parent.mkdir(parents=True, exist_ok=True)
-    with open(config.SCORE_PATH, "w", encoding="utf-8") as f:
-        json.dump([float(s) for s in top_scores], f, ensure_ascii=False)
-
-    # Apply reranking if enabled
-    if config.RERANK:
-        print("🔄 Applying reranking...")
-        try:
-            reranked_docs, scores = _rerank(query_text, top_docs)
-            print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-            print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-            return reranked_docs, hypo_docs
-        except Exception as rerank_error:
-            print(f"   ❌ Reranking failed: {rerank_error}")
-            print(f"   Falling back to original results")
-            return top_docs, hypo_docs
-    else:
-        print("⏭️ Skipping reranking (disabled)")
-
-    return top_docs, hypo_docs
+        return []
+    parent_doc_map = engine.parent_map(PARENT_JSONL_PATH)
+    parent_docs = [
+        parent_doc_map[d.metadata["parent_id"]]
+        for d in summary_docs
+        if d.metadata.get("parent_id") in parent_doc_map
+    ]
+    logger.debug("   ✅ Loaded %s parent documents", len(parent_docs))
+    return parent_docs
+
+
+def _expanded_query_plan(query_text: str, content_docs: List[Document]):
+    """질문 + 검색된 본문으로 확장한 쿼리 (summary / examples DB 검색용)"""
+    query_with_content = (
+        query_text + "\n" + "\n".join(doc.page_content for doc in content_docs)
+    )
+    return QueryPlan(query_text, [query_with_content], "query", query_with_content)
 
 
 def query_expansion_retrieve(
-    query: HumanMessage | str,
+    query: HumanMessage | str, settings: Optional[RunSettings] = None
 ) -> Tuple[List[Document], List[dict]]:
-    print(f"🔍 Starting query_expansion_retrieve with query: {query}")
-
-    try:
-        # Step 1: Query text extraction
-        query_text = query.content if hasattr(query, "content") else query
-        print(f"Query text: '{query_text}'")
-
-        # Step 2: Load vector databases
-        print("📂 Loading vector databases...")
-        content_vectordb = FAISS.load_local(
-            config.CONTENT_DB_PATH,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True,
-        )
-
-        summary_vectordb = FAISS.load_local(
-            config.SUMMARY_DB_PATH,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True,
-        )
-        print("   ✅ Vector databases loaded successfully")
-
-        # Step 3: Generate query embedding based on retrieval type
-        print(f"🔢 Generating query embedding (type: {config.RETRIEVAL_TYPE})...")
-
-        if config.RETRIEVAL_TYPE == "summary":
-            query_explanation = utils.generate_summary(query_text)
-            query_emb = model.encode(
-                query_explanation,
-                convert_to_tensor=False,
-                normalize_embeddings=True,
-            )
-        elif config.RETRIEVAL_TYPE == "hyde":
-            # Generate 5 HyDE documents and use their average embedding
-            hydes = []
-            for _ in range(5):
-                try:
-                    hypo_doc = utils.generate_hyde_document(query_text)
-                    embedding = model.encode(hypo_doc, normalize_embeddings=True)
-                    hydes.append(embedding)
-                except Exception as e:
-                    print(f"   Warning: Error generating HyDE document: {e}")
-                    continue
-
-            if hydes:
-                query_emb = np.mean(np.stack(hydes, axis=0), axis=0)
-                norm = np.linalg.norm(query_emb)
-                if norm > 0:
-                    query_emb /= norm
-            else:
-                print("   Warning: No HyDE documents generated, using original query")
-                query_emb = model.encode(query_text, normalize_embeddings=True)
-        elif config.RETRIEVAL_TYPE == "summary_mean":
-            # Generate 5 summaries and use their average embedding
-            summaries = []
-            for _ in range(5):
-                try:
-                    summary_text = utils.generate_summary(query_text)
-                    embedding = model.encode(summary_text, normalize_embeddings=True)
-                    summaries.append(embedding)
-                except Exception as e:
-                    print(f"   Warning: Error generating summary: {e}")
-                    continue
-
-            if summaries:
-                query_emb = np.mean(np.stack(summaries, axis=0), axis=0)
-                norm = np.linalg.norm(query_emb)
-                if norm > 0:
-                    query_emb /= norm
-            else:
-                print("   Warning: No summaries generated, using original query")
-                query_emb = model.encode(query_text, normalize_embeddings=True)
-        else:
-            query_emb = model.encode(query_text, normalize_embeddings=True)
-
-        print(f"   ✅ Query embedding generated, shape: {query_emb.shape}")
-
-        # Step 4: Retrieve from content database
-        print("🔍 Retrieving from content database...")
-        sem = content_vectordb.similarity_search_by_vector(query_emb, k=config.TOP_K)
-        print(f"   ✅ Retrieved {len(sem)} content documents")
-
-        # Step 5: Create expanded query with content
-        print("📝 Creating expanded query with content...")
-        content_texts = [doc.page_content for doc in sem]
-        query_with_content = query_text + "\n" + "\n".join(content_texts)
-
-        query_with_content_embed = model.encode(
-            query_with_content,
-            convert_to_tensor=False,
-            normalize_embeddings=True,
-        )
-        print(f"   ✅ Expanded query embedding generated")
-
-        # Step 6: Retrieve from summary/examples database
-        print("🔍 Retrieving from summary/examples database...")
-        summary_sem = summary_vectordb.similarity_search_by_vector(
-            query_with_content_embed, k=config.TOP_K
-        )
-        print(f"   ✅ Retrieved {len(summary_sem)} summary documents")
-
-        # Step 7: Load parent documents
-        print("📂 Loading parent documents...")
-        parent_child_matching_dir = Path(
-            "./vectordb/jina_processed/examples_original.jsonl"
-        )
-
-        if not parent_child_matching_dir.exists():
-            print(
-                f"   ⚠️ Warning: Parent-child mapping file not found at {parent_child_matching_dir}"
-            )
-            parent_docs = []
-        else:
-            parent_ids = [
-                d.metadata.get("parent_id")
-                for d in summary_sem
-                if d.metadata.get("parent_id")
-            ]
-            parent_doc_map = {}
-
-            with open(parent_child_matching_dir, "r", encoding="utf-8") as f:
-                for line in f:
-                    parent_doc = json.loads(line)
-                    parent_doc_map[parent_doc["id"].replace("parent-", "")] = parent_doc
-
-            parent_docs = []
-            for parent_id in parent_ids:
-                if parent_id in parent_doc_map:
-                    parent_docs.append(parent_doc_map[parent_id])
+    """
+    본문 DB 검색 후 질문 + 본문으로 확장한 쿼리로 summary / examples DB 검색
 
-            print(f"   ✅ Loaded {len(parent_docs)} parent documents")
+    settings.expansion_weight가 있으면 두 검색 모두 해당 가중치의 hybrid 검색
+    """
+    logger.debug("🔍 Starting query_expansion_retrieve with query: %s", query)
 
-        # Step 8: Calculate similarity scores
-        print("📊 Calculating similarity scores...")
-
-        # Content document embeddings
-        content_doc_vecs = model.encode(
-            [d.page_content for d in sem],
-            convert_to_tensor=False,
-            normalize_embeddings=True,
+    try:
+        settings = settings or RunSettings.from_config()
+        query_text = _query_text(query)
+        weights = settings.expansion_weights
+
+        # 1) 본문 DB 검색
+        content_corpus = engine.corpus(config.CONTENT_DB_PATH)
+        content = _retrieve(
+            content_corpus,
+            query_text,
+            transform=settings.retrieval_type,
+            weights=weights,
+            settings=settings,
         )
 
-        # Summary document embeddings
-        summary_doc_vecs = model.encode(
-            [d.page_content for d in summary_sem],
-            convert_to_tensor=False,
-            normalize_embeddings=True,
+        # 2) 질문 + 본문으로 확장한 쿼리로 summary / examples DB 검색 (rerank 없음)
+        summary_corpus = engine.corpus(config.SUMMARY_DB_PATH)
+        summary = engine.retrieve(
+            query_text,
+            summary_corpus,
+            plan=_expanded_query_plan(query_text, content.docs),
+            top_k=settings.top_k,
+            weights=weights,
         )
+        parent_docs = _parent_docs(summary.docs)
 
-        # Calculate cosine similarities
-        content_query_cos_sim = (
-            util.cos_sim(query_emb, content_doc_vecs)[0].float().cpu().numpy()
+        # 3) 유사도 점수 저장
+        summary_query_scores = engine.dense_scores(
+            summary_corpus,
+            content.query_vector,
+            [c.row for c in summary.candidates],
         )
-        summary_query_cos_sim = (
-            util.cos_sim(query_emb, summary_doc_vecs)[0].float().cpu().numpy()
+        output_dir = Path(config.OUTPUT_DIR)
+        _save_scores(output_dir / "content_query_similarity_score.json", content.scores)
+        _save_scores(
+            output_dir / "summary_query_similarity_score.json", summary_query_scores
         )
-        summary_expanded_query_cos_sim = (
-            util.cos_sim(query_with_content_embed, summary_doc_vecs)[0]
-            .float()
-            .cpu()
-            .numpy()
+        _save_scores(
+            output_dir / "content_expanded_query_similarity_score.json", summary.scores
         )
 
-        print(f"   ✅ Similarity scores calculated")
-
-        # Step 9: Save similarity scores
-        print("💾 Saving similarity scores...")
-        output_dir = Path(config.OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        with open(
-            output_dir / "content_query_similarity_score.json", "w", encoding="utf-8"
-        ) as f:
-            json.dump(content_query_cos_sim.tolist(), f, ensure_ascii=False)
-
-        with open(
-            output_dir / "summary_query_similarity_score.json", "w", encoding="utf-8"
-        ) as f:
-            json.dump(summary_query_cos_sim.tolist(), f, ensure_ascii=False)
-
-        with open(
-            output_dir / "content_expanded_query_similarity_score.json",
-            "w",
-            encoding="utf-8",
-        ) as f:
-            json.dump(summary_expanded_query_cos_sim.tolist(), f, ensure_ascii=False)
-
-        print("   ✅ All similarity scores saved")
-
-        # Step 10: Apply reranking if enabled
-        if config.RERANK:
-            print("🔄 Applying reranking...")
-            try:
-                reranked_docs, scores = _rerank(query_text, sem)
-                print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-                print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-                return reranked_docs, parent_docs
-            except Exception as rerank_error:
-                print(f"   ❌ Reranking failed: {rerank_error}")
-                print(f"   Falling back to original results")
-                return sem, parent_docs
-        else:
-            print("⏭️ Skipping reranking (disabled)")
-
-        print("✅ query_expansion_retrieve completed successfully")
-        return sem, parent_docs
+        logger.info("✅ query_expansion_retrieve completed successfully")
+        return content.docs, parent_docs
 
     except Exception as e:
-        print(f"❌ Error in query_expansion_retrieve: {e}")
-        import traceback
-
-        traceback.print_exc()
+        logger.error("❌ Error in query_expansion_retrieve: %s", e)
+        logger.debug("Traceback:", exc_info=True)
         return [], []
 
 
@@ -1074,283 +490,39 @@ def query_expansion_retrieve_hybrid(
     query: HumanMessage | str,
     weights: List[float] = [0.5, 0.5],
     weights_examples: List[float] = [0.5, 0.5],
+    settings: Optional[RunSettings] = None,
 ) -> Tuple[List[Document], List[dict]]:
     """Query expansion hybrid retrieval with weighted sum approach"""
-    print(f"🔍 Starting query_expansion_retrieve_hybrid with query: {query}")
+    logger.debug("🔍 Starting query_expansion_retrieve_hybrid with query: %s", query)
 
     try:
-        # Step 1: Query text extraction
-        query_text = query.content if hasattr(query, "content") else query
-        print(f"   Query text: '{query_text}'")
-
-        # Step 2: Load vector databases
-        print("📂 Loading vector databases...")
-        content_vectordb = FAISS.load_local(
-            config.CONTENT_DB_PATH,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True,
-        )
-
-        summary_vectordb = FAISS.load_local(
-            config.SUMMARY_DB_PATH,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True,
-        )
-        print("   ✅ Vector databases loaded successfully")
-
-        # Step 3: Generate query embedding based on retrieval type
-        print(f"🔢 Generating query embedding (type: {config.RETRIEVAL_TYPE})...")
-
-        if config.RETRIEVAL_TYPE == "summary":
-            query_explanation = utils.generate_summary(query_text)
-            query_emb = model.encode(query_explanation, normalize_embeddings=True)
-            search_query = query_explanation
-        elif config.RETRIEVAL_TYPE == "hyde":
-            hydes = []
-            for _ in range(5):
-                try:
-                    hypo_doc = utils.generate_hyde_document(query_text)
-                    embedding = model.encode(hypo_doc, normalize_embeddings=True)
-                    hydes.append(embedding)
-                except Exception as e:
-                    print(f"   Warning: Error generating HyDE document: {e}")
-                    continue
-
-            if hydes:
-                query_emb = np.mean(np.stack(hydes, axis=0), axis=0)
-                norm = np.linalg.norm(query_emb)
-                if norm > 0:
-                    query_emb /= norm
-            else:
-                print("   Warning: No HyDE documents generated, using original query")
-                query_emb = model.encode(query_text, normalize_embeddings=True)
-            search_query = query_text
-        elif config.RETRIEVAL_TYPE == "summary_mean":
-            summaries = []
-            for _ in range(5):
-                try:
-                    summary_text = utils.generate_summary(query_text)
-                    embedding = model.encode(summary_text, normalize_embeddings=True)
-                    summaries.append(embedding)
-                except Exception as e:
-                    print(f"   Warning: Error generating summary: {e}")
-                    continue
-
-            if summaries:
-                query_emb = np.mean(np.stack(summaries, axis=0), axis=0)
-                norm = np.linalg.norm(query_emb)
-                if norm > 0:
-                    query_emb /= norm
-            else:
-                print("   Warning: No summaries generated, using original query")
-                query_emb = model.encode(query_text, normalize_embeddings=True)
-            search_query = query_text
-        else:
-            query_emb = model.encode(query_text, normalize_embeddings=True)
-            search_query = query_text
-
-        print(f"   ✅ Query embedding generated")
-
-        # Step 4: Weighted sum hybrid retrieval from content database
-        print("🔍 Performing weighted sum hybrid retrieval from content database...")
-        all_content_docs = list(content_vectordb.docstore._dict.values())
-        content_texts = [doc.page_content for doc in all_content_docs]
-
-        # Vector similarity scores
-        content_doc_vecs = model.encode(
-            content_texts, convert_to_tensor=True, normalize_embeddings=True
-        )
-        content_cos_sim_scores = (
-            util.cos_sim(query_emb, content_doc_vecs)[0].cpu().numpy()
-        )
-
-        # BM25 scores
-        content_tokenized_texts = [text.split() for text in content_texts]
-        content_bm25 = BM25Okapi(content_tokenized_texts)
-        content_bm25_scores = np.array(content_bm25.get_scores(search_query.split()))
-
-        # Normalize BM25 scores
-        if content_bm25_scores.max() > content_bm25_scores.min():
-            content_bm25_scores = (content_bm25_scores - content_bm25_scores.min()) / (
-                content_bm25_scores.max() - content_bm25_scores.min()
-            )
-        else:
-            content_bm25_scores = np.zeros_like(content_bm25_scores)
-
-        # Combine scores
-        w1, w2 = weights
-        content_hybrid_scores = w1 * content_cos_sim_scores + w2 * content_bm25_scores
-
-        # Get top-k content documents
-        content_top_indices = content_hybrid_scores.argsort()[-config.TOP_K :][::-1]
-        sem = [all_content_docs[i] for i in content_top_indices]
-        print(
-            f"   ✅ Retrieved {len(sem)} content documents via weighted sum hybrid search"
-        )
-
-        # Step 5: Create expanded query with content
-        print("📝 Creating expanded query with content...")
-        content_texts = [doc.page_content for doc in sem]
-        query_with_content = query_text + "\n" + "\n".join(content_texts)
-
-        query_with_content_embed = model.encode(
-            query_with_content,
-            convert_to_tensor=False,
-            normalize_embeddings=True,
-        )
-        print(f"   ✅ Expanded query embedding generated")
+        settings = settings or RunSettings.from_config()
+        query_text = _query_text(query)
 
-        # Step 6: Weighted sum hybrid retrieval from summary/examples database
-        print(
-            "🔍 Performing weighted sum hybrid retrieval from summary/examples database..."
-        )
-        all_summary_docs = list(summary_vectordb.docstore._dict.values())
-        summary_texts = [doc.page_content for doc in all_summary_docs]
-
-        # Vector similarity scores
-        summary_doc_vecs = model.encode(
-            summary_texts, convert_to_tensor=True, normalize_embeddings=True
-        )
-        summary_cos_sim_scores = (
-            util.cos_sim(query_with_content_embed, summary_doc_vecs)[0].cpu().numpy()
-        )
-
-        # BM25 scores
-        summary_tokenized_texts = [text.split() for text in summary_texts]
-        summary_bm25 = BM25Okapi(summary_tokenized_texts)
-        summary_bm25_scores = np.array(
-            summary_bm25.get_scores(query_with_content.split())
-        )
-
-        # Normalize BM25 scores
-        if summary_bm25_scores.max() > summary_bm25_scores.min():
-            summary_bm25_scores = (summary_bm25_scores - summary_bm25_scores.min()) / (
-                summary_bm25_scores.max() - summary_bm25_scores.min()
-            )
-        else:
-            summary_bm25_scores = np.zeros_like(summary_bm25_scores)
-
-        # Combine scores
-        w3, w4 = weights_examples
-        summary_hybrid_scores = w3 * summary_cos_sim_scores + w4 * summary_bm25_scores
-
-        # Get top-k summary documents
-        summary_top_indices = summary_hybrid_scores.argsort()[-config.TOP_K :][::-1]
-        summary_sem = [all_summary_docs[i] for i in summary_top_indices]
-        print(
-            f"   ✅ Retrieved {len(summary_sem)} summary documents via weighted sum hybrid search"
+        content = _retrieve(
+            engine.corpus(config.CONTENT_DB_PATH),
+            query_text,
+            transform=settings.retrieval_type,
+            weights=weights,
+            settings=settings,
         )
-
-        # Step 7: Load parent documents
-        print("📂 Loading parent documents...")
-        parent_child_matching_dir = Path(
-            "./vectordb/jina_processed/examples_original.jsonl"
+        summary = engine.retrieve(
+            query_text,
+            engine.corpus(config.SUMMARY_DB_PATH),
+            plan=_expanded_query_plan(query_text, content.docs),
+            top_k=settings.top_k,
+            weights=weights_examples,
         )
+        parent_docs = _parent_docs(summary.docs)
 
-        if not parent_child_matching_dir.exists():
-            print(
-                f"   ⚠️ Warning: Parent-child mapping file not found at {parent_child_matching_dir}"
-            )
-            parent_docs = []
-        else:
-            parent_ids = [
-                d.metadata.get("parent_id")
-                for d in summary_sem
-                if d.metadata.get("parent_id")
-            ]
-            parent_doc_map = {}
-
-            with open(parent_child_matching_dir, "r", encoding="utf-8") as f:
-                for line in f:
-                    parent_doc = json.loads(line)
-                    parent_doc_map[parent_doc["id"].replace("parent-", "")] = parent_doc
-
-            parent_docs = []
-            for parent_id in parent_ids:
-                if parent_id in parent_doc_map:
-                    parent_docs.append(parent_doc_map[parent_id])
-
-            print(f"   ✅ Loaded {len(parent_docs)} parent documents")
-
-        # Step 8: Save similarity scores
-        print("💾 Saving similarity scores...")
         output_dir = Path(config.OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        content_selected_scores = content_hybrid_scores[content_top_indices]
-        summary_selected_scores = summary_hybrid_scores[summary_top_indices]
-
-        with open(
-            output_dir / "content_query_similarity_score.json", "w", encoding="utf-8"
-        ) as f:
-            json.dump(content_selected_scores.tolist(), f, ensure_ascii=False)
-
-        with open(
-            output_dir / "summary_query_similarity_score.json", "w", encoding="utf-8"
-        ) as f:
-            json.dump(summary_selected_scores.tolist(), f, ensure_ascii=False)
-
-        print("   ✅ All similarity scores saved")
-
-        # Step 9: Apply reranking if enabled
-        if config.RERANK:
-            print("🔄 Applying reranking...")
-            try:
-                reranked_docs, scores = _rerank(query_text, sem)
-                print(f"   ✅ Reranking completed: {len(reranked_docs)} documents")
-                print(f"   Rerank scores: {scores[:3] if len(scores) >= 3 else scores}")
-                return reranked_docs, parent_docs
-            except Exception as rerank_error:
-                print(f"   ❌ Reranking failed: {rerank_error}")
-                print(f"   Falling back to original results")
-                return sem, parent_docs
-        else:
-            print("⏭️ Skipping reranking (disabled)")
-
-        print("✅ query_expansion_retrieve_hybrid completed successfully")
-        return sem, parent_docs
+        _save_scores(output_dir / "content_query_similarity_score.json", content.scores)
+        _save_scores(output_dir / "summary_query_similarity_score.json", summary.scores)
 
-    except Exception as e:
-        print(f"❌ Error in query_expansion_retrieve_hybrid: {e}")
-        import traceback
-
-        traceback.print_exc()
-        return [], []
-        # Step 8: Get top-k documents
-        print(f"🔝 Selecting top-{config.TOP_K} documents...")
-        top_indices = hybrid_scores.argsort()[-config.TOP_K :][::-1]
-        top_docs = [all_docs[i] for i in top_indices]
-        top_scores = hybrid_scores[top_indices]
-        print(f"   ✅ Selected {len(top_docs)} documents")
-
-        # Step 9: Save scores
-        print("💾 Saving similarity scores...")
-        output_dir = Path(config.OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        with open(config.SCORE_PATH, "w", encoding="utf-8") as f:
-            json.dump(top_scores.tolist(), f, ensure_ascii=False)
-        print(f"   ✅ Scores saved to: {config.SCORE_PATH}")
-
-        # Step 10: Apply reranking if enabled
-        if config.RERANK:
-            print("🔄 Applying reranking...")
-            try:
-                reranked_docs, rerank_scores = _rerank(query_text, top_docs)
-                print(f"   ✅ Reranking completed")
-                return reranked_docs, summary_texts
-            except Exception as rerank_error:
-                print(f"   ❌ Reranking failed: {rerank_error}")
-                return top_docs, summary_texts
-        else:
-            print("⏭️ Skipping reranking (disabled)")
-
-        print("✅ summary_mean_retrieve_hybrid completed successfully")
-        return top_docs, summary_texts
+        logger.info("✅ query_expansion_retrieve_hybrid completed successfully")
+        return content.docs, parent_docs
 
     except Exception as e:
-        print(f"❌ Error in summary_mean_retrieve_hybrid: {e}")
-        import traceback
-
-        traceback.print_exc()
+        logger.error("❌ Error in query_expansion_retrieve_hybrid: %s", e)
+        logger.debug("Traceback:", exc_info=True)
         return [], []
@@ -0,0 +1,74 @@
+"""
+실행 설정 (immutable)
+
+config 값은 import 시점에 각 모듈에 고정되므로, 설정을 바꿔가며 같은 프로세스에서 여러 번 실행할 때
+(eval_comparison 스윕) os.environ + importlib.reload 대신 이 객체를
+build_graph -> nodes -> retrievers / query_decomposition으로 넘깁니다.
+settings를 주지 않으면 모두 config 값 (RunSettings.from_config())을 사용합니다.
+"""
+
+from __future__ import annotations
+import dataclasses
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+RETRIEVAL_TYPES = ["original_query", "hyde", "summary", "summary_mean"]
+
+
+@dataclass(frozen=True)
+class RunSettings:
+    retrieval_type: str = "original_query"
+    hybrid_weight: Optional[float] = (
+        0.5  # 하위 질문 검색의 dense 가중치 (None이면 dense만)
+    )
+    expansion_weight: Optional[float] = (
+        None  # query expansion 검색의 dense 가중치 (None이면 dense만)
+    )
+    top_k: int = 3
+    sim_threshold: Optional[float] = (
+        None  # cosine 유사도 하한 (hybrid 검색도 dense 점수 기준, None이면 필터 없음)
+    )
+    rerank: bool = False
+
+    def __post_init__(self):
+        if self.retrieval_type not in RETRIEVAL_TYPES:
+            raise ValueError(
+                f"Invalid retrieval_type '{self.retrieval_type}'. Valid options: {RETRIEVAL_TYPES}"
+            )
+        if self.top_k < 1:
+            raise ValueError(f"top_k must be >= 1, got {self.top_k}")
+        for name in ("hybrid_weight", "expansion_weight"):
+            weight = getattr(self, name)
+            if weight is not None and not 0.0 <= weight <= 1.0:
+                raise ValueError(f"{name} must be in [0, 1], got {weight}")
+
+    @classmethod
+    def from_config(cls) -> "RunSettings":
+        from rag_pipeline import config
+
+        return cls(
+            retrieval_type=config.RETRIEVAL_TYPE,
+            hybrid_weight=config.HYBRID_WEIGHT,
+            top_k=config.TOP_K,
+            rerank=config.RERANK,
+        )
+
+    @property
+    def hybrid_weights(self) -> Optional[List[float]]:
+        """[dense, BM25] 가중치 (하위 질문 검색)"""
+        if self.hybrid_weight is None:
+            return None
+        return [self.hybrid_weight, 1 - self.hybrid_weight]
+
+    @property
+    def expansion_weights(self) -> Optional[List[float]]:
+        """[dense, BM25] 가중치 (query expansion 검색)"""
+        if self.expansion_weight is None:
+            return None
+        return [self.expansion_weight, 1 - self.expansion_weight]
+
+    def replace(self, **changes: Any) -> "RunSettings":
+        return dataclasses.replace(self, **changes)
+
+    def to_dict(self) -> dict:
+        return dataclasses.asdict(self)
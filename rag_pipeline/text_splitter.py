@@ -1,6 +1,6 @@
 from __future__ import annotations
 import re
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Iterable, Iterator
 from langchain.schema import Document
 
 
@@ -25,6 +25,13 @@ class MarkdownHeaderTextSplitter:
         self.headers_to_split = sorted(headers_to_split, key=lambda x: len(x[0]), reverse=True)
         self.strip_headers = strip_headers
         self.return_each_line = return_each_line
+        # 헤더 매칭 정규식 (긴 marker부터 시도 -> "##"가 "#"로 잘못 매칭되지 않음)
+        self._header_names = dict(self.headers_to_split)
+        self._header_pattern = (
+            re.compile("(" + "|".join(re.escape(marker) for marker, _ in self.headers_to_split) + ") ")
+            if self.headers_to_split
+            else None
+        )
         
     def split_text(self, text: str) -> List[Document]:
         """
@@ -38,52 +45,37 @@ class MarkdownHeaderTextSplitter:
         """
         if not text.strip():
             return []
-            
-        lines = text.split('\n')
-        documents = []
-        current_content = []
-        current_metadata = {}
+        return list(self.split_lines(text.split('\n')))
+    
+    def split_lines(self, lines: Iterable[str]) -> Iterator[Document]:
+        """
+        라인 iterator를 받아 섹션이 끝날 때마다 Document를 yield (split_text와 같은 결과)
         
+        메모리에는 현재 섹션의 라인만 유지 -> 큰 파일도 가장 긴 섹션 크기만큼만 사용
+        """
+        stream = self.stream()
         for line in lines:
-            stripped_line = line.strip()
-            
-            # 헤더인지 확인
-            header_info = self._get_header_info(stripped_line)
-            
-            if header_info:
-                # 이전 섹션이 있다면 문서로 저장
-                if current_content or current_metadata:
-                    content = self._build_content(current_content)
-                    if content.strip():
-                        documents.append(Document(
-                            page_content=content,
-                            metadata=current_metadata.copy()
-                        ))
-                
-                # 새 섹션 시작
-                header_level, header_name, header_text = header_info
-                current_content = []
-                
-                # 메타데이터 업데이트 (현재 레벨과 상위 레벨 유지)
-                current_metadata = self._update_metadata(current_metadata, header_level, header_name, header_text)
-                
-                # 헤더를 콘텐츠에 포함할지 결정
-                if not self.strip_headers:
-                    current_content.append(line)
-            else:
-                # 일반 텍스트 라인
-                current_content.append(line)
-        
-        # 마지막 섹션 처리
-        if current_content or current_metadata:
-            content = self._build_content(current_content)
-            if content.strip():
-                documents.append(Document(
-                    page_content=content,
-                    metadata=current_metadata.copy()
-                ))
-        
-        return documents
+            document = stream.feed(line)
+            if document is not None:
+                yield document
+        document = stream.close()
+        if document is not None:
+            yield document
+    
+    def split_file(self, file_path, encoding: str = "utf-8") -> Iterator[Document]:
+        """
+        파일을 한 줄씩 읽으면서 분할 (파일 전체를 메모리에 올리지 않음)
+        줄바꿈은 read_text()와 같이 \r\n / \r을 \n으로 변환 -> split_text(path.read_text())와 같은 결과
+        """
+        with open(file_path, "r", encoding=encoding) as f:
+            yield from self.split_lines(_iter_lines(f))
+    
+    def stream(self) -> "MarkdownHeaderStream":
+        """
+        라인을 하나씩 넣는 (push) 방식의 증분 분할기
+        (예: 페이지 OCR 결과가 도착하는 대로 분할)
+        """
+        return MarkdownHeaderStream(self)
     
     def _get_header_info(self, line: str) -> Optional[Tuple[int, str, str]]:
         """
@@ -92,12 +84,14 @@ class MarkdownHeaderTextSplitter:
         Returns:
             (header_level, header_name, header_text) 또는 None
         """
-        for header_marker, header_name in self.headers_to_split:
-            if line.startswith(header_marker + " "):
-                header_level = len(header_marker)
-                header_text = line[len(header_marker):].strip()
-                return (header_level, header_name, header_text)
-        return None
+        if self._header_pattern is None:
+            return None
+        match = self._header_pattern.match(line)
+        if match is None:
+            return None
+        header_marker = match.group(1)
+        header_text = line[len(header_marker):].strip()
+        return (len(header_marker), self._header_names[header_marker], header_text)
     
     def _update_metadata(
         self, 
@@ -136,6 +130,69 @@ class MarkdownHeaderTextSplitter:
             return '\n'.join(content_lines)
 
 
+class MarkdownHeaderStream:
+    """
+    MarkdownHeaderTextSplitter의 증분 버전
+    feed(line)으로 라인을 넣으면 새 헤더가 나와 끝난 섹션을 Document로 반환 (없으면 None)
+    """
+    
+    def __init__(self, splitter: MarkdownHeaderTextSplitter):
+        self.splitter = splitter
+        self.current_content: List[str] = []
+        self.current_metadata: Dict[str, Any] = {}
+    
+    def feed(self, line: str) -> Optional[Document]:
+        # 헤더인지 확인
+        header_info = self.splitter._get_header_info(line.strip())
+        if not header_info:
+            # 일반 텍스트 라인
+            self.current_content.append(line)
+            return None
+        
+        # 이전 섹션이 있다면 문서로 반환
+        document = self._flush()
+        
+        # 새 섹션 시작 (메타데이터는 현재 레벨과 상위 레벨 유지)
+        header_level, header_name, header_text = header_info
+        self.current_metadata = self.splitter._update_metadata(
+            self.current_metadata, header_level, header_name, header_text
+        )
+        
+        # 헤더를 콘텐츠에 포함할지 결정
+        if not self.splitter.strip_headers:
+            self.current_content.append(line)
+        return document
+    
+    def close(self) -> Optional[Document]:
+        """
+        마지막 섹션 처리
+        """
+        return self._flush()
+    
+    def _flush(self) -> Optional[Document]:
+        document = None
+        if self.current_content or self.current_metadata:
+            content = self.splitter._build_content(self.current_content)
+            if content.strip():
+                document = Document(
+                    page_content=content,
+                    metadata=self.current_metadata.copy()
+                )
+        self.current_content = []
+        return document
+
+
+def _iter_lines(f) -> Iterator[str]:
+    """
+    파일 라인 iterator (text.split('\n')과 같은 결과: 줄바꿈 제거, 마지막 줄바꿈 뒤 빈 라인 포함)
+    """
+    line = ""
+    for line in f:
+        yield line[:-1] if line.endswith("\n") else line
+    if not line or line.endswith("\n"):
+        yield ""
+
+
 class RecursiveCharacterTextSplitter:
     """
     문자 수 기반으로 텍스트를 재귀적으로 분할하는 클래스
@@ -271,60 +328,131 @@ class RecursiveCharacterTextSplitter:
 class TokenTextSplitter:
     """
     토큰 수 기반으로 텍스트를 분할하는 클래스
+    
+    tokenizer (HuggingFace fast tokenizer 또는 모델 이름)를 주면 임베딩 모델과 같은 tokenizer로
+    토큰을 세고, offset mapping으로 원문을 잘라 window마다 decode하지 않음
+    (split_texts로 여러 문서를 한 번의 배치 호출로 분할 가능)
     """
     
     def __init__(
         self,
         encoding_name: str = "gpt2",
         chunk_size: int = 1000,
-        chunk_overlap: int = 200
+        chunk_overlap: int = 200,
+        tokenizer: Any = None
     ):
         """
         Args:
-            encoding_name: 사용할 인코딩 이름
+            encoding_name: 사용할 인코딩 이름 (tiktoken)
             chunk_size: 청크의 최대 토큰 수
             chunk_overlap: 청크 간 겹침 토큰 수
+            tokenizer: HuggingFace fast tokenizer 또는 모델 이름 (예: "jinaai/jina-embeddings-v3")
         """
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding = None
+        self.tokenizer = None
+        
+        if tokenizer is not None:
+            if isinstance(tokenizer, str):
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(tokenizer, trust_remote_code=True)
+            if not getattr(tokenizer, "is_fast", False):
+                raise ValueError("TokenTextSplitter requires a fast tokenizer (offset mapping)")
+            self.tokenizer = tokenizer
+            return
+        
         try:
             import tiktoken
             self.encoding = tiktoken.get_encoding(encoding_name)
         except ImportError:
             print("Warning: tiktoken not installed. Using character-based approximation.")
-            self.encoding = None
-            
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
     
     def split_text(self, text: str) -> List[str]:
         """
         텍스트를 토큰 수 기준으로 분할
         """
+        if self.tokenizer is not None:
+            return self.split_texts([text])[0]
         if self.encoding:
             return self._split_text_with_tiktoken(text)
         else:
             # tiktoken이 없으면 문자 수로 근사
             return self._split_text_approximate(text)
     
-    def _split_text_with_tiktoken(self, text: str) -> List[str]:
+    def split_texts(self, texts: List[str]) -> List[List[str]]:
         """
-        tiktoken을 사용한 정확한 토큰 기반 분할
+        여러 텍스트를 한 번에 분할 (HuggingFace tokenizer면 전체를 한 번의 배치 호출로 토큰화)
         """
-        tokens = self.encoding.encode(text)
-        chunks = []
+        if self.tokenizer is None:
+            return [self.split_text(text) for text in texts]
+        if not texts:
+            return []
+        
+        offset_mappings = self.tokenizer(
+            list(texts),
+            add_special_tokens=False,
+            return_offsets_mapping=True
+        )["offset_mapping"]
+        return [
+            self._split_text_with_offsets(text, offsets)
+            for text, offsets in zip(texts, offset_mappings)
+        ]
+    
+    def create_documents(self, texts: List[str], metadatas: Optional[List[Dict]] = None) -> List[Document]:
+        """
+        텍스트 리스트로부터 Document 객체들 생성 (split_texts 배치 분할)
+        """
+        documents = []
+        metadatas = metadatas or [{}] * len(texts)
+        
+        for i, chunks in enumerate(self.split_texts(texts)):
+            for chunk in chunks:
+                if chunk.strip():
+                    documents.append(Document(
+                        page_content=chunk,
+                        metadata=metadatas[i] if i < len(metadatas) else {}
+                    ))
         
+        return documents
+    
+    def _windows(self, num_tokens: int) -> List[Tuple[int, int]]:
+        """
+        chunk_size 토큰 window의 (start, end) 목록 (chunk_overlap만큼 겹침)
+        """
+        windows = []
         start = 0
-        while start < len(tokens):
-            end = min(start + self.chunk_size, len(tokens))
-            chunk_tokens = tokens[start:end]
-            chunk_text = self.encoding.decode(chunk_tokens)
-            chunks.append(chunk_text)
-            
+        while start < num_tokens:
+            end = min(start + self.chunk_size, num_tokens)
+            windows.append((start, end))
+            if end == num_tokens:
+                break
             # 겹침을 고려하여 다음 시작점 설정
             start = end - self.chunk_overlap
-            if start >= end:
-                break
-        
-        return chunks
+        return windows
+    
+    def _split_text_with_offsets(self, text: str, offsets: List[Tuple[int, int]]) -> List[str]:
+        """
+        offset mapping을 이용한 분할 (토큰 window의 첫 토큰 시작 ~ 마지막 토큰 끝 문자 구간)
+        """
+        return [
+            text[offsets[start][0]:offsets[end - 1][1]]
+            for start, end in self._windows(len(offsets))
+        ]
+    
+    def _split_text_with_tiktoken(self, text: str) -> List[str]:
+        """
+        tiktoken을 사용한 정확한 토큰 기반 분할
+        """
+        tokens = self.encoding.encode(text)
+        return [
+            self.encoding.decode(tokens[start:end])
+            for start, end in self._windows(len(tokens))
+        ]
     
     def _split_text_approximate(self, text: str) -> List[str]:
         """
@@ -340,10 +468,10 @@ class TokenTextSplitter:
             end = min(start + approx_char_size, len(text))
             chunk = text[start:end]
             chunks.append(chunk)
+            if end == len(text):
+                break
             
             start = end - approx_char_overlap
-            if start >= end:
-                break
         
         return chunks
 
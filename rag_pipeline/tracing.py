@@ -0,0 +1,259 @@
+"""
+질문 단위 latency trace
+
+- trace(): 질문 하나의 처리 전체를 감싸는 root (끝나면 JSON lines 파일에 한 줄로 저장)
+- span(): graph node / LLM 호출 / encode / FAISS 검색 / BM25 / rerank 같은 단계 시간 측정
+- OpenTelemetry가 설치되어 있고 configure_otel()로 collector를 지정하면 같은 span을 OTLP로도 전송
+
+활성 trace가 없으면 span()은 아무것도 기록하지 않으므로 인덱스 빌드 등에서는 부담이 없습니다.
+"""
+
+from __future__ import annotations
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar(
+    "_current_trace", default=None
+)
+_current_span: ContextVar[Optional[str]] = ContextVar("_current_span", default=None)
+
+# configure_otel()로 설정되는 OpenTelemetry tracer (없으면 JSONL만 기록)
+_otel_tracer = None
+
+
+class Trace:
+    """질문 하나의 span 모음"""
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def stage_totals(self) -> Dict[str, float]:
+        """span 이름별 누적 시간 (ms)"""
+        totals: Dict[str, float] = {}
+        for record in self.spans:
+            totals[record["name"]] = (
+                totals.get(record["name"], 0.0) + record["duration_ms"]
+            )
+        return {name: round(ms, 3) for name, ms in totals.items()}
+
+    def llm_tokens(self) -> Dict[str, int]:
+        """llm span의 토큰 수 합계"""
+        totals = {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+        for record in self.spans:
+            if record["name"] == "llm":
+                totals["calls"] += 1
+                for key in ("prompt_tokens", "completion_tokens"):
+                    totals[key] += record["attrs"].get(key) or 0
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)
+            ),
+            "duration_ms": round(self.duration_ms, 3),
+            "attrs": self.attrs,
+            "stages": self.stage_totals(),
+            "llm_tokens": self.llm_tokens(),
+            "spans": sorted(self.spans, key=lambda r: r["start_ms"]),
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(name: str, path: Optional[Path] = None, **attrs: Any) -> Iterator[Trace]:
+    """
+    질문 하나의 trace 시작
+
+    Args:
+        name: trace 이름 (예: "query")
+        path: JSON lines 출력 파일 (None이면 저장하지 않고 Trace 객체만 반환)
+        attrs: trace 속성 (질문, 검색 설정 등)
+    """
+    record = Trace(name, attrs)
+    trace_token = _current_trace.set(record)
+    span_token = _current_span.set(None)
+    try:
+        with _otel_span(name, attrs):
+            yield record
+    finally:
+        record.duration_ms = (time.perf_counter() - record.start) * 1000
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        if path is not None:
+            _append_jsonl(Path(path), record.to_dict())
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    단계 시간 측정
+
+    yield된 dict의 "attrs"에 실행 후 알게 되는 값 (토큰 수 등)을 추가할 수 있음
+    활성 trace가 없으면 None을 yield
+    """
+    active = _current_trace.get()
+    if active is None and _otel_tracer is None:
+        yield None
+        return
+
+    record = {
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": _current_span.get(),
+        "name": name,
+        "thread": threading.current_thread().name,
+        "attrs": dict(attrs),
+    }
+    token = _current_span.set(record["span_id"])
+    start = time.perf_counter()
+    try:
+        with _otel_span(name, record["attrs"]) as otel:
+            try:
+                yield record
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                if otel is not None:
+                    otel.set_attributes(_otel_attributes(record["attrs"]))
+    finally:
+        end = time.perf_counter()
+        _current_span.reset(token)
+        if active is not None:
+            record["start_ms"] = round((start - active.start) * 1000, 3)
+            record["duration_ms"] = round((end - start) * 1000, 3)
+            active.add(record)
+
+
+def traced(name: str, fn: Callable, **attrs: Any) -> Callable:
+    """함수 호출 전체를 span으로 감싸기 (graph node 등록용)"""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(name, **attrs):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def instrument_openai(client) -> None:
+    """
+    OpenAI client의 chat.completions.create 호출마다 llm span 기록 (토큰 수 포함)
+
+    utils.client를 공유하는 모든 모듈 (nodes, query_decomposition 등)에 적용됨
+    """
+    completions = client.chat.completions
+    create = completions.create
+    if getattr(create, "_traced", False):
+        return
+
+    @functools.wraps(create)
+    def traced_create(*args, **kwargs):
+        with span(
+            "llm",
+            model=kwargs.get("model"),
+            max_tokens=kwargs.get("max_tokens"),
+            messages=len(kwargs.get("messages", [])),
+        ) as record:
+            response = create(*args, **kwargs)
+            usage = getattr(response, "usage", None)
+            if record is not None and usage is not None:
+                record["attrs"].update(
+                    prompt_tokens=getattr(usage, "prompt_tokens", None),
+                    completion_tokens=getattr(usage, "completion_tokens", None),
+                    total_tokens=getattr(usage, "total_tokens", None),
+                )
+            return response
+
+    traced_create._traced = True
+    completions.create = traced_create
+
+
+def configure_otel(
+    endpoint: Optional[str], service_name: str = "rag-for-semicon"
+) -> bool:
+    """
+    OpenTelemetry OTLP exporter 설정 (예: http://localhost:4318/v1/traces)
+
+    opentelemetry-sdk / opentelemetry-exporter-otlp-proto-http가 없으면 JSONL만 사용
+    """
+    global _otel_tracer
+    if not endpoint:
+        return False
+    try:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning(
+            "Warning: opentelemetry-sdk / opentelemetry-exporter-otlp not installed, "
+            "writing JSONL traces only"
+        )
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+    otel_trace.set_tracer_provider(provider)
+    _otel_tracer = otel_trace.get_tracer("rag_pipeline")
+    logger.info("📡 OpenTelemetry traces -> %s", endpoint)
+    return True
+
+
+@contextmanager
+def _otel_span(name: str, attrs: Dict[str, Any]):
+    if _otel_tracer is None:
+        yield None
+        return
+    with _otel_tracer.start_as_current_span(
+        name, attributes=_otel_attributes(attrs)
+    ) as otel:
+        yield otel
+
+
+def _otel_attributes(attrs: Dict[str, Any]) -> Dict[str, Any]:
+    # OTel 속성은 str / bool / int / float만 허용
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attrs.items()
+        if value is not None
+    }
+
+
+_write_lock = threading.Lock()
+
+
+def _append_jsonl(path: Path, record: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _write_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
@@ -1,17 +1,36 @@
 from __future__ import annotations
-from typing import List
+import contextvars
+import io
+import json
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from langchain.schema import Document
-from rag_pipeline import config
+from rag_pipeline import config, tracing
 import os
 import base64
 import cv2
 from pathlib import Path
-from pdf2image import convert_from_path
-from openai import OpenAI
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+from rag_pipeline.ocr_cache import OCRCache
 from rag_pipeline.text_splitter import MarkdownHeaderTextSplitter
 
+logger = logging.getLogger(__name__)
+
 # Initialize OpenAI client
 client = OpenAI(api_key=config.OPENAI_API_KEY)
+# 모든 chat.completions.create 호출을 llm span으로 기록 (토큰 수 포함)
+tracing.instrument_openai(client)
 
 
 def encode_image(image_path, image_size=(837, 1012)):
@@ -21,7 +40,7 @@ def encode_image(image_path, image_size=(837, 1012)):
         img = cv2.resize(img, dsize=image_size, interpolation=cv2.INTER_CUBIC)
 
     except Exception as _:
-        print(f"Error when encoding image: {image_path}")
+        logger.error("Error when encoding image: %s", image_path)
         return ""
 
     _, ext = os.path.splitext(image_path)
@@ -39,121 +58,279 @@ def get_page_number(filename):
     return float("inf")
 
 
-def pdf_to_docs(file_path: Path) -> List[Document]:
-    temp_img_dir = Path("./data/temp_img")
-    os.makedirs(temp_img_dir, exist_ok=True)
-
-    pdf_name = file_path.stem  # 확장자 없이 파일명 추출
-    images = convert_from_path(str(file_path))
-
-    # 각 페이지를 png로 저장
-    for idx, image in enumerate(images):
-        output_path = temp_img_dir / f"page_{idx+1}.png"
-        image.save(output_path, "PNG")
+OCR_PROMPT = "Extract all the text from the image:"
+OCR_HEADERS = [("#", "Header1"), ("##", "Header2"), ("###", "Header3")]
+# 재시도할 오류 (rate limit / 일시적 서버 / 네트워크 오류)
+RETRYABLE_ERRORS = (
+    RateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+)
 
-    print(f"PDF successfully converted: {pdf_name} -> {len(images)} pages")
 
-    # Text Extraction
-    all_texts = []
+# 업로드 파일 OCR 캐시 (페이지 markdown / split chunk / chunk 임베딩)
+ocr_cache: Optional[OCRCache] = (
+    OCRCache(
+        config.OCR_CACHE_DIR,
+        model=config.OPENAI_MODEL,
+        prompt=OCR_PROMPT,
+        salt=json.dumps(OCR_HEADERS),
+    )
+    if config.OCR_CACHE
+    else None
+)
+
+
+def _image_url(img_path: str) -> str:
+    encoded = encode_image(img_path, image_size=(837, 1012))
+    image_ext = os.path.splitext(img_path)[1].lstrip(".")  # e.g. png, jpg
+    return f"data:image/{image_ext};base64,{encoded}"
+
+
+def _pil_image_url(image, image_size=(837, 1012)) -> str:
+    """PIL 이미지 -> resize / PNG 인코딩 -> data URL (디스크를 거치지 않음)"""
+    image = image.convert("RGB").resize(image_size, Image.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    encoded = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    return f"data:image/png;base64,{encoded}"
+
+
+def rasterize_pdf(
+    file_path: Path,
+    dpi: Optional[int] = None,
+    chunk_pages: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    PDF 페이지를 앞에서부터 chunk_pages장씩 메모리에서 변환 -> 페이지별 data URL을 순서대로 yield
+
+    요청마다 독립적으로 동작 (공유 임시 폴더 없음), 한 번에 메모리에 올라가는 페이지는 chunk_pages장
+    dpi: 변환 해상도 (기본: config.PDF_DPI, 어차피 837x1012로 축소하므로 높일 필요 없음)
+    """
+    dpi = dpi or config.PDF_DPI
+    chunk_pages = max(1, chunk_pages or config.PDF_PAGE_CHUNK)
+    num_pages = pdfinfo_from_path(str(file_path))["Pages"]
+    logger.debug("Converting PDF: %s -> %s pages", file_path.stem, num_pages)
+
+    for first_page in range(1, num_pages + 1, chunk_pages):
+        last_page = min(first_page + chunk_pages - 1, num_pages)
+        images = convert_from_path(
+            str(file_path), dpi=dpi, first_page=first_page, last_page=last_page
+        )
+        for image in images:
+            yield _pil_image_url(image)
+            image.close()
 
-    for filename in sorted(os.listdir(temp_img_dir), key=get_page_number):
-        img_path = os.path.join(temp_img_dir, filename)
-        if not os.path.isfile(img_path):
-            continue
 
-        # Encode image
-        image_url = encode_image(img_path, image_size=(837, 1012))
-        _, image_ext = os.path.splitext(filename)
-        image_ext = image_ext.lstrip(".")  # e.g. png, jpg
-        image_url = f"data:image/{image_ext};base64,{image_url}"
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Retry-After 헤더가 있으면 그 값, 없으면 exponential backoff + jitter"""
+    response = getattr(error, "response", None)
+    retry_after = (
+        getattr(response, "headers", {}).get("retry-after") if response else None
+    )
+    if retry_after:
+        try:
+            return min(float(retry_after), config.OCR_BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = min(config.OCR_BACKOFF_MAX, config.OCR_BACKOFF_BASE * 2**attempt)
+    return delay * random.uniform(0.5, 1.0)
 
-        response = client.chat.completions.create(
-            model=config.OPENAI_MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Extract all the text from the image:",
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": image_url},
-                        },
-                    ],
-                }
-            ],
-        )
-        text = response.choices[0].message.content
 
-        print(f"Successfully extracted text from: {filename}\n")
-        all_texts.append(f"{text.strip()}\n")
+def ocr_image(image_url: str, label: str = "") -> str:
+    """
+    이미지 한 장 (data URL) -> vision completion으로 추출한 텍스트 (rate limit 시 backoff 후 재시도)
 
-    combined_texts = "\n".join(all_texts)
+    label: 로그에 표시할 이름 (파일명 / 페이지 번호)
+    """
+    cache_key = ocr_cache.page_key(image_url) if ocr_cache else None
+    if cache_key is not None:
+        cached = ocr_cache.get_page(cache_key)
+        if cached is not None:
+            logger.debug("📦 OCR cache hit: %s", label)
+            return cached
 
-    # Split extracted text
-    headers_to_split_on = [("#", "Header1"), ...]
-    md_splitter = MarkdownHeaderTextSplitter(
-        headers_to_split=headers_to_split_on, strip_headers=False
+    for attempt in range(config.OCR_MAX_RETRIES + 1):
+        try:
+            response = client.chat.completions.create(
+                model=config.OPENAI_MODEL,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": OCR_PROMPT},
+                            {"type": "image_url", "image_url": {"url": image_url}},
+                        ],
+                    }
+                ],
+            )
+            break
+        except RETRYABLE_ERRORS as e:
+            if attempt == config.OCR_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(
+                "⏳ OCR retry %s/%s for %s in %.1fs (%s)",
+                attempt + 1,
+                config.OCR_MAX_RETRIES,
+                label,
+                delay,
+                type(e).__name__,
+            )
+            time.sleep(delay)
+
+    logger.debug("Successfully extracted text from: %s\n", label)
+    text = (response.choices[0].message.content or "").strip()
+    if cache_key is not None:
+        ocr_cache.put_page(cache_key, text)
+    return text
+
+
+def ocr_pages(
+    pages: Iterable[str],
+    on_page: Optional[Callable[[int, str], None]] = None,
+    max_concurrency: Optional[int] = None,
+) -> List[str]:
+    """
+    페이지 이미지 (data URL)들을 동시에 OCR -> 페이지 순서대로 정렬된 텍스트 리스트
+
+    pages: generator도 가능 (rasterize_pdf) -> 변환되는 대로 요청을 보내고,
+        대기 중인 페이지는 max_concurrency의 2배까지만 메모리에 유지
+    max_concurrency: 동시에 보내는 요청 수 (기본: config.OCR_MAX_CONCURRENCY)
+    on_page(index, text): 앞에서부터 연속으로 완료된 페이지를 순서대로 전달
+        (뒤 페이지가 먼저 끝나도 앞 페이지가 끝날 때까지 보류 -> 받은 쪽에서 바로 split 시작 가능)
+    """
+    max_concurrency = max(1, max_concurrency or config.OCR_MAX_CONCURRENCY)
+    texts: Dict[int, str] = {}
+    pending: Dict[Future, int] = {}
+    next_page = 0  # 아직 on_page로 넘기지 않은 첫 페이지
+
+    def collect(**wait_kwargs) -> None:
+        nonlocal next_page
+        done, _ = wait(pending, **wait_kwargs)
+        for future in done:
+            texts[pending.pop(future)] = future.result()
+        while next_page in texts:
+            if on_page is not None:
+                on_page(next_page, texts[next_page])
+            next_page += 1
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        try:
+            for idx, image_url in enumerate(pages):
+                future = executor.submit(
+                    contextvars.copy_context().run,
+                    ocr_image,
+                    image_url,
+                    f"page {idx + 1}",
+                )
+                pending[future] = idx
+                if len(pending) >= max_concurrency * 2:
+                    collect(return_when=FIRST_COMPLETED)
+                else:
+                    collect(timeout=0)
+            while pending:
+                collect(return_when=FIRST_COMPLETED)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    return [texts[idx] for idx in range(len(texts))]
+
+
+def _ocr_splitter() -> MarkdownHeaderTextSplitter:
+    return MarkdownHeaderTextSplitter(headers_to_split=OCR_HEADERS, strip_headers=False)
+
+
+def _page_lines(text: str) -> List[str]:
+    # 페이지 사이에 빈 줄 하나 ("\n".join(f"{text}\n" ...)과 같은 라인)
+    return f"{text}\n".split("\n")
+
+
+def _ocr_and_split(
+    pages: Iterable[str], on_page: Optional[Callable[[int, str], None]]
+) -> Tuple[List[str], List[Document]]:
+    """
+    페이지 OCR + split 동시 진행 (앞에서부터 연속으로 끝난 페이지를 바로 분할)
+    -> (페이지별 텍스트, chunk)
+    """
+    stream = _ocr_splitter().stream()
+    docs: List[Document] = []
+
+    def handle_page(idx: int, text: str) -> None:
+        for line in _page_lines(text):
+            doc = stream.feed(line)
+            if doc is not None:
+                docs.append(doc)
+        if on_page is not None:
+            on_page(idx, text)
+
+    texts = ocr_pages(pages, on_page=handle_page)
+    doc = stream.close()
+    if doc is not None:
+        docs.append(doc)
+    logger.debug("\nSuccesfully split text!")
+    return texts, docs
+
+
+def _cached_docs(file_path: Path) -> Tuple[Optional[str], Optional[List[Document]]]:
+    """(파일 캐시 키, 캐시된 chunk) -> 캐시가 꺼져 있으면 (None, None)"""
+    if ocr_cache is None:
+        return None, None
+    key = ocr_cache.file_key(file_path)
+    docs = ocr_cache.get_docs(key)
+    if docs is not None:
+        logger.info("📦 OCR cache hit: %s (%s chunks)", file_path, len(docs))
+    return key, docs
+
+
+def _store_docs(key: Optional[str], docs: List[Document]) -> None:
+    if key is not None and docs:
+        ocr_cache.put_docs(key, docs)
+
+
+def pdf_to_docs(
+    file_path: Path, on_page: Optional[Callable[[int, str], None]] = None
+) -> List[Document]:
+    """
+    PDF -> 페이지 OCR -> markdown header 기준 chunk
+
+    같은 내용의 파일을 이미 처리했으면 (OCR 캐시) PDF 변환 / OCR 없이 저장된 chunk를 반환
+    (이 경우 on_page는 호출되지 않음)
+    """
+    cache_key, docs = _cached_docs(file_path)
+    if docs is not None:
+        return docs
+
+    # Text Extraction + Split (페이지를 메모리에서 변환하면서 동시 처리)
+    all_texts, docs = _ocr_and_split(rasterize_pdf(file_path), on_page)
+    logger.debug(
+        "PDF successfully converted: %s -> %s pages", file_path.stem, len(all_texts)
     )
+    _store_docs(cache_key, docs)
+    return docs
 
-    split_contents = md_splitter.split_text(combined_texts)
-    print("\nSuccesfully split text!")
-
-    return split_contents
 
+def img_to_docs(
+    file_path: Path, on_page: Optional[Callable[[int, str], None]] = None
+) -> List[Document]:
+    """이미지 폴더 (page_N.png ...) -> 페이지 OCR -> chunk (OCR 캐시는 pdf_to_docs와 동일)"""
+    cache_key, docs = _cached_docs(file_path)
+    if docs is not None:
+        return docs
 
-def img_to_docs(file_path: Path) -> List[Document]:
-    # Text Extraction
-    all_texts = []
-
+    img_paths = []
     for filename in sorted(os.listdir(file_path), key=get_page_number):
         img_path = os.path.join(file_path, filename)
-        if not os.path.isfile(img_path):
-            continue
-
-        # Encode image
-        image_url = encode_image(img_path, image_size=(837, 1012))
-        _, image_ext = os.path.splitext(filename)
-        image_ext = image_ext.lstrip(".")  # e.g. png, jpg
-        image_url = f"data:image/{image_ext};base64,{image_url}"
-
-        response = client.chat.completions.create(
-            model=config.OPENAI_MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Extract all the text from the image:",
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": image_url},
-                        },
-                    ],
-                }
-            ],
-        )
-        text = response.choices[0].message.content
-
-        print(f"Successfully extracted text from: {filename}\n")
-        all_texts.append(f"{text.strip()}\n")
-
-    combined_texts = "\n".join(all_texts)
-
-    # Split extracted text
-    headers_to_split_on = [("#", "Header1"), ...]
-    md_splitter = MarkdownHeaderTextSplitter(
-        headers_to_split=headers_to_split_on, strip_headers=False
-    )
-
-    split_contents = md_splitter.split_text(combined_texts)
-    print("\nSuccesfully split text!")
+        if os.path.isfile(img_path):
+            img_paths.append(img_path)
 
-    return split_contents
+    # Text Extraction + Split (페이지 동시 처리)
+    _, docs = _ocr_and_split((_image_url(p) for p in img_paths), on_page)
+    _store_docs(cache_key, docs)
+    return docs
 
 
 def generate_summary(query_text: str) -> str:
@@ -278,8 +455,9 @@ Respond with ONLY one word: "simple" or "complex" """,
 
         # 추가 검증 로직
         if decision not in ["simple", "complex"]:
-            print(
-                f"Warning: Invalid complexity decision '{decision}', applying fallback logic"
+            logger.warning(
+                "Warning: Invalid complexity decision '%s', applying fallback logic",
+                decision,
             )
             # 폴백 로직: 특정 키워드 기반 판별
             complex_indicators = [
@@ -318,11 +496,11 @@ Respond with ONLY one word: "simple" or "complex" """,
 
             decision = "complex" if complexity_score >= 2 else "simple"
 
-        print(f"Question complexity determined as: {decision}")
+        logger.info("Question complexity determined as: %s", decision)
         return decision
 
     except Exception as e:
-        print(f"Error in complexity check: {e}")
+        logger.error("Error in complexity check: %s", e)
         # 에러 발생 시 안전한 기본값
         return "simple"
 
@@ -367,5 +545,5 @@ Respond ONLY with the dictionary format as a string.""",
         else:
             return "{}"
     except Exception as e:
-        print(f"Error extracting variables: {e}")
+        logger.error("Error extracting variables: %s", e)
         return "{}"
@@ -0,0 +1,167 @@
+"""
+FAISS 벡터 검색 유틸리티
+
+- Matryoshka 차원 축소: jina-embeddings-v3 임베딩의 앞쪽 dim개 성분만 잘라 재정규화
+- 2단계 검색: 축소 차원 인덱스에서 후보를 넉넉히 뽑은 뒤 전체 차원 벡터로 재점수화
+- 양자화 인덱스: int8 (scalar quantizer) / binary (부호 비트, Hamming 거리) 저장 후 float 재점수화
+
+전체 차원 벡터는 인덱스 버전 디렉토리의 vectors.npy (FAISS 행 순서와 동일)에 저장됩니다.
+"""
+
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+from rag_pipeline import tracing
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+FULL_VECTORS_FILE = "vectors.npy"
+
+# flat: float32 (기존과 동일), int8: 차원당 1 byte, binary: 차원당 1 bit
+INDEX_TYPES = ["flat", "int8", "binary"]
+
+
+def truncate_embeddings(vectors, dim: Optional[int]) -> np.ndarray:
+    """앞쪽 dim개 성분만 남기고 L2 재정규화 (dim이 없거나 전체 차원 이상이면 그대로)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not dim or dim >= vectors.shape[-1]:
+        return vectors
+    truncated = vectors[..., :dim]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.clip(norms, 1e-12, None)
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str = "flat") -> faiss.Index:
+    """
+    index_type에 맞는 FAISS 인덱스 생성 후 vectors 추가
+
+    모두 float 쿼리를 받는 faiss.Index라 LangChain FAISS (저장 / 로드 / add / delete)와 호환
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "int8":
+        # 차원별 min/max 범위로 8bit 양자화 (정규화된 벡터라 L2 순위 = cosine 순위)
+        index = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2
+        )
+        index.train(vectors)
+    elif index_type == "binary":
+        # 회전 / threshold 학습 없이 부호 비트만 저장 -> Hamming 거리 검색
+        index = faiss.IndexLSH(dim, dim, False, False)
+    else:
+        raise ValueError(
+            f"Unknown index type '{index_type}'. Valid options: {INDEX_TYPES}"
+        )
+    index.add(vectors)
+    return index
+
+
+def index_type_of(vectordb: FAISS) -> str:
+    if isinstance(vectordb.index, faiss.IndexLSH):
+        return "binary"
+    if isinstance(vectordb.index, faiss.IndexScalarQuantizer):
+        return "int8"
+    return "flat"
+
+
+def create_vectorstore(
+    texts: Sequence[str],
+    vectors: np.ndarray,
+    embeddings,
+    metadatas: Sequence[Dict],
+    ids: Sequence[str],
+    index_type: str = "flat",
+) -> FAISS:
+    """미리 계산한 임베딩으로 FAISS 벡터 스토어 생성 (flat은 FAISS.from_embeddings와 동일)"""
+    if index_type == "flat":
+        return FAISS.from_embeddings(
+            list(zip(texts, np.asarray(vectors).tolist())),
+            embeddings,
+            metadatas=list(metadatas),
+            ids=list(ids),
+        )
+    docstore = InMemoryDocstore(
+        {
+            doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        }
+    )
+    return FAISS(
+        embedding_function=embeddings,
+        index=build_faiss_index(vectors, index_type),
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def save_full_vectors(index_dir: Path, vectors: np.ndarray) -> None:
+    tmp_path = Path(index_dir) / f".{FULL_VECTORS_FILE}.tmp.npy"
+    np.save(tmp_path, np.asarray(vectors, dtype=np.float32))
+    os.replace(tmp_path, Path(index_dir) / FULL_VECTORS_FILE)
+
+
+def load_full_vectors(index_dir: Path, mmap: bool = True) -> Optional[np.ndarray]:
+    """전체 차원 벡터 로드 (없으면 None, 기본은 메모리 맵)"""
+    path = Path(index_dir) / FULL_VECTORS_FILE
+    if not path.exists():
+        return None
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def search_rows(
+    index: faiss.Index,
+    query_vec,
+    k: int,
+    full_vectors: Optional[np.ndarray] = None,
+    candidates: int = 0,
+) -> List[int]:
+    """
+    쿼리 벡터로 top-k 행 번호 검색
+
+    Args:
+        index: FAISS 인덱스 (축소 차원 / 양자화일 수 있음)
+        query_vec: 전체 차원 쿼리 임베딩 (인덱스 차원으로 자동 축소)
+        k: 반환할 행 수
+        full_vectors: 전체 차원 벡터 (주면 2단계 검색)
+        candidates: 1단계에서 뽑을 후보 수 (k 이하이면 1단계만 수행)
+    """
+    query = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+    coarse_query = truncate_embeddings(query, index.d)
+    two_stage = full_vectors is not None and candidates > k
+
+    # 1단계: 축소 차원 / 양자화 인덱스에서 후보 검색
+    n = min(candidates if two_stage else k, index.ntotal)
+    if n <= 0:
+        return []
+    with tracing.span("faiss_search", k=n, ntotal=index.ntotal, dim=index.d):
+        _, positions = index.search(coarse_query[None, :], n)
+    positions = [int(p) for p in positions[0] if p >= 0]
+    if not two_stage or not positions:
+        return positions[:k]
+
+    # 2단계: 전체 차원 벡터 내적으로 재점수화 (정규화된 벡터 -> cosine)
+    full_query = query / max(float(np.linalg.norm(query)), 1e-12)
+    with tracing.span("faiss_rescore", candidates=len(positions)):
+        scores = np.asarray(full_vectors[positions], dtype=np.float32) @ full_query
+    return [positions[i] for i in np.argsort(-scores)[:k]]
+
+
+def search(
+    vectordb: FAISS,
+    query_vec,
+    k: int,
+    full_vectors: Optional[np.ndarray] = None,
+    candidates: int = 0,
+) -> List[Document]:
+    """search_rows 결과를 LangChain FAISS docstore의 문서로 변환"""
+    rows = search_rows(vectordb.index, query_vec, k, full_vectors, candidates)
+    return [
+        vectordb.docstore.search(vectordb.index_to_docstore_id[row]) for row in rows
+    ]
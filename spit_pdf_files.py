@@ -1,62 +1,162 @@
+"""
+교재 PDF -> 챕터별 PDF 분할
+
+페이지 범위를 직접 주거나 (--ranges), 주지 않으면 PDF outline (bookmark)의 최상위 항목으로 나눕니다.
+PDF마다 페이지를 한 번만 순회하면서 모든 챕터 writer에 추가하고, 여러 PDF는 프로세스별로 동시에 처리합니다.
+
+    # 범위: 이름=시작:끝 (1부터 시작, 끝 페이지는 포함하지 않음)
+    python spit_pdf_files.py data/neamen_split_by_chapter/chapter15.pdf \\
+        --ranges "chapter15-1=1:21,chapter15-2=21:35"
+    # outline 기준 (chapter15-1, chapter15-2, ...)
+    python spit_pdf_files.py text/*.pdf --output-dir data/neamen_split_by_chapter
+"""
+
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
 from PyPDF2 import PdfReader, PdfWriter
 
-# 1. Input and Output paths
-input_pdf_path = (
-    "/home/jhwang/rag-for-semicon-physics/data/neamen_split_by_chapter/chapter15.pdf"
-)
-output_dir = "/home/jhwang/rag-for-semicon-physics/data/neamen_split_by_chapter"
-
-# 2. Define chapter page ranges (start inclusive, end exclusive)
-chapter_ranges = {
-    # "chapter1": [26, 47],
-    # "chapter2": [50, 78],
-    # "chapter3": [83, 126],
-    # "chapter4": [131, 175],
-    # "chapter5": [181, 210],
-    # "chapter6": [217, 259],
-    # "chapter7": [266, 295],
-    # "chapter8": [301, 349],
-    # "chapter9": [356, 391],
-    # "chapter10": [396, 459],
-    # "chapter11": [468, 509],
-    # "chapter12": [516, 586],
-    "chapter15-1": [1, 21],
-    "chapter15-2": [21, 35],
-    # "chapter13": [596, 637],
-    # "chapter14": [643, 690],
-    # "chapter15": [695, 729],
-}
-
-# 3. Ensure output directory exists
-os.makedirs(output_dir, exist_ok=True)
-
-# 4. Load the original PDF
-reader = PdfReader(input_pdf_path)
-total_pages = len(reader.pages)
-
-# 5. Split and save each chapter
-for chapter_name, (start_page, end_page) in chapter_ranges.items():
-    writer = PdfWriter()
-
-    # Adjust for 0-based indexing
-    start_idx = start_page - 1
-    end_idx = end_page - 1  # end_page is exclusive, so we exclude this page
-
-    # Validate bounds
-    if start_idx >= total_pages or start_idx < 0:
-        print(f"⚠️ Skipping {chapter_name}: start_page {start_page} is out of bounds.")
-        continue
-    if end_idx > total_pages:
-        end_idx = total_pages
-
-    for i in range(start_idx, end_idx):
-        writer.add_page(reader.pages[i])
-
-    output_path = os.path.join(output_dir, f"{chapter_name}.pdf")
-    with open(output_path, "wb") as out_file:
-        writer.write(out_file)
-
-    print(f"✅ Saved {chapter_name}: pages {start_page}-{end_page - 1} → {output_path}")
-
-print("🎉 All chapters have been processed.")
+DEFAULT_OUTPUT_DIR = "./data/neamen_split_by_chapter"
+
+
+def parse_ranges(spec: str) -> Dict[str, Tuple[int, int]]:
+    """ "chapter1=26:47,chapter2=50:78" -> {"chapter1": (26, 47), ...} (start inclusive, end exclusive)"""
+    chapter_ranges = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            name, pages = item.split("=")
+            start, end = (int(p) for p in pages.split(":"))
+        except ValueError:
+            raise ValueError(
+                f"Invalid range '{item}' (expected name=start:end)"
+            ) from None
+        if start < 1 or end <= start:
+            raise ValueError(f"Invalid page range for {name}: {start}:{end}")
+        chapter_ranges[name.strip()] = (start, end)
+    return chapter_ranges
+
+
+def outline_ranges(reader: PdfReader, prefix: str) -> Dict[str, Tuple[int, int]]:
+    """최상위 outline 항목마다 한 챕터 (다음 항목 시작 페이지 전까지)"""
+    starts: List[Tuple[str, int]] = []
+    for item in reader.outline:
+        if isinstance(item, list):  # 하위 항목
+            continue
+        starts.append((item.title, reader.get_destination_page_number(item) + 1))
+    starts.sort(key=lambda x: x[1])
+
+    total_pages = len(reader.pages)
+    chapter_ranges = {}
+    for idx, (title, start) in enumerate(starts):
+        end = starts[idx + 1][1] if idx + 1 < len(starts) else total_pages + 1
+        if end <= start:  # 같은 페이지에서 시작하는 항목
+            continue
+        name = f"{prefix}-{idx + 1}"
+        chapter_ranges[name] = (start, end)
+        print(f"  {name}: {title} (pages {start}-{end - 1})")
+    return chapter_ranges
+
+
+def split_pdf(
+    input_pdf_path: str,
+    output_dir: str,
+    chapter_ranges: Optional[Dict[str, Tuple[int, int]]] = None,
+    name_prefix: str = "",
+) -> List[str]:
+    """PDF 하나 분할 (worker 프로세스에서 실행) -> 저장한 파일 경로 목록"""
+    # Load the original PDF
+    reader = PdfReader(input_pdf_path)
+    total_pages = len(reader.pages)
+    stem = os.path.splitext(os.path.basename(input_pdf_path))[0]
+
+    if chapter_ranges is None:
+        chapter_ranges = outline_ranges(reader, stem)
+        if not chapter_ranges:
+            print(f"⚠️ Skipping {input_pdf_path}: no outline found (use --ranges)")
+            return []
+
+    # 0-based [start_idx, end_idx) 범위 검증
+    writers: Dict[str, Tuple[int, int, PdfWriter]] = {}
+    for chapter_name, (start_page, end_page) in chapter_ranges.items():
+        start_idx = start_page - 1
+        end_idx = min(end_page - 1, total_pages)  # end_page is exclusive
+        if start_idx >= total_pages or start_idx < 0:
+            print(
+                f"⚠️ Skipping {name_prefix}{chapter_name}: start_page {start_page} is out of bounds."
+            )
+            continue
+        writers[name_prefix + chapter_name] = (start_idx, end_idx, PdfWriter())
+
+    # 페이지를 한 번만 순회하면서 해당하는 모든 챕터에 추가 (범위가 겹쳐도 됨)
+    first = min((start for start, _, _ in writers.values()), default=0)
+    last = max((end for _, end, _ in writers.values()), default=0)
+    for i in range(first, last):
+        page = reader.pages[i]
+        for start_idx, end_idx, writer in writers.values():
+            if start_idx <= i < end_idx:
+                writer.add_page(page)
+
+    saved = []
+    for chapter_name, (start_idx, end_idx, writer) in writers.items():
+        output_path = os.path.join(output_dir, f"{chapter_name}.pdf")
+        with open(output_path, "wb") as out_file:
+            writer.write(out_file)
+        print(
+            f"✅ Saved {chapter_name}: pages {start_idx + 1}-{end_idx} → {output_path}"
+        )
+        saved.append(output_path)
+    return saved
+
+
+def main():
+    p = argparse.ArgumentParser(description="Split textbook PDFs into chapter PDFs")
+    p.add_argument("pdfs", nargs="+", help="source PDF files")
+    p.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    p.add_argument(
+        "--ranges",
+        default=None,
+        help='chapter page ranges "name=start:end,..." (1-based, end exclusive); default: PDF outline',
+    )
+    p.add_argument(
+        "--workers", type=int, default=0, help="worker processes (0: CPU count)"
+    )
+    args = p.parse_args()
+
+    try:
+        chapter_ranges = parse_ranges(args.ranges) if args.ranges else None
+    except ValueError as e:
+        p.error(str(e))
+    # Ensure output directory exists
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # 같은 --ranges를 여러 PDF에 적용하면 출력 파일명이 겹치므로 원본 파일명을 앞에 붙임
+    prefix_names = chapter_ranges is not None and len(args.pdfs) > 1
+    saved = 0
+    with ProcessPoolExecutor(max_workers=args.workers or None) as pool:
+        futures = {
+            pool.submit(
+                split_pdf,
+                pdf_path,
+                args.output_dir,
+                chapter_ranges,
+                (
+                    os.path.splitext(os.path.basename(pdf_path))[0] + "_"
+                    if prefix_names
+                    else ""
+                ),
+            ): pdf_path
+            for pdf_path in args.pdfs
+        }
+        for future, pdf_path in futures.items():
+            try:
+                saved += len(future.result())
+            except Exception as e:
+                print(f"⚠️ Failed to split {pdf_path}: {e}")
+
+    print(f"🎉 All chapters have been processed. ({saved} files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+벡터 DB 증분 업데이트
+
+새 챕터 / 예제를 추가할 때 전체 재임베딩 없이 바뀐 청크만 반영합니다.
+
+    python update_vectordb.py content data/test.md data/md/chapter4_combined_cleaned.md
+    python update_vectordb.py summary data/examples_text_summary_pair.json
+
+주어진 소스 파일의 청크만 갱신 / 삭제하고 다른 소스의 청크는 유지합니다.
+--prune을 주면 주어진 소스를 전체 코퍼스로 보고 나머지 청크를 모두 삭제합니다.
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import torch
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from rag_pipeline import chunking, embedding_pipeline, indexing, vector_search
+
+EMBED_MODEL_NAME = "jinaai/jina-embeddings-v3"
+DB_PATHS = {
+    "content": Path("./vectordb/faiss"),
+    "summary": Path("./vectordb/summary_faiss"),
+}
+CHECKPOINT_DIR = Path("./vectordb/.embed_checkpoints")
+# 인덱스 빌더와 동일한 task adapter (기존 인덱스 manifest와 다르면 업데이트 거부)
+EMBED_TASKS = indexing.DEFAULT_EMBED_TASKS
+
+
+def main():
+    p = argparse.ArgumentParser(description="Incrementally update a FAISS/BM25 index")
+    p.add_argument("store", choices=sorted(DB_PATHS), help="index to update")
+    p.add_argument(
+        "sources",
+        nargs="+",
+        help="markdown files (content) or examples_text_summary_pair.json (summary)",
+    )
+    p.add_argument("--db-path", default=None, help="override index directory")
+    p.add_argument(
+        "--keep", type=int, default=3, help="number of index versions to keep"
+    )
+    p.add_argument(
+        "--dry-run", action="store_true", help="report changes without writing"
+    )
+    p.add_argument(
+        "--prune",
+        action="store_true",
+        help="treat the sources as the whole corpus and delete chunks from any other source",
+    )
+    p.add_argument(
+        "--embed-dim",
+        type=int,
+        default=None,
+        help="Matryoshka dim (default: existing index, else EMBED_DIM env or 1024)",
+    )
+    p.add_argument(
+        "--index-type",
+        choices=vector_search.INDEX_TYPES,
+        default=None,
+        help="index type for a new index (default: existing index, else INDEX_TYPE env or flat)",
+    )
+    p.add_argument(
+        "--chunk-max-tokens",
+        type=int,
+        default=None,
+        help="content chunk token budget (default: existing index, else CHUNK_MAX_TOKENS env or 1024; 0: header split only)",
+    )
+    p.add_argument(
+        "--splitter",
+        choices=indexing.CONTENT_SPLITTERS,
+        default=None,
+        help="content header splitter (default: existing index, else CONTENT_SPLITTER env or langchain; streaming reads files line by line)",
+    )
+    args = p.parse_args()
+
+    db_path = Path(args.db_path) if args.db_path else DB_PATHS[args.store]
+    embed_dim = (
+        args.embed_dim
+        or indexing.read_manifest(db_path).get("embed_dim")
+        or int(os.getenv("EMBED_DIM", 1024))
+    )
+    existing_type = indexing.read_manifest(db_path).get("index_type")
+    if indexing.index_exists(db_path):
+        existing_type = existing_type or "flat"
+        if args.index_type and args.index_type != existing_type:
+            raise SystemExit(
+                f"Index at {db_path} is '{existing_type}'; rebuild it to change the index type"
+            )
+    index_type = existing_type or args.index_type or os.getenv("INDEX_TYPE", "flat")
+    # 청크 토큰 예산 (기존 인덱스는 manifest에 기록된 설정 유지, 기록이 없으면 헤더 분할만 한 인덱스)
+    existing_chunking = indexing.read_manifest(db_path).get("chunking") or {}
+    if args.chunk_max_tokens is not None:
+        max_tokens = args.chunk_max_tokens
+    elif indexing.index_exists(db_path):
+        max_tokens = existing_chunking.get("max_tokens", 0)
+    else:
+        max_tokens = int(os.getenv("CHUNK_MAX_TOKENS", 1024))
+    # 헤더 분할기 (분할기가 바뀌면 청크 hash가 달라짐 -> 기존 인덱스는 기록된 분할기 유지)
+    if args.splitter is not None:
+        splitter = args.splitter
+    elif indexing.index_exists(db_path):
+        splitter = indexing.read_manifest(db_path).get("splitter", "langchain")
+    else:
+        splitter = os.getenv("CONTENT_SPLITTER", "langchain")
+    chunking_config = None
+    if args.store == "content" and max_tokens > 0:
+        chunking_config = {
+            "max_tokens": max_tokens,
+            "overlap_tokens": existing_chunking.get(
+                "overlap_tokens", int(os.getenv("CHUNK_OVERLAP_TOKENS", 128))
+            ),
+        }
+
+    # 1. 새 청크 목록 구성
+    if args.store == "content":
+        chunker = (
+            chunking.TokenBudgetChunker.from_pretrained(
+                EMBED_MODEL_NAME, **chunking_config
+            )
+            if chunking_config
+            else None
+        )
+        docs = indexing.load_content_documents(
+            [Path(s) for s in args.sources], chunker=chunker, splitter=splitter
+        )
+    else:
+        docs = []
+        for source in args.sources:
+            docs.extend(indexing.load_summary_documents(Path(source)))
+    print(f"📄 Loaded {len(docs)} chunks from {len(args.sources)} source(s)")
+
+    # 2. 임베딩 모델 (인덱스 빌더와 동일한 설정)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    embedding_model = HuggingFaceEmbeddings(
+        model_name=EMBED_MODEL_NAME,
+        model_kwargs={
+            "trust_remote_code": True,
+            "device": device,
+        },
+        encode_kwargs={
+            "normalize_embeddings": True,
+            **indexing.task_encode_kwargs(EMBED_TASKS["query"]),
+        },
+    )
+
+    # --prune가 아니면 이전 업데이트의 소스도 인덱스에 남아 있음
+    indexed_sources = set(args.sources)
+    if not args.prune:
+        indexed_sources.update(indexing.read_manifest(db_path).get("sources", []))
+
+    # 3. 증분 업데이트 (새 / 변경 청크만 병렬 임베딩 파이프라인으로 임베딩)
+    report = indexing.incremental_update(
+        db_path,
+        docs,
+        embedding_model,
+        embed_documents=lambda texts: embedding_pipeline.embed_texts(
+            texts,
+            EMBED_MODEL_NAME,
+            checkpoint_dir=CHECKPOINT_DIR / args.store,
+            device=device,
+            model=embedding_model.client,  # 작은 업데이트는 이미 로드한 모델로 바로 임베딩
+            encode_kwargs=indexing.task_encode_kwargs(EMBED_TASKS["passage"]),
+        ),
+        manifest={
+            "store": args.store,
+            "embed_model": EMBED_MODEL_NAME,
+            "embed_tasks": EMBED_TASKS,
+            "embed_dim": embed_dim,
+            "index_type": index_type,
+            **(
+                {"chunking": chunking_config, "splitter": splitter}
+                if args.store == "content"
+                else {}
+            ),
+            "sources": sorted(indexed_sources),
+        },
+        keep=args.keep,
+        dry_run=args.dry_run,
+        sources=[Path(s).name for s in args.sources],
+        prune=args.prune,
+    )
+
+    print("\n📊 Index update report:")
+    print(f"  - Added: {report['added']}")
+    print(f"  - Updated (content changed): {report['updated']}")
+    print(f"  - Removed: {report['removed']}")
+    print(f"  - Metadata only: {report['metadata_only']}")
+    print(f"  - Unchanged: {report['unchanged']}")
+    print(f"  - Kept (other sources): {report['out_of_scope']}")
+    print(f"  - Duplicates skipped: {report['duplicates_skipped']}")
+    print(f"  - Chunks embedded: {report['embedded']}")
+    for label in ("added_keys", "updated_keys", "removed_keys"):
+        for key in report[label]:
+            print(f"    [{label.split('_')[0]}] {key}")
+
+    if args.dry_run:
+        print("\n🔍 Dry run: no index written")
+    elif report["embedded"] or report["deleted"] or report["metadata_only"]:
+        print(f"\n✅ New index version {report['version']} written to {db_path}")
+    else:
+        print(f"\n✅ Index already up to date ({report['version']})")
+
+    db_path.mkdir(parents=True, exist_ok=True)
+    with open(db_path / "last_update_report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    if not args.dry_run:
+        embedding_pipeline.clear_checkpoints(CHECKPOINT_DIR / args.store)
+
+
+if __name__ == "__main__":
+    main()